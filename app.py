@@ -1,12 +1,52 @@
-from flask import Flask, jsonify, request
+# Imported first so the startup report covers every other import
+from startup_timing import StartupTimer
+from flask import Flask, g, jsonify, request
+from flask.logging import default_handler
 from flask_cors import CORS
-from enum import Enum
-from typing import List, Dict, Optional
-import json
+from typing import List, Dict, NamedTuple, Optional, Tuple
+import math
 import os
+import threading
+import time
+from urllib.parse import urlencode
+
+from change_feed import DEFAULT_CHANGE_LOG_SIZE, ChangeLog
+from dataset_reloader import DEFAULT_RELOAD_INTERVAL, FileReloader, Signature, file_signature
+from facets import (
+    DEFAULT_FACET_BUCKETS, DEFAULT_ZIP_PREFIX, FACETS, ZIP_PREFIX_LENGTHS, parse_facet_limit,
+    summarize_facet
+)
+from json_provider import FastJSONProvider
+from metrics import MetricsRegistry
+from read_cache import ReadThroughCache
+from rate_limit import DEFAULT_RETRY_AFTER, LoadShedder, SharedTokenBuckets, client_key
+from response_cache import ResponseCache, negotiate_encoding
+from snapshot import MmapUserStore, write_snapshot
+from search_index import tokenize
+from sharding import ShardFilter, parse_shard
+from spatial_index import parse_bbox, parse_point
+from sqlite_store import SqliteUserStore
+import structured_log
+from structured_log import DEFAULT_LOG_BATCH, DEFAULT_LOG_BUFFER, AccessSampler, LogWriter, access_entry
+from user_ndjson import export_ndjson, import_ndjson
+from user_record import UserRecord
+from user_repository import UserRepository
+from user_store import (
+    DEFAULT_NEAREST, DEFAULT_PAGE_SIZE, DEFAULT_SUGGESTIONS, UserStore, UserType, decode_cursor,
+    encode_cursor, normalize_key, parse_fields, project_user
+)
+from user_writer import DEFAULT_FOLLOW_INTERVAL, UserExists, UserNotFound, UserWriter
+from write_log import WriteAheadLog
+
+# Cold-start phase timings, reported with STARTUP_REPORT=1 or STARTUP_BUDGET_MS
+startup = StartupTimer()
+startup.mark("imports")
 
 app = Flask(__name__)
 
+# orjson when installed (JSON_ENCODER=stdlib forces the standard library)
+app.json = FastJSONProvider(app, use_orjson=os.environ.get('JSON_ENCODER', '').lower() != 'stdlib')
+
 # Configure CORS to allow access from any origin for public API
 CORS(app, 
      origins="*",  # Allow all origins for public access
@@ -15,21 +55,161 @@ CORS(app,
      supports_credentials=False  # Set to False for public API
 )
 
+# Security headers sent on every response (shared with the ASGI app)
+SECURITY_HEADERS = {
+    'X-Content-Type-Options': 'nosniff',
+    'X-Frame-Options': 'DENY',
+    'X-XSS-Protection': '1; mode=block',
+}
+
+# Sent by endpoints that don't manage their own caching
+NO_STORE_HEADERS = {
+    'Cache-Control': 'no-cache, no-store, must-revalidate',
+    'Pragma': 'no-cache',
+    'Expires': '0',
+}
+
+# Per-route request counters and latency histograms, shared across workers
+metrics = MetricsRegistry()
+
+# Structured JSON access and app logs, queued in memory and written by a
+# background thread so a slow log consumer drops lines instead of stalling
+# requests. STRUCTURED_LOG is "-" (stdout) or a file; LOG_SAMPLE_OK logs only
+# that fraction of 200 responses. Off unless set (gunicorn.conf.py sets it).
+STRUCTURED_LOG = os.environ.get('STRUCTURED_LOG', '')
+access_sampler = AccessSampler(float(os.environ.get('LOG_SAMPLE_OK', 1.0)))
+log_writer = None
+if STRUCTURED_LOG:
+    log_writer = LogWriter(
+        STRUCTURED_LOG,
+        max_queue=int(os.environ.get('LOG_BUFFER_SIZE', DEFAULT_LOG_BUFFER)),
+        batch_size=int(os.environ.get('LOG_BATCH_SIZE', DEFAULT_LOG_BATCH)),
+        on_drop=lambda dropped: metrics.inc('log_lines_dropped_total', dropped),
+    )
+    structured_log.install(log_writer)
+    # app.logger propagates to the root logger's queue handler instead
+    app.logger.removeHandler(default_handler)
+
+def log_access(method: str, path: str, route: str, status: int, duration: float,
+               size: Optional[int], remote_addr: Optional[str]) -> None:
+    """
+    Queue the access log line for a finished request, unless sampled out
+    
+    Args:
+        method: Request method
+        path: Request path
+        route: Matched route pattern, or "unmatched"
+        status: Response status code
+        duration: Seconds spent handling the request
+        size: Response body bytes, or None when streamed
+        remote_addr: Address of the connecting peer
+    
+    The line carries the dataset version noted by served_store, so it
+    matches the X-Dataset-Version the client saw even if a write published
+    a newer store since.
+    """
+    if log_writer is None:
+        return
+    sample_rate = access_sampler.sample_rate(status)
+    if sample_rate is not None:
+        log_writer.write(access_entry(method, path, route, status, duration, size,
+                                      g.get('dataset_version'), remote_addr, sample_rate))
+
+@app.before_request
+def start_request_timer():
+    """Remember when the request started for latency metrics"""
+    g.request_started = time.perf_counter()
+
+# Per-client token buckets (API key, else IP) shared by every worker through
+# RATE_LIMIT_FILE; limiting is off unless RATE_LIMIT_RATE (requests/second) is set
+RATE_LIMIT_RATE = float(os.environ.get('RATE_LIMIT_RATE', 0))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', max(1.0, 2 * RATE_LIMIT_RATE)))
+RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 0))
+rate_limiter = SharedTokenBuckets(RATE_LIMIT_RATE, RATE_LIMIT_BURST) if RATE_LIMIT_RATE > 0 else None
+
+# Early 503s while saturated; gunicorn.conf.py points it at the listen socket
+load_shedder = LoadShedder(
+    max_queue=int(os.environ.get('LOAD_SHED_MAX_QUEUE', 0)),
+    max_inflight=int(os.environ.get('LOAD_SHED_MAX_INFLIGHT', 0)),
+    max_wait=float(os.environ.get('LOAD_SHED_MAX_WAIT_MS', 0)) / 1000,
+    retry_after=int(os.environ.get('LOAD_SHED_RETRY_AFTER', DEFAULT_RETRY_AFTER)),
+)
+
+# Always served, so health checks and metric scrapes keep working under load
+ADMISSION_EXEMPT_PATHS = ('/api/health', '/api/metrics')
+
+Rejection = Tuple[int, Dict, Dict[str, str]]
+
+def check_admission(path: str, headers, remote_addr: Optional[str]) -> Tuple[bool, Optional[Rejection]]:
+    """
+    Apply rate limiting and load shedding to a request before any work is done
+    
+    Args:
+        path: Request path
+        headers: Request headers, looked up by lower-case name
+        remote_addr: Address of the connecting peer
+        
+    Returns:
+        Tuple of (in flight, rejection). An in-flight request must be passed
+        to load_shedder.release() when it finishes; a rejection is the
+        (status, error body, headers) to answer with instead
+    """
+    if path in ADMISSION_EXEMPT_PATHS:
+        return False, None
+    if rate_limiter is not None:
+        wait = rate_limiter.acquire(client_key(headers, remote_addr, RATE_LIMIT_TRUSTED_PROXIES))
+        if wait:
+            return False, (429, {"error": "Rate limit exceeded"},
+                           {'Retry-After': str(max(1, math.ceil(wait)))})
+    if not load_shedder.enabled:
+        return False, None
+    reason = load_shedder.admit(headers.get('x-request-start'))
+    if reason is not None:
+        return False, (503, {"error": f"Server overloaded ({reason}), please retry"},
+                       {'Retry-After': str(load_shedder.retry_after)})
+    return True, None
+
+@app.before_request
+def admit_request():
+    """Reject requests over their client's rate limit or while overloaded"""
+    in_flight, rejection = check_admission(request.path, request.headers, request.remote_addr)
+    if rejection is not None:
+        status, body, headers = rejection
+        return jsonify(body), status, headers
+    g.in_flight = in_flight
+
+@app.teardown_request
+def release_request(exc):
+    """Stop counting a finished request as in flight"""
+    if g.pop('in_flight', False):
+        load_shedder.release()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record request latency and report it in a Server-Timing header"""
+    started = g.get('request_started')
+    if started is not None:
+        duration = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(route, request.method, response.status_code, duration)
+        response.headers['Server-Timing'] = f'app;dur={duration * 1000:.2f}'
+        log_access(request.method, request.path, route, response.status_code, duration,
+                   response.content_length, request.remote_addr)
+    startup.first_response(request.method, request.path)
+    return response
+
 # Add security headers for production
 @app.after_request
 def after_request(response):
     """Add security headers to all responses"""
-    response.headers['X-Content-Type-Options'] = 'nosniff'
-    response.headers['X-Frame-Options'] = 'DENY'
-    response.headers['X-XSS-Protection'] = '1; mode=block'
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+    response.headers.update(SECURITY_HEADERS)
+    # Cacheable endpoints set their own Cache-Control alongside an ETag;
+    # everything else stays uncacheable
+    if 'Cache-Control' not in response.headers:
+        response.headers.update(NO_STORE_HEADERS)
     return response
 
-class UserType(Enum):
-    ACTIVE = "ACTIVE"
-    INACTIVE = "INACTIVE"
+startup.mark("app setup")
 
 # Sample user data - Limited to 3 users for API response
 SAMPLE_USERS = [
@@ -50,6 +230,7 @@ SAMPLE_USERS = [
         },
         "phone": "1-770-736-8031 x56442",
         "website": "hildegard.org",
+        "status": "ACTIVE",
         "company": {
             "name": "Romaguera-Crona",
             "catchPhrase": "Multi-layered client-server neural-net",
@@ -73,6 +254,7 @@ SAMPLE_USERS = [
         },
         "phone": "010-692-6593 x09125",
         "website": "anastasia.net",
+        "status": "ACTIVE",
         "company": {
             "name": "Deckow-Crist",
             "catchPhrase": "Proactive didactic contingency",
@@ -96,6 +278,7 @@ SAMPLE_USERS = [
         },
         "phone": "1-463-123-4447",
         "website": "ramiro.info",
+        "status": "INACTIVE",
         "company": {
             "name": "Romaguera-Jacobson",
             "catchPhrase": "Face to face bifurcated interface",
@@ -104,25 +287,576 @@ SAMPLE_USERS = [
     }
 ]
 
-def filter_users_by_type(users: List[Dict], user_type: Optional[str]) -> List[Dict]:
+def encode_user(user: Dict) -> bytes:
+    """Serialize a single public user dict with the response JSON settings"""
+    return app.json.dumps_bytes(user, separators=(",", ":"))
+
+def encode_json(data) -> bytes:
+    """Serialize data the same way jsonify does for a compact response body"""
+    return app.json.dumps_bytes(data, separators=(",", ":")) + b"\n"
+
+def import_data_file(store: UserRepository, data_path: str) -> None:
+    """
+    Load the NDJSON file at data_path into a store, logging skipped lines
+    
+    Raises:
+        OSError: If the data file cannot be read
+        ValueError: If the data file holds no valid users
+    """
+    with open(data_path, 'rb') as f:
+        report = import_ndjson(store, f)
+    if report['failed']:
+        if not report['imported']:
+            raise ValueError(f"No valid users in {data_path}, first error: {report['errors'][0]}")
+        app.logger.warning("Skipped %d invalid lines in %s, first: %s",
+                           report['failed'], data_path, report['errors'][0])
+
+# Create/update/delete go through UserWriter: each committed group of writes
+# is published as a new copy of the in-memory store. With USERS_WAL_PATH set
+# every write is first appended to that log (one fsync per group), which is
+# replayed over the base data at startup and shared by all worker processes.
+USERS_WAL_PATH = os.environ.get('USERS_WAL_PATH')
+write_log = (WriteAheadLog(USERS_WAL_PATH, fsync=os.environ.get('USERS_WAL_FSYNC', '1') != '0')
+             if USERS_WAL_PATH and not os.environ.get('USERS_DB_PATH') else None)
+
+def publish_user_store(store: UserStore) -> None:
+    """Switch new requests over to the store version a write just produced"""
+    global user_store
+    user_store = store
+
+# Set on shard processes started by shard_router.py: this process then only
+# loads, and only creates, the users whose id maps to its shard
+USERS_SHARD = parse_shard(os.environ['USERS_SHARD']) if os.environ.get('USERS_SHARD') else None
+
+# Recent writes behind /api/users/changes; CHANGE_LOG_SIZE bounds how far
+# behind a client can fall before it has to fetch everything again
+change_log = ChangeLog(int(os.environ.get('CHANGE_LOG_SIZE', DEFAULT_CHANGE_LOG_SIZE)))
+
+user_writer = UserWriter(
+    lambda: user_store, publish_user_store, write_log,
+    commit_delay=float(os.environ.get('USERS_WAL_COMMIT_DELAY_MS', 0)) / 1000,
+    changes=change_log,
+    shard=USERS_SHARD,
+)
+
+# Identity of USERS_DATA_PATH as the serving in-memory store was loaded from
+# it. Workers forked later start watching from here, so one forked from a
+# master still holding the boot dataset reloads the newer file at once.
+loaded_data_signature: Signature = None
+
+def load_user_store(previous=None) -> UserRepository:
+    """
+    Build the store that serves every user query
+    
+    With USERS_DB_PATH set, users are served from that SQLite database,
+    which is seeded from USERS_DATA_PATH (or SAMPLE_USERS) only while it is
+    empty; every process and thread then shares the file.
+    
+    Otherwise users come from the NDJSON file named by USERS_DATA_PATH, or
+    from SAMPLE_USERS when it is unset. When USERS_SNAPSHOT_PATH is set the
+    dataset is written to a read-only snapshot file and served from a
+    memory mapping of it. With gunicorn's preload_app the snapshot is built
+    once in the master, and every forked worker shares the same mapped
+    pages instead of holding its own copy.
+    
+    Writes logged in USERS_WAL_PATH are replayed over the in-memory data
+    before it is served (or written to the snapshot). With USERS_SHARD set,
+    only that shard's users are loaded.
+    
+    Args:
+        previous: Store being replaced on a reload; the new store's version
+            is numbered after it so cached responses are never reused
+        
+    Raises:
+        OSError: If the data file cannot be read
+        ValueError: If the data file holds no valid users
+    """
+    data_path = os.environ.get('USERS_DATA_PATH')
+    db_path = os.environ.get('USERS_DB_PATH')
+    if db_path:
+        store = SqliteUserStore(db_path)
+        if not len(store):
+            seed = ShardFilter(store, USERS_SHARD) if USERS_SHARD else store
+            if data_path:
+                import_data_file(seed, data_path)
+            else:
+                seed.add_many(SAMPLE_USERS)
+        return store
+    store = UserStore()
+    seed = ShardFilter(store, USERS_SHARD) if USERS_SHARD else store
+    if data_path:
+        global loaded_data_signature
+        # Taken before reading, so a change made meanwhile is reloaded later
+        loaded_data_signature = file_signature(data_path)
+        import_data_file(seed, data_path)
+    else:
+        seed.add_many(SAMPLE_USERS)
+    user_writer.replay(store)
+    if previous is not None:
+        store.version = previous.version + 1
+    snapshot_path = os.environ.get('USERS_SNAPSHOT_PATH')
+    if snapshot_path:
+        write_snapshot(snapshot_path, store, encode=encode_user)
+        return MmapUserStore(snapshot_path)
+    return store
+
+# Indexed store backing every user query; its version bumps on each change.
+# Reloads replace it wholesale, so request handlers read it once and keep
+# using that store until they finish.
+user_store = load_user_store()
+startup.mark("load users")
+
+def served_store() -> UserRepository:
+    """
+    Return the live store, noting its dataset version for the access log
+    
+    Handlers take the store once through here, so the logged version is the
+    one they answered from (None for backends without a change sequence).
+    """
+    store = user_store
+    g.dataset_version = getattr(store, 'seq', None)
+    return store
+
+def install_user_store(store: UserRepository) -> None:
+    """Atomically switch new requests over to another store"""
+    global user_store
+    # Build the lazy indexes the old store was using now rather than on
+    # the next request
+    store.warm_indexes(like=user_store)
+    user_store = store
+    app.logger.info("Serving dataset version %d (%d users)", store.version, len(store))
+
+def warm_user_indexes(background: bool = False) -> Optional[threading.Thread]:
+    """
+    Build the serving store's geo and search indexes before any query needs them
+    
+    gunicorn.conf.py calls this in the master before the workers fork, so
+    every worker starts with the indexes and shares their pages; the other
+    servers build them in a background thread so the first /api/health is
+    not held up. Either way no request pays for a full build.
+    
+    Args:
+        background: Build in a daemon thread instead of blocking
+        
+    Returns:
+        The thread when building in the background, else None
+    """
+    def warm():
+        # A write may publish a copy taken before the build; warm that too
+        store = None
+        while store is not user_store:
+            store = user_store
+            store.warm_indexes()
+    
+    if not background:
+        warm()
+        return None
+    thread = threading.Thread(target=warm, name="index-warmer", daemon=True)
+    thread.start()
+    return thread
+
+def reload_user_store() -> None:
+    """Rebuild the store from USERS_DATA_PATH and swap it in"""
+    # Hold off writers, so no write is published to the store being replaced
+    with user_writer.lock:
+        # Change feed clients cannot be told what the new file changed. Every
+        # worker reloads the file, but the reset is logged once per change.
+        signature = file_signature(os.environ['USERS_DATA_PATH'])
+        user_writer.mark_reset(source=None if signature is None else list(signature))
+        install_user_store(load_user_store(previous=user_store))
+
+def remap_snapshot() -> None:
+    """Map a snapshot file rewritten by another process and swap it in"""
+    store = MmapUserStore(os.environ['USERS_SNAPSHOT_PATH'])
+    if store.version > user_store.version:
+        install_user_store(store)
+
+def start_dataset_reloader(watch_snapshot: bool = False) -> Optional[FileReloader]:
+    """
+    Start reloading the dataset in the background when its file changes
+    
+    Does nothing unless USERS_DATA_PATH is set, or when USERS_DB_PATH is
+    (the database is the dataset then and only seeded from the file);
+    USERS_RELOAD_INTERVAL sets the poll interval in seconds (0 disables
+    reloading).
+    
+    Args:
+        watch_snapshot: Watch USERS_SNAPSHOT_PATH and remap it, for worker
+            processes whose master rewrites the snapshot, instead of
+            rebuilding from the data file
+        
+    Returns:
+        The running FileReloader, or None when reloading is disabled
+    """
+    data_path = os.environ.get('USERS_DATA_PATH')
+    interval = float(os.environ.get('USERS_RELOAD_INTERVAL', DEFAULT_RELOAD_INTERVAL))
+    if not data_path or interval <= 0 or os.environ.get('USERS_DB_PATH'):
+        return None
+    if watch_snapshot:
+        return FileReloader(os.environ['USERS_SNAPSHOT_PATH'], remap_snapshot, interval).start()
+    return FileReloader(data_path, reload_user_store, interval,
+                        signature=loaded_data_signature).start()
+
+def start_write_log_follower():
+    """
+    Apply writes logged by other processes, first at once and then in the background
+    
+    Each gunicorn worker calls this after the fork: it catches up on writes
+    made since the master loaded the data, then polls the log every
+    USERS_WAL_FOLLOW_INTERVAL seconds. Does nothing without USERS_WAL_PATH.
+    """
+    if write_log is None or not isinstance(user_store, UserStore):
+        return None
+    user_writer.catch_up()
+    interval = float(os.environ.get('USERS_WAL_FOLLOW_INTERVAL', DEFAULT_FOLLOW_INTERVAL))
+    return user_writer.start_follower(interval)
+
+# Serialized /api/users and search bodies, one per query variant and dataset version
+users_response_cache = ResponseCache()
+
+# Read-through cache for per-user lookups, for stores backed by slower
+# storage than memory; USER_CACHE_TTL (seconds) enables it, and defaults to
+# a minute with the SQLite backend. Keys include the store version, so
+# writes and reloads are never served stale.
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60 if os.environ.get('USERS_DB_PATH') else 0))
+USER_CACHE_MAX_BYTES = int(os.environ.get('USER_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+
+def record_size(record: Optional[UserRecord]) -> int:
+    """Approximate bytes charged for a cached lookup result"""
+    return 64 + (len(record.to_json()) if record is not None else 0)
+
+user_lookup_cache = ReadThroughCache(
+    ttl=USER_CACHE_TTL, max_bytes=USER_CACHE_MAX_BYTES, sizeof=record_size
+) if USER_CACHE_TTL > 0 else None
+
+def lookup_user(store, kind: str, lookup, key) -> Optional[UserRecord]:
+    """Resolve one id, username or email through the lookup cache when enabled"""
+    if user_lookup_cache is None:
+        return lookup(key)
+    if kind != 'ids':
+        key = normalize_key(key)
+    return user_lookup_cache.get((store.version, kind, key), lambda _key: lookup(key))
+
+# Largest page or neighbour count a client may ask for; the defaults live
+# in user_store (and facets), so the shard router applies the same ones
+MAX_PAGE_SIZE = 1000
+MAX_SEARCH_TERMS = 10
+
+# Maximum number of keys (ids + usernames + emails) in one batch lookup
+MAX_BATCH_SIZE = 100
+
+def cached_json_response(cached):
+    """
+    Build a conditional, content-negotiated response for a cached body
+
+    Answers with 304 Not Modified when the client's If-None-Match already
+    holds the current ETag, otherwise sends the pre-serialized body,
+    compressed with gzip or deflate when the client accepts it.
+    """
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if cached.matches(request.headers.get('If-None-Match')):
+        # A 304 needs only the validator, so nothing is compressed for it
+        response = app.response_class(status=304)
+    else:
+        body, _, coding = cached.representation(encoding)
+        response = app.response_class(body, status=200, mimetype='application/json')
+        if coding:
+            response.headers['Content-Encoding'] = coding
+    response.headers['ETag'] = cached.etag_for(encoding)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers.update(cached.headers)
+    # Allow storing but require revalidation, so polling clients get 304s
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def next_page_link(cursor: str) -> str:
+    """Build an RFC 8288 Link header value pointing at the next page"""
+    args = request.args.to_dict()
+    args['after'] = cursor
+    return f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+
+def serialize_users(records: List[UserRecord], fields: Optional[Tuple[str, ...]]) -> bytes:
+    """Serialize user records as a JSON array, projected to fields if given"""
+    if not fields:
+        return app.json.dumps_records(records) + b"\n"
+    return encode_json([project_user(record.to_dict(), fields) for record in records])
+
+class UsersQuery(NamedTuple):
+    """Validated /api/users query; hashable, so it doubles as the cache key"""
+    user_type: Optional[str] = None
+    after: Optional[int] = None
+    limit: Optional[int] = None
+    fields: Optional[Tuple[str, ...]] = None
+    near: Optional[Tuple[float, float]] = None
+    k: Optional[int] = None
+    bbox: Optional[Tuple[float, float, float, float]] = None
+
+def build_users_page(store: UserRepository, query: UsersQuery):
+    """Serialize one page of users, returning the body and pagination headers"""
+    next_after = None
+    if query.near is not None:
+        records = store.nearest(query.near[0], query.near[1], query.k, query.user_type)
+    elif not query.fields and hasattr(store, 'page_raw'):
+        # Splice the stored JSON (snapshot or database) straight into the response
+        bodies, next_after = store.page_raw(query.user_type, query.after, query.limit, query.bbox)
+        records = None
+        body = b"[" + b",".join(bodies) + b"]\n"
+    else:
+        records, next_after = store.page(query.user_type, query.after, query.limit, query.bbox)
+    if records is not None:
+        body = serialize_users(records, query.fields)
+    headers = {}
+    if next_after is not None:
+        headers['X-Next-Cursor'] = encode_cursor(next_after)
+    if isinstance(store, UserStore):
+        # Where to start polling /api/users/changes after this full fetch
+        headers['X-Dataset-Version'] = str(store.seq)
+    return body, headers
+
+def parse_list_params(args) -> tuple:
+    """
+    Validate the userType, limit, after and fields parameters shared by list endpoints
+    
+    Args:
+        args: Mapping of query parameter names to string values
+        
+    Returns:
+        Tuple of (user_type, after, limit, fields); limit is None when
+        neither limit nor after was given
+        
+    Raises:
+        ValueError: With a client-facing message if a parameter is invalid
+    """
+    # Get the optional userType query parameter
+    user_type = args.get('userType', None)
+    
+    # Validate user type if provided
+    if user_type and user_type.upper() not in [e.value for e in UserType]:
+        raise ValueError("Invalid user type. Valid values are: ACTIVE, INACTIVE")
+    
+    if user_type:
+        user_type = user_type.upper()
+    
+    # Validate pagination and projection parameters
+    limit = args.get('limit', None)
+    after = args.get('after', None)
+    fields = args.get('fields', None)
+    try:
+        if limit is not None:
+            limit = int(limit)
+            if not 1 <= limit <= MAX_PAGE_SIZE:
+                raise ValueError
+        elif after is not None:
+            limit = DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise ValueError(f"Invalid limit. Must be an integer between 1 and {MAX_PAGE_SIZE}")
+    after = decode_cursor(after) if after is not None else None
+    fields = parse_fields(fields) if fields is not None else None
+    
+    return user_type, after, limit, fields
+
+def parse_users_query(args) -> UsersQuery:
+    """
+    Validate and normalize the /api/users query parameters
+    
+    Args:
+        args: Mapping of query parameter names to string values
+        
+    Returns:
+        UsersQuery ready for get_users_page
+        
+    Raises:
+        ValueError: With a client-facing message if a parameter is invalid
+    """
+    user_type, after, limit, fields = parse_list_params(args)
+    
+    # Validate spatial query parameters
+    near = args.get('near', None)
+    bbox = args.get('bbox', None)
+    k = args.get('k', None)
+    if near is not None and bbox is not None:
+        raise ValueError("Use either near or bbox, not both")
+    if near is not None:
+        if limit is not None or after is not None:
+            raise ValueError("near returns the k nearest users; use k instead of limit/after")
+        near = parse_point(near)
+        try:
+            k = int(k) if k is not None else DEFAULT_NEAREST
+            if not 1 <= k <= MAX_PAGE_SIZE:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Invalid k. Must be an integer between 1 and {MAX_PAGE_SIZE}")
+    elif k is not None:
+        raise ValueError("k is only valid together with near")
+    bbox = parse_bbox(bbox) if bbox is not None else None
+    
+    return UsersQuery(user_type, after, limit, fields, near, k, bbox)
+
+def get_users_page(query: UsersQuery):
+    """Return the cached response for a users query, serializing it on a miss"""
+    # Serialize each query variant once per dataset version
+    store = served_store()
+    return users_response_cache.get_or_build(
+        store.version,
+        query,
+        lambda: build_users_page(store, query)
+    )
+
+class SearchQuery(NamedTuple):
+    """Validated /api/users/search query, also used as the cache key"""
+    terms: Tuple[str, ...]
+    prefix: Optional[str] = None
+    # Prefix mode always answers with one page, even once the last word
+    # is complete and it runs a term search
+    single_page: bool = False
+    user_type: Optional[str] = None
+    after: Optional[int] = None
+    limit: int = DEFAULT_PAGE_SIZE
+    fields: Optional[Tuple[str, ...]] = None
+
+def parse_search_query(args) -> SearchQuery:
+    """
+    Validate and normalize the /api/users/search query parameters
+    
+    Args:
+        args: Mapping of query parameter names to string values
+        
+    Returns:
+        SearchQuery ready for get_search_page
+        
+    Raises:
+        ValueError: With a client-facing message if a parameter is invalid
+    """
+    q = args.get('q', '')
+    terms = tokenize(q)
+    if not terms:
+        raise ValueError("Missing search text. Use q=<words>")
+    if len(terms) > MAX_SEARCH_TERMS:
+        raise ValueError(f"Too many search terms. Maximum is {MAX_SEARCH_TERMS}")
+    
+    mode = args.get('mode', 'match')
+    if mode not in ('match', 'prefix'):
+        raise ValueError("Invalid mode. Valid values are: match, prefix")
+    
+    user_type, after, limit, fields = parse_list_params(args)
+    prefix = None
+    if mode == 'prefix':
+        if after is not None:
+            raise ValueError("prefix mode returns a single page; after is not supported")
+        limit = limit or DEFAULT_SUGGESTIONS
+        # A trailing separator means the last word is complete
+        if q[-1:].isalnum():
+            prefix = terms.pop()
+    return SearchQuery(tuple(terms), prefix, mode == 'prefix', user_type, after,
+                       limit or DEFAULT_PAGE_SIZE, fields)
+
+def build_search_page(store: UserRepository, query: SearchQuery):
+    """Run a search and serialize the matching users with pagination headers"""
+    next_after = None
+    if query.prefix is not None:
+        records = store.autocomplete(query.terms, query.prefix, query.limit, query.user_type)
+    else:
+        records, next_after = store.search(query.terms, query.user_type, query.after, query.limit)
+    headers = {}
+    if next_after is not None and not query.single_page:
+        headers['X-Next-Cursor'] = encode_cursor(next_after)
+    return serialize_users(records, query.fields), headers
+
+def get_search_page(query: SearchQuery):
+    """Return the cached response for a search query, running it on a miss"""
+    store = served_store()
+    return users_response_cache.get_or_build(
+        store.version,
+        ('search', query),
+        lambda: build_search_page(store, query)
+    )
+
+class FacetsQuery(NamedTuple):
+    """Validated /api/users/facets query, also used as the cache key"""
+    facets: Tuple[str, ...] = FACETS
+    user_type: Optional[str] = None
+    # None returns every bucket
+    limit: Optional[int] = DEFAULT_FACET_BUCKETS
+    zip_prefix: int = DEFAULT_ZIP_PREFIX
+
+def parse_facets_query(args) -> FacetsQuery:
+    """
+    Validate and normalize the /api/users/facets query parameters
+    
+    Args:
+        args: Mapping of query parameter names to string values
+        
+    Returns:
+        FacetsQuery ready for get_facets_page
+        
+    Raises:
+        ValueError: With a client-facing message if a parameter is invalid
+    """
+    facets = args.get('facets', None)
+    if facets is None:
+        facets = FACETS
+    else:
+        names = [name.strip() for name in facets.split(',') if name.strip()]
+        unknown = [name for name in names if name not in FACETS]
+        if unknown or not names:
+            raise ValueError(f"Invalid facets. Valid values are: {', '.join(FACETS)}")
+        facets = tuple(name for name in FACETS if name in names)
+    
+    user_type = args.get('userType', None)
+    if user_type:
+        user_type = user_type.upper()
+        if user_type not in [e.value for e in UserType]:
+            raise ValueError("Invalid user type. Valid values are: ACTIVE, INACTIVE")
+    
+    limit = parse_facet_limit(args.get('limit', None))
+    
+    zip_prefix = args.get('zipPrefix', None)
+    try:
+        zip_prefix = int(zip_prefix) if zip_prefix is not None else DEFAULT_ZIP_PREFIX
+        if zip_prefix not in ZIP_PREFIX_LENGTHS:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f"Invalid zipPrefix. Must be an integer between "
+                         f"{ZIP_PREFIX_LENGTHS[0]} and {ZIP_PREFIX_LENGTHS[-1]}")
+    
+    return FacetsQuery(facets, user_type or None, limit, zip_prefix)
+
+def build_facets_page(store: UserRepository, query: FacetsQuery):
+    """Serialize the top buckets of each requested facet from the store's counts"""
+    statuses = store.count_by_status()
+    total = statuses.get(query.user_type, 0) if query.user_type else sum(statuses.values())
+    facets = {}
+    for facet in query.facets:
+        counts = store.facet_counts(facet, query.user_type, query.zip_prefix)
+        facets[facet] = summarize_facet(counts, total, query.limit)
+    return encode_json({"total": total, "facets": facets}), {}
+
+def get_facets_page(query: FacetsQuery):
+    """Return the cached response for a facets query, computing it on a miss"""
+    store = served_store()
+    return users_response_cache.get_or_build(
+        store.version,
+        ('facets', query),
+        lambda: build_facets_page(store, query)
+    )
+
+def filter_users_by_type(store: UserRepository, user_type: Optional[str]) -> List[UserRecord]:
     """
     Filter users based on the user type (ACTIVE or INACTIVE)
-    For this implementation, we'll return all users for any filter since
-    the sample data doesn't include status information
+    Uses the store's status index, so the cost is proportional to the
+    number of matching users rather than the size of the dataset
     
     Args:
-        users: List of user dictionaries
+        store: Indexed user store (UserStore or MmapUserStore)
         user_type: Optional user type filter ('ACTIVE' or 'INACTIVE')
         
     Returns:
-        Filtered list of users (currently returns all users)
+        Filtered list of user records in id order
     """
     if not user_type:
-        return users
+        return store.all()
     
-    # For this sample API, return all users regardless of filter
-    # In a real implementation, you would filter based on user status
-    return users
+    return store.filter_by_status(user_type)
 
 @app.route('/api/users', methods=['GET'])
 def get_users():
@@ -131,37 +865,452 @@ def get_users():
     
     Query Parameters:
         userType (optional): Filter by ACTIVE or INACTIVE users
+        limit (optional): Page size, 1-1000; omit both limit and after
+            to get every matching user
+        after (optional): Opaque cursor from a previous X-Next-Cursor header
+        fields (optional): Comma-separated field paths to return,
+            e.g. id,name,email or id,address.city
+        near (optional): lat,lng - return the k users nearest this point,
+            closest first
+        k (optional): Number of neighbours for near, 1-1000 (default 10)
+        bbox (optional): minLat,minLng,maxLat,maxLng - only users inside
+            the box, in id order (combines with limit/after)
+        
+    Headers:
+        If-None-Match (optional): ETag from a previous response; answered
+            with 304 Not Modified when the data has not changed
         
     Returns:
-        JSON array of users (3 users total)
+        JSON array of users; when more pages remain, X-Next-Cursor and a
+        Link rel="next" header point at the next page
     """
     try:
-        # Get the optional userType query parameter
-        user_type = request.args.get('userType', None)
+        try:
+            query = parse_users_query(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Validate user type if provided
-        if user_type and user_type.upper() not in [e.value for e in UserType]:
-            return jsonify({
-                "error": "Invalid user type. Valid values are: ACTIVE, INACTIVE"
-            }), 400
+        cached = get_users_page(query)
+        response = cached_json_response(cached)
+        if 'X-Next-Cursor' in cached.headers:
+            response.headers['Link'] = next_page_link(cached.headers['X-Next-Cursor'])
+        return response
         
-        # Filter users based on the user type (currently returns all users)
-        filtered_users = filter_users_by_type(SAMPLE_USERS, user_type)
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@app.route('/api/users/search', methods=['GET'])
+def search_users():
+    """
+    Full-text search and type-ahead over name, username, email and company
+    
+    Query Parameters:
+        q (required): Search text; every word must match (case-insensitive)
+        mode (optional): match (default) for whole words, or prefix to also
+            complete the last word as it is being typed
+        userType (optional): Filter by ACTIVE or INACTIVE users
+        limit (optional): Maximum results, 1-1000 (default 100, or 10 in
+            prefix mode)
+        after (optional): Cursor from a previous X-Next-Cursor header
+            (match mode only)
+        fields (optional): Comma-separated field paths to return
+        
+    Returns:
+        JSON array of matching users, in id order for match mode and by
+        completed word for prefix mode
+    """
+    try:
+        try:
+            query = parse_search_query(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        return jsonify(filtered_users), 200
+        cached = get_search_page(query)
+        response = cached_json_response(cached)
+        if 'X-Next-Cursor' in cached.headers:
+            response.headers['Link'] = next_page_link(cached.headers['X-Next-Cursor'])
+        return response
         
     except Exception as e:
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+@app.route('/api/users/facets', methods=['GET'])
+def get_user_facets():
+    """
+    User counts by status, city, zipcode prefix and company name
+    
+    Counts are kept up to date as users change, so the cost depends on the
+    number of distinct values, not the number of users.
+    
+    Query Parameters:
+        facets (optional): Comma-separated subset of status, city, zipcode,
+            company (default all)
+        userType (optional): Only count ACTIVE or INACTIVE users
+        limit (optional): Buckets per facet, 1-1000 (default 10) or all,
+            largest first
+        zipPrefix (optional): Leading zipcode characters to group by, 1-5
+            (default 3)
+        
+    Returns:
+        JSON object with the matching "total" and, per facet, its top
+        "buckets" ({value, count}), the users in the remaining buckets
+        ("other") and the users without a value ("missing")
+    """
+    try:
+        try:
+            query = parse_facets_query(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return cached_json_response(get_facets_page(query))
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@app.route('/api/users/export', methods=['GET'])
+def export_users():
+    """
+    Stream every matching user as newline-delimited JSON
+    
+    Query Parameters:
+        userType (optional): Filter by ACTIVE or INACTIVE users
+        fields (optional): Comma-separated field paths to return
+        
+    Returns:
+        Chunked application/x-ndjson body with one user object per line,
+        in id order; memory use is independent of the dataset size
+    """
+    try:
+        try:
+            user_type, after, limit, fields = parse_list_params(request.args)
+            if after is not None or limit is not None:
+                raise ValueError("Export streams every matching user; limit and after are not supported")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        response = app.response_class(
+            export_ndjson(served_store(), user_type, fields, encode=encode_user),
+            status=200,
+            mimetype='application/x-ndjson'
+        )
+        response.headers['Content-Disposition'] = 'attachment; filename="users.ndjson"'
+        return response
+        
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+# Outcome of an API call shared by the Flask and ASGI servers: status, JSON
+# body (None for an empty response) and extra headers
+ApiResult = Tuple[int, Optional[Dict], Dict[str, str]]
+
+def api_response(status: int, body: Optional[Dict], headers: Dict[str, str]):
+    """Turn an ApiResult into a Flask response"""
+    if body is None:
+        response = app.response_class(status=status)
+    else:
+        response = jsonify(body)
+        response.status_code = status
+    response.headers.update(headers)
+    return response
+
+def batch_lookup(payload) -> ApiResult:
+    """
+    Look up many users by id, username or email
+    
+    Args:
+        payload: Parsed JSON request body (see batch_get_users)
+        
+    Returns:
+        ApiResult with "users" and "missing", or a 400 error
+    """
+    if not isinstance(payload, dict):
+        return 400, {"error": "Request body must be a JSON object"}, {}
+    
+    store = served_store()
+    lookups = (
+        ('ids', int, store.get),
+        ('usernames', str, store.get_by_username),
+        ('emails', str, store.get_by_email),
+    )
+    keys = {}
+    for name, key_type, _ in lookups:
+        values = payload.get(name, [])
+        if not isinstance(values, list) or not all(
+            isinstance(v, key_type) and not isinstance(v, bool) for v in values
+        ):
+            return 400, {
+                "error": f"'{name}' must be a list of {'integers' if key_type is int else 'strings'}"
+            }, {}
+        keys[name] = values
+    
+    total = sum(len(values) for values in keys.values())
+    if total == 0:
+        return 400, {"error": "Provide at least one of: ids, usernames, emails"}, {}
+    if total > MAX_BATCH_SIZE:
+        return 400, {"error": f"Too many keys: {total}. Maximum batch size is {MAX_BATCH_SIZE}"}, {}
+    
+    fields = payload.get('fields')
+    if fields is not None and not isinstance(fields, str):
+        return 400, {"error": "'fields' must be a comma-separated string"}, {}
+    try:
+        fields = parse_fields(fields) if fields is not None else None
+    except ValueError as e:
+        return 400, {"error": str(e)}, {}
+    
+    # Resolve every key through the store's hash indexes
+    found, seen, missing = [], set(), {}
+    for name, _, lookup in lookups:
+        for key in keys[name]:
+            record = lookup_user(store, name, lookup, key)
+            if record is None:
+                missing.setdefault(name, []).append(key)
+            elif record.id not in seen:
+                seen.add(record.id)
+                found.append(record)
+    
+    users = [record.to_dict() for record in found]
+    if fields:
+        users = [project_user(user, fields) for user in users]
+    return 200, {"users": users, "missing": missing}, {}
+
+@app.route('/api/users/batch', methods=['POST'])
+def batch_get_users():
+    """
+    Look up many users by id, username or email in one request
+    
+    Request Body (JSON):
+        ids (optional): List of integer user ids
+        usernames (optional): List of usernames (case-insensitive)
+        emails (optional): List of email addresses (case-insensitive)
+        fields (optional): Comma-separated field paths to return
+        
+    Returns:
+        JSON object with "users" (found records in request order, each user
+        at most once) and "missing" (keys that matched no user, by kind)
+    """
+    try:
+        return api_response(*batch_lookup(request.get_json(silent=True)))
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+# Returned by write endpoints when the store cannot be written through the API
+READ_ONLY_ERROR = ("Writes are only supported by the in-memory store "
+                   "(unset USERS_SNAPSHOT_PATH and USERS_DB_PATH)")
+
+def read_user(user_id: int) -> ApiResult:
+    """Return one user by id, or a 404 error"""
+    record = served_store().get(user_id)
+    if record is None:
+        return 404, {"error": f"User {user_id} not found"}, {}
+    return 200, record.to_dict(), {}
+
+def write_user(op: str, user_id: Optional[int], payload=None) -> ApiResult:
+    """
+    Create, replace or delete a user through the user writer
+    
+    Args:
+        op: "create", "replace" or "delete"
+        user_id: Id from the URL (None for create)
+        payload: Parsed JSON request body, for create and replace
+        
+    Returns:
+        ApiResult: 201/200 with the stored user and its Location, 204 for a
+        delete, or a 400, 404, 405 or 409 error
+    """
+    if not isinstance(user_store, UserStore):
+        # Only the read methods are left on these routes (RFC 9110 15.5.6)
+        return 405, {"error": READ_ONLY_ERROR}, {'Allow': 'GET, HEAD'}
+    if op != "delete" and not isinstance(payload, dict):
+        return 400, {"error": "Request body must be a JSON user object"}, {}
+    try:
+        if op == "create":
+            record = user_writer.create(payload)
+        elif op == "replace":
+            record = user_writer.replace(user_id, payload)
+        else:
+            user_writer.delete(user_id)
+            return 204, None, {}
+    except ValueError as e:
+        return 400, {"error": str(e)}, {}
+    except UserNotFound as e:
+        return 404, {"error": str(e)}, {}
+    except UserExists as e:
+        return 409, {"error": str(e)}, {}
+    finally:
+        # The store published with (or after) this write
+        served_store()
+    return (201 if op == "create" else 200), record.to_dict(), {'Location': f'/api/users/{record.id}'}
+
+@app.route('/api/users/<int:user_id>', methods=['GET'])
+def get_user(user_id: int):
+    """Return one user by id"""
+    try:
+        return api_response(*read_user(user_id))
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@app.route('/api/users', methods=['POST'])
+def create_user():
+    """
+    Create a user
+    
+    Request Body (JSON):
+        A user object in the shape returned by GET /api/users; ``username``
+        and ``email`` are required, ``id`` is optional (a positive integer,
+        assigned when missing) and ``status`` defaults to ACTIVE
+        
+    Returns:
+        201 with the stored user and its Location, 409 if the id, username
+        or email is taken
+    """
+    try:
+        return api_response(*write_user("create", None, request.get_json(silent=True)))
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@app.route('/api/users/<int:user_id>', methods=['PUT'])
+def replace_user(user_id: int):
+    """
+    Replace a user
+    
+    Request Body (JSON):
+        The complete new user object; its ``id`` may be omitted but must
+        otherwise match the URL
+        
+    Returns:
+        200 with the stored user, 404 if there is no such user, 409 if
+        another user has the username or email
+    """
+    try:
+        return api_response(*write_user("replace", user_id, request.get_json(silent=True)))
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@app.route('/api/users/<int:user_id>', methods=['DELETE'])
+def delete_user(user_id: int):
+    """Delete a user; 204 on success, 404 if there is no such user"""
+    try:
+        return api_response(*write_user("delete", user_id))
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+def parse_changes_query(args) -> Tuple[int, int, Optional[Tuple[str, ...]]]:
+    """
+    Validate the /api/users/changes query parameters
+    
+    Returns:
+        Tuple of (since, limit, fields)
+        
+    Raises:
+        ValueError: With a client-facing message if a parameter is invalid
+    """
+    since = args.get('since', None)
+    if since is None:
+        raise ValueError("Missing required parameter: since")
+    try:
+        since = int(since)
+        if since < 0:
+            raise ValueError
+    except ValueError:
+        raise ValueError("Invalid since. Must be a dataset version (a non-negative integer)")
+    limit = args.get('limit', None)
+    try:
+        limit = int(limit) if limit is not None else MAX_PAGE_SIZE
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f"Invalid limit. Must be an integer between 1 and {MAX_PAGE_SIZE}")
+    fields = args.get('fields', None)
+    fields = parse_fields(fields) if fields is not None else None
+    return since, limit, fields
+
+def user_changes(args) -> ApiResult:
+    """
+    Summarize the user changes since a dataset version (see get_user_changes)
+    
+    Args:
+        args: Mapping of query parameter names to string values
+        
+    Returns:
+        ApiResult with the changes or a resync marker, a 400 error, or 501
+        on backends without a change feed
+    """
+    store = served_store()
+    if not isinstance(store, UserStore):
+        return 501, {"error": "The change feed is only supported by the in-memory store"}, {}
+    try:
+        since, limit, fields = parse_changes_query(args)
+    except ValueError as e:
+        return 400, {"error": str(e)}, {}
+    
+    window = change_log.window(since, store.seq, limit)
+    if window is None:
+        return 200, {"resync": True, "version": store.seq}, {}
+    
+    # Records come from the store the window was taken against, so a
+    # user is reported as it is at the returned version
+    def current(user_ids):
+        users = [record.to_dict() for record in map(store.get, user_ids) if record is not None]
+        return [project_user(user, fields) for user in users] if fields else users
+    
+    return 200, {
+        "version": window.version,
+        "inserted": current(window.inserted),
+        "updated": current(window.updated),
+        "deleted": window.deleted,
+        "more": window.more,
+    }, {}
+
+@app.route('/api/users/changes', methods=['GET'])
+def get_user_changes():
+    """
+    Users inserted, updated or deleted since a dataset version
+    
+    Query Parameters:
+        since (required): Version from X-Dataset-Version of a full fetch,
+            or "version" of the previous changes response
+        limit (optional): Most users to return, 1-1000 (default 1000);
+            "more" is true when further changes remain
+        fields (optional): Comma-separated field paths to return
+        
+    Returns:
+        JSON object with the new "version", "inserted" and "updated" users
+        in their current state, "deleted" user ids and "more"; or
+        {"resync": true, "version": ...} when since is no longer covered by
+        the change log and the client has to fetch /api/users again
+    """
+    try:
+        return api_response(*user_changes(request.args))
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics aggregated across every worker process"""
+    return app.response_class(metrics.render(), status=200,
+                              mimetype='text/plain; version=0.0.4')
+
+HEALTH_STATUS = {"status": "healthy", "message": "Users API is running"}
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "message": "Users API is running"}), 200
+    return jsonify(HEALTH_STATUS), 200
 
 @app.route('/', methods=['GET'])
 def home():
     """Root endpoint with API documentation"""
-    documentation = {
+    return cached_json_response(get_docs_response())
+
+# The documentation never changes at runtime, so it is serialized (and
+# compressed on demand) once per process
+docs_response_cache = ResponseCache(max_entries=1)
+
+def get_docs_response():
+    """Return the cached, pre-serialized API documentation"""
+    return docs_response_cache.get_or_build(0, 'docs', lambda: encode_json(api_documentation()))
+
+def api_documentation() -> Dict:
+    """Build the API documentation served from the root endpoint"""
+    return {
         "message": "Users API",
         "version": "1.0.0", 
         "description": "Public API that returns user data with optional filtering",
@@ -175,18 +1324,188 @@ def home():
                         "required": False,
                         "description": "Filter by user type",
                         "enum": ["ACTIVE", "INACTIVE"]
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "required": False,
+                        "description": "Page size (1-1000); enables cursor pagination"
+                    },
+                    "after": {
+                        "type": "string",
+                        "required": False,
+                        "description": "Opaque cursor from the X-Next-Cursor response header"
+                    },
+                    "fields": {
+                        "type": "string",
+                        "required": False,
+                        "description": "Comma-separated field paths to return, e.g. id,name,email"
+                    },
+                    "near": {
+                        "type": "string",
+                        "required": False,
+                        "description": "lat,lng - return the k nearest users, closest first"
+                    },
+                    "k": {
+                        "type": "integer",
+                        "required": False,
+                        "description": "Number of neighbours for near (1-1000, default 10)"
+                    },
+                    "bbox": {
+                        "type": "string",
+                        "required": False,
+                        "description": "minLat,minLng,maxLat,maxLng - users inside the box"
                     }
                 },
                 "examples": {
                     "all_users": "/api/users",
                     "active_only": "/api/users?userType=ACTIVE",
-                    "inactive_only": "/api/users?userType=INACTIVE"
+                    "inactive_only": "/api/users?userType=INACTIVE",
+                    "first_page": "/api/users?limit=100",
+                    "projected": "/api/users?fields=id,name,email",
+                    "nearest": "/api/users?near=-40.0,-35.0&k=5",
+                    "bounding_box": "/api/users?bbox=-50,-50,-30,0"
                 },
-                "note": "Returns 3 users with complete profile information"
+                "note": "Returns users with complete profile information and account status"
+            },
+            "/api/users/search": {
+                "method": "GET",
+                "description": "Search name, username, email and company by whole words or as-you-type prefix",
+                "parameters": {
+                    "q": {
+                        "type": "string",
+                        "required": True,
+                        "description": "Search text; every word must match"
+                    },
+                    "mode": {
+                        "type": "string",
+                        "required": False,
+                        "description": "match (default) or prefix to complete the last word",
+                        "enum": ["match", "prefix"]
+                    },
+                    "userType": {
+                        "type": "string",
+                        "required": False,
+                        "description": "Filter by user type",
+                        "enum": ["ACTIVE", "INACTIVE"]
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "required": False,
+                        "description": "Maximum results (1-1000, default 100, 10 in prefix mode)"
+                    },
+                    "after": {
+                        "type": "string",
+                        "required": False,
+                        "description": "Cursor from X-Next-Cursor (match mode only)"
+                    },
+                    "fields": {
+                        "type": "string",
+                        "required": False,
+                        "description": "Comma-separated field paths to return"
+                    }
+                },
+                "examples": {
+                    "words": "/api/users/search?q=romaguera+crona",
+                    "type_ahead": "/api/users/search?q=lean&mode=prefix&fields=id,name"
+                }
+            },
+            "/api/users/export": {
+                "method": "GET",
+                "description": "Stream all matching users as NDJSON (one JSON object per line)",
+                "parameters": {
+                    "userType": {
+                        "type": "string",
+                        "required": False,
+                        "description": "Filter by user type",
+                        "enum": ["ACTIVE", "INACTIVE"]
+                    },
+                    "fields": {
+                        "type": "string",
+                        "required": False,
+                        "description": "Comma-separated field paths to return"
+                    }
+                }
+            },
+            "/api/users/facets": {
+                "method": "GET",
+                "description": "User counts by status, city, zipcode prefix and company name",
+                "parameters": {
+                    "facets": {
+                        "type": "string",
+                        "required": False,
+                        "description": "Comma-separated subset of status, city, zipcode, company"
+                    },
+                    "userType": {
+                        "type": "string",
+                        "required": False,
+                        "values": ["ACTIVE", "INACTIVE"],
+                        "description": "Only count users of this type"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "required": False,
+                        "description": "Buckets per facet, 1-1000 (default 10) or all"
+                    },
+                    "zipPrefix": {
+                        "type": "integer",
+                        "required": False,
+                        "description": "Leading zipcode characters to group by, 1-5 (default 3)"
+                    }
+                },
+                "response": "Object with total and, per facet, top buckets, other and missing counts"
+            },
+            "/api/users/batch": {
+                "method": "POST",
+                "description": "Look up to 100 users by id, username or email in one request",
+                "body": {
+                    "ids": "array of integers (optional)",
+                    "usernames": "array of strings (optional)",
+                    "emails": "array of strings (optional)",
+                    "fields": "comma-separated field paths (optional)"
+                },
+                "response": "Object with found 'users' and 'missing' keys grouped by kind"
+            },
+            "/api/users (POST)": {
+                "method": "POST",
+                "description": "Create a user; the id is assigned when omitted",
+                "body": "user object in the shape returned by GET /api/users; username and email are required",
+                "response": "201 with the stored user and a Location header; 409 if the id, username or email is taken"
+            },
+            "/api/users/{id}": {
+                "method": "GET, PUT, DELETE",
+                "description": "Read, replace or delete one user",
+                "body": "PUT: the complete new user object",
+                "response": "GET/PUT: the user; DELETE: 204; 404 if there is no such user; 409 if PUT reuses another user's username or email"
+            },
+            "/api/users/changes": {
+                "method": "GET",
+                "description": "Users inserted, updated or deleted since a dataset version",
+                "parameters": {
+                    "since": {
+                        "type": "integer",
+                        "required": True,
+                        "description": "X-Dataset-Version of a full fetch, or version of the last changes response"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "required": False,
+                        "description": "Most users to return, 1-1000 (default 1000)"
+                    },
+                    "fields": {
+                        "type": "string",
+                        "required": False,
+                        "description": "Comma-separated field paths to return"
+                    }
+                },
+                "response": "Object with version, inserted, updated, deleted ids and more; or resync: true"
             },
             "/api/health": {
                 "method": "GET",
                 "description": "Health check endpoint"
+            },
+            "/api/metrics": {
+                "method": "GET",
+                "description": "Request counters and latency histograms in Prometheus text format"
             }
         },
         "sample_response": {
@@ -200,11 +1519,14 @@ def home():
                 "address": "object - Address details with street, suite, city, zipcode, and geo coordinates",
                 "phone": "string - Phone number",
                 "website": "string - Website",
+                "status": "string - Account status (ACTIVE or INACTIVE)",
                 "company": "object - Company details with name, catchPhrase, and bs"
             }
         }
     }
-    return jsonify(documentation), 200
+
+startup.mark("routes")
+startup.finish()
 
 if __name__ == '__main__':
     # Configuration for public access
@@ -223,10 +1545,22 @@ if __name__ == '__main__':
     print(f"API will be accessible at: http://0.0.0.0:{port}")
     print("API Endpoints:")
     print(f"  - GET /api/users (returns 3 users, optional ?userType=ACTIVE|INACTIVE)")
+    print(f"  - GET /api/users/search?q=...[&mode=prefix]")
+    print(f"  - GET /api/users/export (NDJSON stream)")
+    print(f"  - GET /api/users/facets[?facets=...&userType=...]")
+    print(f"  - POST /api/users/batch")
+    print(f"  - POST /api/users, GET|PUT|DELETE /api/users/<id>")
+    print(f"  - GET /api/users/changes?since=<version>")
     print(f"  - GET /api/health")
+    print(f"  - GET /api/metrics")
     print(f"  - GET /")
     print("Response: Array of 3 user objects with complete profile data")
     
+    warm_user_indexes(background=True)
+    # Pick up changes to USERS_DATA_PATH without a restart
+    start_dataset_reloader()
+    start_write_log_follower()
+    
     app.run(
         host='0.0.0.0',  # Bind to all network interfaces for public access
         port=port,
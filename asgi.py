@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point for the Users API
+Serves the same routes as the Flask app (list, search, facets and export
+reads, batch lookups, single-user reads and writes, the change feed, health,
+metrics and /) from the same user store, writer, response cache and metrics
+registry, on an asyncio event loop so idle keep-alive connections cost no
+worker
+
+Usage:
+    python asgi.py                      # run with uvicorn on $PORT
+    uvicorn asgi:application --port 5000
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from app import (
+    HEALTH_STATUS, NO_STORE_HEADERS, SECURITY_HEADERS, ApiResult, batch_lookup, check_admission,
+    encode_json, encode_user, get_docs_response, get_facets_page, get_search_page,
+    get_users_page, load_shedder, log_access, metrics, parse_facets_query, parse_list_params,
+    parse_search_query, parse_users_query, read_user, user_changes, users_response_cache,
+    write_user
+)
+import app as users_api
+from response_cache import CachedResponse, negotiate_encoding
+from user_ndjson import export_ndjson
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+}
+
+CORS_PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Methods': 'DELETE, GET, OPTIONS, POST, PUT',
+    'Access-Control-Allow-Headers': 'Access-Control-Allow-Credentials, Authorization, Content-Type',
+}
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+async def send_response(send, status: int, body: bytes = b'',
+                        headers: Optional[Dict[str, str]] = None,
+                        cacheable: bool = False, head: bool = False) -> None:
+    """Send a complete response with the same default headers as the Flask app"""
+    merged = dict(CORS_HEADERS)
+    merged.update(headers or {})
+    merged.update(SECURITY_HEADERS)
+    if not cacheable:
+        merged.update(NO_STORE_HEADERS)
+    raw: Headers = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in merged.items()]
+    if status not in (204, 304):
+        raw.append((b'content-length', str(len(body)).encode('ascii')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw})
+    await send({'type': 'http.response.body', 'body': b'' if head or status == 304 else body})
+
+
+async def send_json(send, status: int, data, head: bool = False,
+                    headers: Optional[Dict[str, str]] = None) -> None:
+    await send_response(send, status, encode_json(data),
+                        {'Content-Type': 'application/json', **(headers or {})}, head=head)
+
+
+async def send_result(send, result: ApiResult, head: bool) -> None:
+    """Send an ApiResult from the handlers shared with the Flask app"""
+    status, body, headers = result
+    if body is None:
+        await send_response(send, status, headers=headers, head=head)
+    else:
+        await send_json(send, status, body, head, headers)
+
+
+async def read_json(receive, headers: Dict[str, str]) -> Any:
+    """
+    Read the request body and parse it like Flask's get_json(silent=True)
+
+    Returns:
+        The parsed value, or None unless the body is valid JSON sent with a
+        JSON content type
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    mimetype = headers.get('content-type', '').split(';')[0].strip().lower()
+    if mimetype != 'application/json' and not (mimetype.startswith('application/')
+                                              and mimetype.endswith('+json')):
+        return None
+    try:
+        return json.loads(b''.join(chunks))
+    except ValueError:
+        return None
+
+
+# Cached list endpoints: (query parser, page builder, response cache key)
+LIST_ENDPOINTS = {
+    '/api/users': (parse_users_query, get_users_page, lambda query: query),
+    '/api/users/search': (parse_search_query, get_search_page, lambda query: ('search', query)),
+    '/api/users/facets': (parse_facets_query, get_facets_page, lambda query: ('facets', query)),
+}
+
+
+async def users_endpoint(scope, send, headers: Dict[str, str], head: bool) -> None:
+    """GET /api/users, /api/users/search and /api/users/facets - see the app's handlers"""
+    parse, get_page, cache_key = LIST_ENDPOINTS[scope['path']]
+    args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+    try:
+        query = parse(args)
+    except ValueError as e:
+        await send_json(send, 400, {"error": str(e)}, head)
+        return
+
+    cached = users_response_cache.peek(users_api.served_store().version, cache_key(query))
+    if cached is None:
+        # Serialize off the event loop so a cache miss never stalls other connections
+        cached = await asyncio.to_thread(get_page, query)
+
+    extra = {}
+    if 'X-Next-Cursor' in cached.headers:
+        args['after'] = cached.headers['X-Next-Cursor']
+        scheme = scope.get('scheme', 'http')
+        host = headers.get('host', 'localhost')
+        extra['Link'] = f'<{scheme}://{host}{scope["path"]}?{urlencode(args)}>; rel="next"'
+    await send_cached(send, cached, headers, head, extra)
+
+
+async def export_endpoint(scope, send, head: bool) -> None:
+    """GET /api/users/export - see app.export_users"""
+    args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+    try:
+        user_type, after, limit, fields = parse_list_params(args)
+        if after is not None or limit is not None:
+            raise ValueError("Export streams every matching user; limit and after are not supported")
+    except ValueError as e:
+        await send_json(send, 400, {"error": str(e)}, head)
+        return
+
+    store = users_api.served_store()
+    headers = dict(CORS_HEADERS)
+    headers.update(SECURITY_HEADERS)
+    headers.update(NO_STORE_HEADERS)
+    headers['Content-Type'] = 'application/x-ndjson'
+    headers['Content-Disposition'] = 'attachment; filename="users.ndjson"'
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(k.lower().encode('latin-1'), v.encode('latin-1'))
+                            for k, v in headers.items()]})
+    if not head:
+        chunks = export_ndjson(store, user_type, fields, encode=encode_user)
+        # Each chunk is read from the store off the event loop
+        while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def send_cached(send, cached: CachedResponse, headers: Dict[str, str], head: bool,
+                      extra: Optional[Dict[str, str]] = None) -> None:
+    """Send a cached body with conditional GET and content negotiation"""
+    encoding = negotiate_encoding(headers.get('accept-encoding'))
+    response_headers = {'ETag': cached.etag_for(encoding), 'Vary': 'Accept-Encoding',
+                        'Cache-Control': 'no-cache'}
+    response_headers.update(cached.headers)
+    response_headers.update(extra or {})
+    if cached.matches(headers.get('if-none-match')):
+        # A 304 needs only the validator, so nothing is compressed for it
+        await send_response(send, 304, headers=response_headers, cacheable=True)
+        return
+    if cached.needs_compression(encoding) and len(cached.body) >= 1 << 16:
+        # Compress large bodies off the event loop; later requests reuse the result
+        await asyncio.to_thread(cached.representation, encoding)
+    body, _, encoding = cached.representation(encoding)
+    response_headers['Content-Type'] = 'application/json'
+    if encoding:
+        response_headers['Content-Encoding'] = encoding
+    await send_response(send, 200, body, response_headers, cacheable=True, head=head)
+
+
+async def lifespan(receive, send) -> None:
+    reloader = None
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            users_api.warm_user_indexes(background=True)
+            # Each uvicorn worker rebuilds its own dataset when the data file
+            # changes, and follows the writes the other workers log
+            reloader = users_api.start_dataset_reloader()
+            users_api.start_write_log_follower()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if reloader is not None:
+                await asyncio.to_thread(reloader.stop)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+# Methods served per route; /api/users/<id> is matched by USER_PATH
+ROUTES = {
+    '/api/users': ('GET', 'HEAD', 'POST'),
+    '/api/users/search': ('GET', 'HEAD'),
+    '/api/users/facets': ('GET', 'HEAD'),
+    '/api/users/export': ('GET', 'HEAD'),
+    '/api/users/batch': ('POST',),
+    '/api/users/changes': ('GET', 'HEAD'),
+    '/api/health': ('GET', 'HEAD'),
+    '/api/metrics': ('GET', 'HEAD'),
+    '/': ('GET', 'HEAD'),
+}
+
+# Single-user route, labelled in metrics like the Flask rule
+USER_PATH = re.compile(r'/api/users/(\d+)')
+USER_ROUTE = '/api/users/<int:user_id>'
+USER_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE')
+
+
+def match_route(path: str) -> Tuple[Optional[str], Tuple[str, ...], Optional[int]]:
+    """
+    Find the route serving a path
+
+    Returns:
+        Tuple of (route label or None if unknown, allowed methods, user id
+        for /api/users/<id>)
+    """
+    match = USER_PATH.fullmatch(path)
+    if match:
+        return USER_ROUTE, USER_METHODS, int(match.group(1))
+    if path in ROUTES:
+        return path, ROUTES[path], None
+    return None, (), None
+
+
+async def application(scope, receive, send) -> None:
+    """ASGI 3 application serving the Users API routes"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    started = time.perf_counter()
+    status_code = 500
+    sent_bytes = 0
+
+    async def timed_send(message) -> None:
+        nonlocal status_code, sent_bytes
+        if message['type'] == 'http.response.body':
+            sent_bytes += len(message.get('body', b''))
+        elif message['type'] == 'http.response.start':
+            status_code = message['status']
+            users_api.startup.first_response(scope['method'], scope['path'])
+            duration_ms = (time.perf_counter() - started) * 1000
+            message['headers'] = list(message['headers']) + [
+                (b'server-timing', f'app;dur={duration_ms:.2f}'.encode('ascii'))
+            ]
+        await send(message)
+
+    # A Flask app context gives the shared handlers a per-request ``g``;
+    # asyncio.to_thread copies the context, so threads see the same one
+    with users_api.app.app_context():
+        try:
+            await dispatch(scope, receive, timed_send)
+        finally:
+            route = match_route(scope['path'])[0] or 'unmatched'
+            duration = time.perf_counter() - started
+            metrics.observe_request(route, scope['method'], status_code, duration)
+            client = scope.get('client')
+            log_access(scope['method'], scope['path'], route, status_code, duration, sent_bytes,
+                       client[0] if client else None)
+
+
+async def dispatch(scope, receive, send) -> None:
+    """Route one HTTP request to its handler"""
+    method = scope['method']
+    path = scope['path']
+    headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope.get('headers', [])}
+    head = method == 'HEAD'
+
+    route, methods, user_id = match_route(path)
+    if route is None:
+        await send_json(send, 404, {"error": "Not found"}, head)
+        return
+    if method == 'OPTIONS':
+        await send_response(send, 200, headers=CORS_PREFLIGHT_HEADERS)
+        return
+    if method not in methods:
+        await send_json(send, 405, {"error": "Method not allowed"}, head,
+                        {'Allow': ', '.join(methods + ('OPTIONS',))})
+        return
+
+    client = scope.get('client')
+    in_flight, rejection = check_admission(path, headers, client[0] if client else None)
+    if rejection is not None:
+        status, body, extra = rejection
+        await send_response(send, status, encode_json(body),
+                            {'Content-Type': 'application/json', **extra}, head=head)
+        return
+
+    try:
+        # Uncached handlers shared with the Flask app; they may block on the
+        # store or, for writes, on the write-ahead log's fsync
+        if user_id is not None:
+            if method == 'PUT':
+                payload = await read_json(receive, headers)
+                result = await asyncio.to_thread(write_user, 'replace', user_id, payload)
+            elif method == 'DELETE':
+                result = await asyncio.to_thread(write_user, 'delete', user_id)
+            else:
+                result = await asyncio.to_thread(read_user, user_id)
+            await send_result(send, result, head)
+        elif method == 'POST':
+            payload = await read_json(receive, headers)
+            if path == '/api/users/batch':
+                result = await asyncio.to_thread(batch_lookup, payload)
+            else:
+                result = await asyncio.to_thread(write_user, 'create', None, payload)
+            await send_result(send, result, head)
+        elif path == '/api/users/changes':
+            args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'),
+                                  keep_blank_values=True))
+            await send_result(send, await asyncio.to_thread(user_changes, args), head)
+        elif path in LIST_ENDPOINTS:
+            await users_endpoint(scope, send, headers, head)
+        elif path == '/api/users/export':
+            await export_endpoint(scope, send, head)
+        elif path == '/api/health':
+            await send_json(send, 200, HEALTH_STATUS, head)
+        elif path == '/api/metrics':
+            body = (await asyncio.to_thread(metrics.render)).encode('utf-8')
+            await send_response(send, 200, body,
+                                {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}, head=head)
+        else:
+            await send_cached(send, get_docs_response(), headers, head)
+    except Exception as e:
+        await send_json(send, 500, {"error": f"Internal server error: {str(e)}"}, head)
+    finally:
+        if in_flight:
+            load_shedder.release()
+
+
+def main():
+    """Run the ASGI app with uvicorn, configured from the environment"""
+    try:
+        import uvicorn
+    except ImportError as e:
+        print(f"✗ Missing dependency: {e}")
+        print("Please run: pip install -r requirements.txt")
+        sys.exit(1)
+
+    port = int(os.environ.get('PORT', 5000))
+    workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+    keepalive = int(os.environ.get('KEEPALIVE_TIMEOUT', 75))
+
+    print(f"Starting Users API (ASGI) on port {port} with {workers} worker(s)")
+    uvicorn.run(
+        'asgi:application',
+        host='0.0.0.0',          # Bind to all network interfaces for public access
+        port=port,
+        workers=workers,
+        backlog=2048,
+        timeout_keep_alive=keepalive,  # Idle keep-alive connections are cheap here
+        lifespan='on',
+        log_level=os.environ.get('LOG_LEVEL', 'info'),
+        # With STRUCTURED_LOG set the app writes its own non-blocking access log
+        access_log=not users_api.STRUCTURED_LOG,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Adaptive worker autoscaling for gunicorn
+Sizes the initial worker pool from the CPUs the process may actually use,
+then samples request busy time and the listen backlog from the master and
+asks the arbiter for one worker more or less (SIGTTIN / SIGTTOU) at a time,
+within configured bounds
+"""
+
+import logging
+import math
+import os
+import signal
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds between scaling decisions when AUTOSCALE_INTERVAL is unset
+DEFAULT_INTERVAL = 5.0
+
+# Seconds to wait after a change before the next one, and how long the pool
+# must stay idle before a worker is removed
+DEFAULT_COOLDOWN = 15.0
+
+# Busy ratio (request seconds per worker thread per second) above which a
+# worker is added, and below which the pool counts as idle
+DEFAULT_SCALE_UP_BUSY = 0.75
+DEFAULT_SCALE_DOWN_BUSY = 0.3
+
+# Waiting connections per worker in the accept queue that trigger a scale-up
+DEFAULT_BACKLOG_PER_WORKER = 1.0
+
+# Seconds between backlog samples within one interval (the peak is used)
+_BACKLOG_SAMPLE_INTERVAL = 1.0
+
+
+def available_cpus() -> float:
+    """
+    CPUs this process may use, honoring affinity and container CPU quotas
+
+    Free-tier containers often see every host core through os.cpu_count()
+    while their cgroup only grants a fraction of one.
+    """
+    try:
+        cpus: float = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, quota)
+    return cpus
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    # cgroup v1: quota of -1 means unlimited
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def worker_bounds(cpus: Optional[float] = None) -> Tuple[int, int, int]:
+    """
+    Default (initial, minimum, maximum) worker counts for a CPU budget
+
+    Starts at the usual 2 * cores + 1, keeps at least one worker per core
+    and allows up to twice the initial pool under sustained load.
+    """
+    cpus = available_cpus() if cpus is None else cpus
+    initial = 2 * max(1, math.ceil(cpus)) + 1
+    minimum = max(1, math.floor(cpus))
+    return initial, minimum, initial * 2
+
+
+class WorkerAutoscaler:
+    """
+    Grow or shrink a gunicorn worker pool from the master process
+
+    Every ``interval`` seconds the busy ratio is computed from the increase
+    in total request seconds (summed over all workers by ``busy_seconds``)
+    divided by the worker threads available. A worker is added when the
+    ratio reaches ``scale_up_busy`` or when more than
+    ``backlog_per_worker`` connections per worker wait in the accept queue.
+    One is removed only after the pool has stayed below ``scale_down_busy``
+    with an empty queue for ``cooldown`` seconds. Changes are at most one
+    worker per ``cooldown`` and always stay within [min_workers,
+    max_workers].
+    """
+
+    def __init__(self, min_workers: int, max_workers: int,
+                 busy_seconds: Callable[[], float],
+                 backlog: Callable[[], Optional[int]] = lambda: None,
+                 threads: int = 1,
+                 interval: float = DEFAULT_INTERVAL,
+                 cooldown: float = DEFAULT_COOLDOWN,
+                 scale_up_busy: float = DEFAULT_SCALE_UP_BUSY,
+                 scale_down_busy: float = DEFAULT_SCALE_DOWN_BUSY,
+                 backlog_per_worker: float = DEFAULT_BACKLOG_PER_WORKER):
+        if not 1 <= min_workers <= max_workers:
+            raise ValueError(f"Invalid worker bounds: min {min_workers}, max {max_workers}")
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.busy_seconds = busy_seconds
+        self.backlog = backlog
+        self.threads = max(1, threads)
+        self.interval = interval
+        self.cooldown = cooldown
+        self.scale_up_busy = scale_up_busy
+        self.scale_down_busy = scale_down_busy
+        self.backlog_per_worker = backlog_per_worker
+        self._last_change = float("-inf")
+        self._idle_since: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def decide(self, workers: int, busy: float, backlog: Optional[int],
+               now: Optional[float] = None) -> Tuple[int, str]:
+        """
+        Choose the next step for the pool from one interval's measurements
+
+        Args:
+            workers: Current number of workers
+            busy: Busy ratio over the interval (0 = idle, 1 = saturated)
+            backlog: Peak accept queue length, or None if unknown
+            now: Monotonic time of the decision
+
+        Returns:
+            Tuple of (+1, -1 or 0, reason)
+        """
+        now = time.monotonic() if now is None else now
+        if workers < self.min_workers:
+            return 1, f"below minimum of {self.min_workers}"
+        if workers > self.max_workers:
+            return -1, f"above maximum of {self.max_workers}"
+
+        queued = backlog or 0
+        overloaded = queued > self.backlog_per_worker * workers
+        if busy >= self.scale_up_busy or overloaded:
+            self._idle_since = None
+            if workers >= self.max_workers:
+                return 0, f"saturated at maximum of {self.max_workers}"
+            if now - self._last_change < self.cooldown:
+                return 0, "cooling down"
+            return 1, "connections queued" if overloaded else "workers busy"
+
+        if busy > self.scale_down_busy or queued:
+            self._idle_since = None
+            return 0, "steady"
+        if self._idle_since is None:
+            self._idle_since = now
+        if workers <= self.min_workers:
+            return 0, "idle at minimum"
+        if now - max(self._idle_since, self._last_change) < self.cooldown:
+            return 0, "idle, waiting out cooldown"
+        return -1, "idle"
+
+    def record_change(self, now: Optional[float] = None) -> None:
+        """Start a cooldown period after the pool size changed"""
+        self._last_change = time.monotonic() if now is None else now
+        self._idle_since = None
+
+    def start(self, server) -> "WorkerAutoscaler":
+        """Start the control loop for a gunicorn arbiter in a daemon thread"""
+        # Give the initial pool a full cooldown before judging it
+        self.record_change()
+        self._thread = threading.Thread(target=self._run, args=(server,),
+                                        name="autoscaler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the control loop"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, server) -> None:
+        previous = self._read_busy_seconds() or 0.0
+        previous_time = time.monotonic()
+        while not self._stop.is_set():
+            # Peak backlog over the interval; a single sample misses bursts
+            peak: Optional[int] = None
+            deadline = previous_time + self.interval
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                depth = self.backlog()
+                if depth is not None:
+                    peak = depth if peak is None else max(peak, depth)
+                self._stop.wait(min(_BACKLOG_SAMPLE_INTERVAL, max(0.0, deadline - time.monotonic())))
+            if self._stop.is_set():
+                return
+
+            workers = server.num_workers
+            total = self._read_busy_seconds()
+            now = time.monotonic()
+            if total is None:
+                total = previous
+            # Clamp: counters of exiting workers are briefly counted twice while archived
+            busy = max(0.0, total - previous) / ((now - previous_time) * workers * self.threads)
+            previous, previous_time = total, now
+
+            step, reason = self.decide(workers, busy, peak, now)
+            if step:
+                server.log.info("Autoscaler: %s worker (%d -> %d): %s, busy %.0f%%, backlog %s",
+                                "adding" if step > 0 else "removing", workers,
+                                workers + step, reason, busy * 100, "n/a" if peak is None else peak)
+                self.record_change(now)
+                os.kill(server.pid, signal.SIGTTIN if step > 0 else signal.SIGTTOU)
+            else:
+                server.log.debug("Autoscaler: keeping %d workers: %s, busy %.0f%%, backlog %s",
+                                 workers, reason, busy * 100, "n/a" if peak is None else peak)
+
+    def _read_busy_seconds(self) -> Optional[float]:
+        try:
+            return self.busy_seconds()
+        except Exception:
+            logger.exception("Autoscaler could not read request metrics")
+            return None
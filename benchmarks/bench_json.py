@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+JSON encoding benchmark
+Compares encode throughput for user records: the stdlib provider walking
+to_dict() output, the schema-specialized UserRecord.to_json encoder, and
+orjson (when installed) through FastJSONProvider
+
+Records are encoded in pages of --page users, like /api/users responses,
+so memory stays bounded at 1M records.
+
+Usage: python benchmarks/bench_json.py [--sizes 10000 1000000] [--page 10000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from benchmarks.datagen import generate_users  # noqa: E402
+from json_provider import FastJSONProvider, orjson  # noqa: E402
+from user_record import UserRecord  # noqa: E402
+
+
+def encoders():
+    app = Flask(__name__)
+    stdlib = FastJSONProvider(app, use_orjson=False)
+    result = {
+        "stdlib json (to_dict)": lambda page: stdlib.dumps_bytes(
+            [r.to_dict() for r in page], separators=(",", ":")),
+        "specialized to_json": stdlib.dumps_records,
+    }
+    if orjson is not None:
+        fast = FastJSONProvider(app)
+        result["orjson (to_dict)"] = lambda page: fast.dumps_bytes(
+            [r.to_dict() for r in page], separators=(",", ":"))
+    return result
+
+
+def run(records, encode, page_size):
+    gc.collect()
+    size = 0
+    start = time.perf_counter()
+    for i in range(0, len(records), page_size):
+        size += len(encode(records[i:i + page_size]))
+    return time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark user JSON encoders")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--page", type=int, default=10_000, help="records per encoded page")
+    args = parser.parse_args()
+
+    candidates = encoders()
+    if orjson is None:
+        print("ℹ️  orjson is not installed; only stdlib encoders are compared")
+
+    for count in args.sizes:
+        records = [UserRecord.from_dict(u) for u in generate_users(count)]
+        # Every encoder must agree byte for byte on this ASCII data
+        sample = records[:100]
+        outputs = {name: encode(sample) for name, encode in candidates.items()}
+        expected = json.dumps([r.to_dict() for r in sample], sort_keys=True,
+                              separators=(",", ":")).encode()
+
+        print("=" * 64)
+        print(f"JSON ENCODE - {count:,} records, pages of {args.page:,}")
+        print("=" * 64)
+        print(f"{'encoder':<26}{'seconds':>10}{'records/s':>14}{'MB/s':>10}")
+        baseline = None
+        for name, encode in candidates.items():
+            elapsed, size = run(records, encode, args.page)
+            baseline = baseline or elapsed
+            print(f"{name:<26}{elapsed:>10.3f}{count / elapsed:>14,.0f}{size / elapsed / 1e6:>10.1f}"
+                  f"   {baseline / elapsed:.1f}x"
+                  + ("" if outputs[name] == expected else "  ❌ output differs"))
+        del records
+
+
+if __name__ == "__main__":
+    main()
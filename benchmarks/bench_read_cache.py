@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Read-through cache benchmark
+Runs many threads of skewed (Zipf-like) key lookups against a simulated slow
+backend, with and without single-flight coalescing, and reports backend
+fetches, throughput and cache stats
+
+Usage: python benchmarks/bench_read_cache.py [--threads T] [--lookups N]
+       [--keys K] [--latency-ms MS] [--ttl SECONDS]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from read_cache import ReadThroughCache  # noqa: E402
+
+
+class SlowBackend:
+    """Counts fetches and sleeps to stand in for a network or disk round trip"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.fetches = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, key):
+        with self._lock:
+            self.fetches += 1
+        time.sleep(self.latency)
+        return {"id": key, "name": f"user {key}"}
+
+
+class NaiveCache:
+    """Check-then-load cache without coalescing, as a baseline"""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self._entries = {}
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            value = self._entries[key] = self.loader(key)
+        return value
+
+
+def run(cache, threads: int, lookups: int, keys: int, seed: int) -> float:
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        sample = rng.choices(range(keys), weights=weights, k=lookups)
+        barrier.wait()
+        for key in sample:
+            cache.get(key)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the read-through cache")
+    parser.add_argument("--threads", type=int, default=100, help="concurrent readers")
+    parser.add_argument("--lookups", type=int, default=200, help="lookups per thread")
+    parser.add_argument("--keys", type=int, default=1000, help="distinct keys")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="backend fetch latency")
+    parser.add_argument("--ttl", type=float, default=None, help="entry TTL in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    total = args.threads * args.lookups
+    print(f"📊 {args.threads} threads x {args.lookups} lookups over {args.keys} keys, "
+          f"{args.latency_ms:g} ms backend latency")
+    print(f"{'cache':<28}{'fetches':>10}{'seconds':>10}{'lookups/s':>12}")
+
+    for label, make in (
+        ("naive (no coalescing)", NaiveCache),
+        ("read-through, single-flight", lambda loader: ReadThroughCache(loader, ttl=args.ttl)),
+    ):
+        backend = SlowBackend(args.latency_ms / 1000)
+        cache = make(backend.fetch)
+        elapsed = run(cache, args.threads, args.lookups, args.keys, args.seed)
+        print(f"{label:<28}{backend.fetches:>10}{elapsed:>10.2f}{total / elapsed:>12,.0f}")
+        if isinstance(cache, ReadThroughCache):
+            print(f"   stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
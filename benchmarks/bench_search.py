@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Search benchmark
+Times whole-word and prefix (type-ahead) queries on SearchIndex against a
+linear scan of the same records, and checks that both agree
+
+Usage: python benchmarks/bench_search.py [--users N] [--repeat R] [--limit L]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.datagen import generate_users  # noqa: E402
+from search_index import SearchIndex, document_terms, tokenize  # noqa: E402
+from user_record import UserRecord  # noqa: E402
+
+# (label, query text, prefix mode)
+QUERIES = (
+    ("rare word", "clementina", False),
+    ("common word", "interface", False),
+    ("two words", "leanne graham", False),
+    ("three words", "romaguera crona neural", False),
+    ("no match", "zzzz", False),
+    ("prefix 2 chars", "le", True),
+    ("prefix 4 chars", "clem", True),
+    ("word + prefix", "graham rom", True),
+    ("username prefix", "leanne12", True),
+)
+
+
+def scan(records, terms, prefix, limit):
+    """Baseline: tokenize every record until enough matches are found"""
+    result = []
+    for record in records:
+        doc = document_terms(record)
+        if all(t in doc for t in terms) and (
+                prefix is None or any(t.startswith(prefix) for t in doc)):
+            result.append(record.id)
+            if len(result) == limit:
+                break
+    return result
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark user search queries")
+    parser.add_argument("--users", type=int, default=1_000_000, help="number of synthetic users")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per indexed query")
+    parser.add_argument("--limit", type=int, default=10, help="results per query")
+    args = parser.parse_args()
+
+    records = [UserRecord.from_dict(u) for u in generate_users(args.users)]
+
+    print("=" * 76)
+    print(f"SEARCH BENCHMARK - {args.users:,} users, limit {args.limit}")
+    print("=" * 76)
+    start = time.perf_counter()
+    index = SearchIndex()
+    for record in records:
+        index.add(record.id, document_terms(record))
+    index.merge_pending()
+    print(f"index build: {time.perf_counter() - start:.2f} s, {len(index):,} terms")
+    print("-" * 76)
+    print(f"{'query':<18}{'index p50 ms':>14}{'index max ms':>14}{'scan ms':>12}{'speedup':>14}")
+
+    mismatches = 0
+    for label, text, prefix_mode in QUERIES:
+        terms = tokenize(text)
+        prefix = terms.pop() if prefix_mode else None
+        if prefix is None:
+            run = lambda: index.match(terms, limit=args.limit)[0]
+        else:
+            run = lambda: index.complete(terms, prefix, args.limit)
+        found, p50, worst = measure(run, args.repeat)
+        expected, scan_ms, _ = measure(lambda: scan(records, terms, prefix, args.limit), 1)
+        # Prefix results are ordered by completed word, so compare as sets
+        # only when the scan found fewer than a full page
+        if prefix is None:
+            ok = found == expected
+        else:
+            ok = len(found) == len(expected) and all(
+                any(t.startswith(prefix) for t in document_terms(records[i - 1])) for i in found)
+        mismatches += not ok
+        print(f"{label:<18}{p50:>14.3f}{worst:>14.3f}{scan_ms:>12,.1f}{scan_ms / max(p50, 1e-6):>13,.0f}x"
+              f"{'' if ok else '  ❌'}")
+
+    print("-" * 76)
+    print("✅ Results match the linear scan" if not mismatches
+          else f"❌ {mismatches} queries differ from the linear scan")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Spatial query benchmark
+Times k-nearest-neighbour and bounding-box queries on GridSpatialIndex
+against a brute-force scan over the same points, and checks that both
+return identical results
+
+Usage: python benchmarks/bench_spatial.py [--points N] [--queries Q] [--k K]
+"""
+
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spatial_index import GridSpatialIndex, haversine_km  # noqa: E402
+
+
+def brute_nearest(points, lat, lng, k):
+    return heapq.nsmallest(k, ((haversine_km(lat, lng, plat, plng), uid)
+                               for uid, plat, plng in points))
+
+
+def brute_bbox(points, min_lat, min_lng, max_lat, max_lng):
+    return [uid for uid, plat, plng in points
+            if min_lat <= plat <= max_lat and min_lng <= plng <= max_lng]
+
+
+def timed(label, fn, queries):
+    start = time.perf_counter()
+    results = [fn(*q) for q in queries]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed / len(queries) * 1000:>12.3f} ms/query")
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark spatial user queries")
+    parser.add_argument("--points", type=int, default=1_000_000, help="number of indexed points")
+    parser.add_argument("--queries", type=int, default=50, help="queries per measurement")
+    parser.add_argument("--k", type=int, default=10, help="neighbours per kNN query")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    points = [(i, rng.uniform(-90, 90), rng.uniform(-180, 180)) for i in range(1, args.points + 1)]
+
+    print("=" * 60)
+    print(f"SPATIAL BENCHMARK - {args.points:,} points")
+    print("=" * 60)
+    start = time.perf_counter()
+    index = GridSpatialIndex()
+    index.add_many(points)
+    print(f"{'grid build':<28}{time.perf_counter() - start:>12.2f} s")
+
+    near = [(rng.uniform(-90, 90), rng.uniform(-180, 180), args.k) for _ in range(args.queries)]
+    boxes = []
+    for _ in range(args.queries):
+        lat, lng = rng.uniform(-85, 80), rng.uniform(-180, 175)
+        boxes.append((lat, lng, lat + 5, lng + 5))
+
+    print("-" * 60)
+    grid_knn, grid_knn_s = timed("kNN grid", index.nearest, near)
+    brute_knn, brute_knn_s = timed("kNN brute force", lambda *q: brute_nearest(points, *q), near)
+    grid_box, grid_box_s = timed("bbox grid", index.within_bbox, boxes)
+    brute_box, brute_box_s = timed("bbox brute force", lambda *q: brute_bbox(points, *q), boxes)
+
+    print("-" * 60)
+    print(f"kNN speedup:  {brute_knn_s / grid_knn_s:,.0f}x")
+    print(f"bbox speedup: {brute_box_s / grid_box_s:,.0f}x")
+    same = ([[uid for _, uid in r] for r in grid_knn] == [[uid for _, uid in r] for r in brute_knn]
+            and grid_box == brute_box)
+    print("✅ Results match brute force" if same else "❌ Results differ from brute force")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+SQLite backend benchmark
+Times the UserRepository queries the API issues against a SqliteUserStore,
+then measures lookup throughput with several reader threads sharing the
+store through their pooled connections
+
+Usage: python benchmarks/bench_sqlite.py [--users N] [--db PATH] [--threads 1 4 8]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.datagen import generate_users  # noqa: E402
+from search_index import tokenize  # noqa: E402
+from sqlite_store import SqliteUserStore  # noqa: E402
+
+BATCH = 5000
+
+
+def build(path: str, users: int) -> SqliteUserStore:
+    """Open the database, (re)filling it when it doesn't hold the requested users"""
+    store = SqliteUserStore(path)
+    if len(store) != users:
+        store.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+        store = SqliteUserStore(path)
+        start = time.perf_counter()
+        batch = []
+        for user in generate_users(users):
+            batch.append(user)
+            if len(batch) == BATCH:
+                store.add_many(batch)
+                batch = []
+        store.add_many(batch)
+        elapsed = time.perf_counter() - start
+        print(f"📥 Loaded {users:,} users in {elapsed:.1f}s ({users / elapsed:,.0f} users/s)")
+    return store
+
+
+def measure(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite user store")
+    parser.add_argument("--users", type=int, default=300_000, help="number of synthetic users")
+    parser.add_argument("--db", default="/tmp/users_bench.db", help="database file (reused if it matches)")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per query")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8],
+                        help="reader thread counts for the throughput test")
+    args = parser.parse_args()
+
+    store = build(args.db, args.users)
+    rng = random.Random(7)
+    sample = store.get(rng.randrange(1, args.users))
+    middle = args.users // 2
+
+    queries = (
+        ("page, first 100", lambda: store.page_raw(None, None, 100)),
+        ("page, ACTIVE from middle", lambda: store.page_raw("ACTIVE", middle, 100)),
+        ("page, bbox 10x10 deg", lambda: store.page_raw(None, None, 100, (0, 0, 10, 10))),
+        ("get by id", lambda: store.get(rng.randrange(1, args.users))),
+        ("get by username", lambda: store.get_by_username(sample.username)),
+        ("nearest k=10", lambda: store.nearest(rng.uniform(-60, 60), rng.uniform(-180, 180), 10)),
+        ("search one word", lambda: store.search(tokenize("interface"), None, None, 100)),
+        ("search two words", lambda: store.search(tokenize(sample.name), None, None, 100)),
+        ("autocomplete", lambda: store.autocomplete([], "cle", 10)),
+        ("count by status", store.count_by_status),
+    )
+    print(f"\n📊 {len(store):,} users in {args.db}")
+    print(f"{'query':<28}{'median ms':>12}{'max ms':>10}")
+    for label, fn in queries:
+        median, worst = measure(fn, args.repeat)
+        print(f"{label:<28}{median:>12.3f}{worst:>10.3f}")
+
+    print(f"\n{'threads':<10}{'lookups/s':>12}")
+    lookups = 5000
+    for count in args.threads:
+        barrier = threading.Barrier(count)
+
+        def reader(seed):
+            local = random.Random(seed)
+            barrier.wait()
+            for _ in range(lookups):
+                store.get(local.randrange(1, args.users))
+
+        workers = [threading.Thread(target=reader, args=(i,)) for i in range(count)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        print(f"{count:<10}{count * lookups / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
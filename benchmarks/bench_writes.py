@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Write path benchmark
+Runs writer threads creating and updating users through UserWriter with a
+fsynced write-ahead log, while reader threads keep querying the published
+store, and reports write throughput, group sizes and reader latency
+compared with the same readers on an idle store
+
+Usage: python benchmarks/bench_writes.py [--users N] [--writers W]
+       [--readers R] [--seconds S] [--wal PATH] [--no-fsync]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.datagen import generate_users  # noqa: E402
+from user_store import UserStore  # noqa: E402
+from user_writer import UserWriter  # noqa: E402
+from write_log import WriteAheadLog  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def read_latencies(holder, users: int, readers: int, stop: threading.Event):
+    """Run readers until stopped; return per-read latencies in ms"""
+    samples = []
+    lock = threading.Lock()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        local = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            store = holder["store"]
+            store.get(rng.randrange(1, users))
+            store.page("ACTIVE", rng.randrange(users), 20)
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    return threads, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the copy-on-write write path")
+    parser.add_argument("--users", type=int, default=50_000, help="users in the base store")
+    parser.add_argument("--writers", type=int, default=16, help="writer threads")
+    parser.add_argument("--readers", type=int, default=2, help="reader threads")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each phase")
+    parser.add_argument("--wal", default="/tmp/users_bench_wal.log", help="log file (recreated)")
+    parser.add_argument("--no-fsync", action="store_true", help="skip fsync on commit")
+    args = parser.parse_args()
+
+    holder = {"store": UserStore(generate_users(args.users))}
+    holder["store"].warm_indexes()
+    if os.path.exists(args.wal):
+        os.unlink(args.wal)
+    log = WriteAheadLog(args.wal, fsync=not args.no_fsync)
+    writer = UserWriter(lambda: holder["store"], lambda store: holder.update(store=store), log)
+    print(f"📊 {args.users:,} users, {args.writers} writers, {args.readers} readers, "
+          f"fsync {'off' if args.no_fsync else 'on'}")
+
+    # Readers alone
+    stop = threading.Event()
+    threads, idle = read_latencies(holder, args.users, args.readers, stop)
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    # Readers with writers committing
+    stop = threading.Event()
+    threads, busy = read_latencies(holder, args.users, args.readers, stop)
+    write_ms = []
+    lock = threading.Lock()
+
+    def write(seed):
+        rng = random.Random(seed)
+        local = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            if rng.random() < 0.5:
+                writer.create({"name": f"Bench User {seed}", "address": {"city": "Benchville"}})
+            else:
+                user_id = rng.randrange(1, args.users)
+                writer.replace(user_id, {"name": f"Updated {seed}", "status": "INACTIVE"})
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            write_ms.extend(local)
+
+    writers = [threading.Thread(target=write, args=(i,)) for i in range(args.writers)]
+    started = time.perf_counter()
+    for thread in writers:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in writers + threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = writer.stats
+    print(f"\n✍️  {stats['mutations']:,} writes in {elapsed:.1f}s = {stats['mutations'] / elapsed:,.0f} writes/s")
+    print(f"   {stats['commits']:,} group commits (fsyncs), "
+          f"{stats['mutations'] / max(1, stats['commits']):.1f} writes per group")
+    print(f"   write latency p50 {percentile(write_ms, 50):.2f} ms, p99 {percentile(write_ms, 99):.2f} ms")
+    print(f"   log size {os.path.getsize(args.wal) / 1e6:.1f} MB")
+    print(f"\n{'reads':<18}{'count':>10}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for label, samples in (("idle store", idle), ("during writes", busy)):
+        print(f"{label:<18}{len(samples):>10,}{percentile(samples, 50):>10.3f}"
+              f"{percentile(samples, 99):>10.3f}{statistics.mean(samples):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
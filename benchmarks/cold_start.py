@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark
+Spawns the API server repeatedly and measures the wall-clock time from
+process spawn until /api/health first answers 200, along with the app's own
+startup phase report (STARTUP_REPORT=1)
+
+Usage: python benchmarks/cold_start.py [--runs N] [--server flask|asgi|gunicorn]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "flask": lambda port: [sys.executable, "app.py"],
+    "asgi": lambda port: [sys.executable, "asgi.py"],
+    "gunicorn": lambda port: ["gunicorn", "-c", "gunicorn.conf.py", "-w", "1",
+                              "-b", f"127.0.0.1:{port}", "app:app"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_health(command, port: int, timeout: float) -> float:
+    """Spawn a server and return seconds until /api/health answers 200"""
+    env = dict(os.environ, PORT=str(port), STARTUP_REPORT="1")
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        url = f"http://127.0.0.1:{port}/api/health"
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise TimeoutError(f"{command[0]} did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            _, stderr = process.communicate(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            _, stderr = process.communicate()
+        time_to_first_health.last_report = [line for line in stderr.splitlines()
+                                            if line.startswith(("⏱️", "   ", "⚠️"))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure spawn-to-first-response time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--server", choices=sorted(SERVERS), default="flask")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    samples = []
+    for run in range(1, args.runs + 1):
+        port = free_port()
+        elapsed = time_to_first_health(SERVERS[args.server](port), port, args.timeout)
+        samples.append(elapsed * 1000)
+        print(f"run {run}: first /api/health after {elapsed * 1000:.0f} ms")
+
+    print("=" * 60)
+    print(f"COLD START - {args.server}, {args.runs} runs")
+    print("=" * 60)
+    print(f"median {statistics.median(samples):.0f} ms, "
+          f"min {min(samples):.0f} ms, max {max(samples):.0f} ms")
+    print("Last run's startup report:")
+    for line in time_to_first_health.last_report:
+        print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
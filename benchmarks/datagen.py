@@ -0,0 +1,89 @@
+"""
+Synthetic user data for the Users API benchmarks
+Generates users with the same shape as SAMPLE_USERS in app.py
+"""
+
+import random
+from typing import Dict, Iterator
+
+FIRST_NAMES = [
+    "Leanne", "Ervin", "Clementine", "Patricia", "Chelsey", "Dennis", "Kurtis",
+    "Nicholas", "Glenna", "Clementina", "Maxime", "Karianne", "Elwyn", "Mariah",
+]
+LAST_NAMES = [
+    "Graham", "Howell", "Bauch", "Lebsack", "Dietrich", "Schulist", "Weissnat",
+    "Runolfsdottir", "Reichert", "DuBuque", "Nienow", "Kub", "Skiles", "Lind",
+]
+CITIES = [
+    "Gwenborough", "Wisokyburgh", "McKenziehaven", "South Elvis", "Roscoeview",
+    "South Christy", "Howemouth", "Aliyaview", "Bartholomebury", "Lebsackbury",
+]
+STREETS = ["Kulas Light", "Victor Plains", "Douglas Extension", "Hoeger Mall", "Skiles Walks"]
+DOMAINS = ["april.biz", "melissa.tv", "yesenia.net", "kory.org", "annie.ca"]
+COMPANY_WORDS = [
+    "Romaguera", "Crona", "Deckow", "Crist", "Jacobson", "Robel", "Corkery",
+    "Keebler", "Considine", "Lockman", "Johns", "Hoeger", "Yost", "Abernathy",
+]
+CATCH_WORDS = [
+    "Multi-layered", "client-server", "neural-net", "Proactive", "didactic",
+    "contingency", "Face to face", "bifurcated", "interface", "Synchronised",
+    "bottom-line", "interface", "Configurable", "multimedia", "task-force",
+]
+BS_WORDS = [
+    "harness", "real-time", "e-markets", "synergize", "scalable", "supply-chains",
+    "e-enable", "strategic", "applications", "transition", "cutting-edge", "web services",
+]
+
+
+def generate_users(count: int, seed: int = 42, start_id: int = 1) -> Iterator[Dict]:
+    """
+    Yield ``count`` synthetic users with sequential ids
+
+    Args:
+        count: Number of users to generate
+        seed: Random seed so runs are reproducible
+        start_id: Id of the first generated user
+    """
+    rng = random.Random(seed)
+    for user_id in range(start_id, start_id + count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        username = f"{first}{user_id}"
+        yield {
+            "id": user_id,
+            "name": f"{first} {last}",
+            "username": username,
+            "email": f"{username}@{rng.choice(DOMAINS)}",
+            "address": {
+                "street": rng.choice(STREETS),
+                "suite": f"Suite {rng.randint(100, 999)}",
+                "city": rng.choice(CITIES),
+                "zipcode": f"{rng.randint(10000, 99999)}-{rng.randint(1000, 9999)}",
+                "geo": {
+                    "lat": f"{rng.uniform(-90, 90):.4f}",
+                    "lng": f"{rng.uniform(-180, 180):.4f}",
+                },
+            },
+            "phone": f"1-{rng.randint(200, 999)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+            "website": f"{last.lower()}.{rng.choice(['org', 'net', 'info', 'com'])}",
+            "status": "ACTIVE" if rng.random() < 0.8 else "INACTIVE",
+            "company": {
+                "name": f"{rng.choice(COMPANY_WORDS)}-{rng.choice(COMPANY_WORDS)}",
+                "catchPhrase": " ".join(rng.sample(CATCH_WORDS, 3)),
+                "bs": " ".join(rng.sample(BS_WORDS, 3)),
+            },
+        }
+
+
+if __name__ == "__main__":
+    # Write users as NDJSON, e.g. for import_users.py or USERS_DATA_PATH
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description="Write synthetic users as NDJSON to stdout")
+    parser.add_argument("count", type=int, help="number of users to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for user in generate_users(args.count, args.seed):
+        sys.stdout.write(json.dumps(user, separators=(",", ":")) + "\n")
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Concurrent load generator for the Users API
+Sends keep-alive traffic to every real endpoint at a configurable rate and
+reports throughput, latency percentiles and error rates per endpoint
+
+Usage:
+    python benchmarks/loadtest.py --smoke                      # one check per endpoint
+    python benchmarks/loadtest.py --rate 500 --duration 30 --concurrency 64
+    python benchmarks/loadtest.py --rate 0 --label workers=4 --label worker_class=sync \
+        --json results/sync-4.json
+
+Latency is measured from each request's scheduled start time, so a server
+that falls behind the target rate shows the queueing delay instead of
+hiding it (no coordinated omission).
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# (name, path, weight) - every route the API actually serves
+ENDPOINTS = [
+    ("users_all", "/api/users", 4),
+    ("users_active", "/api/users?userType=ACTIVE", 2),
+    ("users_inactive", "/api/users?userType=INACTIVE", 1),
+    ("users_page", "/api/users?limit=100", 2),
+    ("users_projected", "/api/users?fields=id,name,email", 1),
+    ("users_conditional", "/api/users", 2),  # sent with If-None-Match
+    ("health", "/api/health", 2),
+    ("metrics", "/api/metrics", 1),
+    ("docs", "/", 1),
+]
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client connection on asyncio streams"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, path: str, headers: Optional[Dict[str, str]] = None
+                      ) -> Tuple[int, Dict[str, str], bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+        lines = [f"GET {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 "Connection: keep-alive", "Accept-Encoding: identity"]
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        try:
+            return await asyncio.wait_for(self._read_response(), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    async def _read_response(self) -> Tuple[int, Dict[str, str], bytes]:
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        status = int(status_line.split(" ", 2)[1])
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b"\r\n")
+                    break
+                body += await self.reader.readexactly(size + 2)
+                del body[-2:]
+            body = bytes(body)
+        elif "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        elif status in (204, 304):
+            body = b""
+        else:
+            body = await self.reader.read()
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, headers, body
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class EndpointStats:
+    """Latency samples and outcome counts for one endpoint"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.bytes = 0
+
+    def record(self, latency: float, status: Optional[int] = None,
+               error: Optional[str] = None, size: int = 0) -> None:
+        self.latencies.append(latency)
+        self.bytes += size
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        else:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def failures(self) -> int:
+        bad_status = sum(n for code, n in self.statuses.items() if code >= 500)
+        return bad_status + sum(self.errors.values())
+
+    def summary(self, elapsed: float) -> Dict:
+        ordered = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "throughput_rps": round(self.requests / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(self.failures / self.requests, 4) if self.requests else 0.0,
+            "latency_ms": {
+                "p50": percentile(ordered, 50),
+                "p95": percentile(ordered, 95),
+                "p99": percentile(ordered, 99),
+                "max": round(ordered[-1] * 1000, 3) if ordered else None,
+            },
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "errors": self.errors,
+            "bytes": self.bytes,
+        }
+
+
+def percentile(ordered: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted samples, in milliseconds"""
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return round(ordered[rank] * 1000, 3)
+
+
+def build_schedule(rate: float, duration: float) -> List[Tuple[float, int]]:
+    """Return (offset seconds, endpoint index) pairs spread evenly over time"""
+    weighted = [i for i, (_, _, weight) in enumerate(ENDPOINTS) for _ in range(weight)]
+    total = int(rate * duration)
+    return [(n / rate, weighted[n % len(weighted)]) for n in range(total)]
+
+
+async def fetch_etag(host: str, port: int, timeout: float) -> Optional[str]:
+    conn = HttpConnection(host, port, timeout)
+    try:
+        _, headers, _ = await conn.request("/api/users")
+        return headers.get("etag")
+    finally:
+        conn.close()
+
+
+async def run_load(host: str, port: int, rate: float, duration: float,
+                   concurrency: int, timeout: float) -> Tuple[Dict[str, EndpointStats], float]:
+    """
+    Drive traffic against the server
+
+    With ``rate`` > 0 requests follow a fixed open-loop schedule; with
+    ``rate`` == 0 every connection sends back-to-back for ``duration``.
+    """
+    stats = {name: EndpointStats() for name, _, _ in ENDPOINTS}
+    etag = await fetch_etag(host, port, timeout)
+    queue: asyncio.Queue = asyncio.Queue()
+    start = time.perf_counter()
+
+    async def send_one(conn: HttpConnection, index: int, scheduled: float) -> None:
+        name, path, _ = ENDPOINTS[index]
+        headers = {"If-None-Match": etag} if name == "users_conditional" and etag else None
+        try:
+            status, _, body = await conn.request(path, headers)
+            stats[name].record(time.perf_counter() - scheduled, status, size=len(body))
+        except Exception as e:
+            stats[name].record(time.perf_counter() - scheduled, error=type(e).__name__)
+
+    async def scheduled_worker() -> None:
+        conn = HttpConnection(host, port, timeout)
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            offset, index = item
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await send_one(conn, index, scheduled)
+        conn.close()
+
+    async def closed_loop_worker(worker: int) -> None:
+        conn = HttpConnection(host, port, timeout)
+        weighted = [i for i, (_, _, w) in enumerate(ENDPOINTS) for _ in range(w)]
+        n = worker
+        while time.perf_counter() - start < duration:
+            await send_one(conn, weighted[n % len(weighted)], time.perf_counter())
+            n += concurrency
+        conn.close()
+
+    if rate > 0:
+        for item in build_schedule(rate, duration):
+            queue.put_nowait(item)
+        for _ in range(concurrency):
+            queue.put_nowait(None)
+        await asyncio.gather(*(scheduled_worker() for _ in range(concurrency)))
+    else:
+        await asyncio.gather(*(closed_loop_worker(w) for w in range(concurrency)))
+    return stats, time.perf_counter() - start
+
+
+async def run_smoke(host: str, port: int, timeout: float) -> bool:
+    """Hit every endpoint once and check status codes and response shapes"""
+    conn = HttpConnection(host, port, timeout)
+    checks = [
+        ("health", "/api/health", 200, lambda d: d.get("status") == "healthy"),
+        ("all users", "/api/users", 200, lambda d: isinstance(d, list) and all("id" in u for u in d)),
+        ("active users", "/api/users?userType=ACTIVE", 200,
+         lambda d: all(u.get("status") == "ACTIVE" for u in d)),
+        ("inactive users", "/api/users?userType=INACTIVE", 200,
+         lambda d: all(u.get("status") == "INACTIVE" for u in d)),
+        ("first page", "/api/users?limit=1", 200, lambda d: len(d) <= 1),
+        ("projection", "/api/users?fields=id,name", 200,
+         lambda d: all(set(u) <= {"id", "name"} for u in d)),
+        ("invalid user type", "/api/users?userType=INVALID", 400, lambda d: "error" in d),
+        ("documentation", "/", 200, lambda d: "endpoints" in d),
+    ]
+    text_checks = [
+        ("metrics", "/api/metrics", 200, lambda t: "http_requests_total" in t),
+    ]
+    ok = True
+    try:
+        for label, path, expected, check in checks:
+            try:
+                status, _, body = await conn.request(path)
+                passed = status == expected and check(json.loads(body))
+            except Exception as e:
+                status, passed = type(e).__name__, False
+            ok &= passed
+            print(f"   {'✅' if passed else '❌'} {label:<20} {path:<36} -> {status}")
+        for label, path, expected, check in text_checks:
+            try:
+                status, _, body = await conn.request(path)
+                passed = status == expected and check(body.decode("utf-8"))
+            except Exception as e:
+                status, passed = type(e).__name__, False
+            ok &= passed
+            print(f"   {'✅' if passed else '❌'} {label:<20} {path:<36} -> {status}")
+        status, headers, _ = await conn.request("/api/users")
+        etag = headers.get("etag")
+        status, _, _ = await conn.request("/api/users", {"If-None-Match": etag or ""})
+        passed = status == 304
+        ok &= passed
+        print(f"   {'✅' if passed else '❌'} {'conditional GET':<20} {'/api/users (If-None-Match)':<36} -> {status}")
+    finally:
+        conn.close()
+    return ok
+
+
+def print_report(results: Dict) -> None:
+    print("=" * 96)
+    print(f"{'endpoint':<20}{'requests':>10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'max ms':>10}{'errors':>10}")
+    print("-" * 96)
+    rows = list(results["endpoints"].items()) + [("TOTAL", results["total"])]
+    for name, row in rows:
+        lat = row["latency_ms"]
+        print(f"{name:<20}{row['requests']:>10}{row['throughput_rps']:>10.1f}"
+              f"{fmt(lat['p50']):>10}{fmt(lat['p95']):>10}{fmt(lat['p99']):>10}"
+              f"{fmt(lat['max']):>10}{row['error_rate']:>10.2%}")
+    print("=" * 96)
+
+
+def fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Users API")
+    parser.add_argument("base_url", nargs="?", default="http://localhost:5000",
+                        help="server to test (default http://localhost:5000)")
+    parser.add_argument("--smoke", action="store_true", help="check each endpoint once and exit")
+    parser.add_argument("--rate", type=float, default=200,
+                        help="target requests/second across all connections (0 = as fast as possible)")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of traffic")
+    parser.add_argument("--concurrency", type=int, default=32, help="keep-alive connections")
+    parser.add_argument("--timeout", type=float, default=10, help="per-request timeout in seconds")
+    parser.add_argument("--label", action="append", default=[], metavar="KEY=VALUE",
+                        help="tag results with server settings, e.g. workers=4 (repeatable)")
+    parser.add_argument("--json", metavar="PATH", help="write machine-readable results ('-' for stdout)")
+    args = parser.parse_args()
+
+    url = urlsplit(args.base_url)
+    if url.scheme != "http" or not url.hostname:
+        parser.error("base_url must be a plain http:// URL")
+    host, port = url.hostname, url.port or 80
+
+    if args.smoke:
+        print(f"Smoke testing {args.base_url}")
+        sys.exit(0 if asyncio.run(run_smoke(host, port, args.timeout)) else 1)
+
+    print(f"Load testing {args.base_url}: rate={args.rate or 'max'} rps, "
+          f"duration={args.duration}s, concurrency={args.concurrency}")
+    stats, elapsed = asyncio.run(run_load(host, port, args.rate, args.duration,
+                                          args.concurrency, args.timeout))
+
+    total = EndpointStats()
+    for endpoint in stats.values():
+        total.latencies += endpoint.latencies
+        total.bytes += endpoint.bytes
+        for code, n in endpoint.statuses.items():
+            total.statuses[code] = total.statuses.get(code, 0) + n
+        for err, n in endpoint.errors.items():
+            total.errors[err] = total.errors.get(err, 0) + n
+
+    results = {
+        "target": args.base_url,
+        "labels": dict(label.split("=", 1) for label in args.label if "=" in label),
+        "config": {"rate": args.rate, "duration": args.duration,
+                   "concurrency": args.concurrency, "timeout": args.timeout},
+        "client": {"python": platform.python_version(), "platform": platform.platform()},
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - elapsed)),
+        "elapsed_s": round(elapsed, 3),
+        "endpoints": {name: s.summary(elapsed) for name, s in stats.items()},
+        "total": total.summary(elapsed),
+    }
+    print_report(results)
+
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
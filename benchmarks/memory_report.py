@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Memory report for user record representations
+Compares bytes per user of the nested dict layout used by SAMPLE_USERS with
+the compact UserRecord layout held by UserStore
+
+"deep bytes/user" walks each object graph, strings included; "allocated/user"
+is what tracemalloc sees when building the layout from already-parsed
+values, i.e. the container overhead each layout adds.
+
+Usage: python benchmarks/memory_report.py [--users N] [--workers W]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.datagen import generate_users  # noqa: E402
+from user_record import UserRecord  # noqa: E402
+
+
+def deep_sizeof(obj, seen=None) -> int:
+    """Return the size of an object graph, counting shared objects once"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, name), seen) for name in obj.__slots__)
+    return size
+
+
+def traced_bytes(build: Callable[[], List]) -> int:
+    """Return the bytes still allocated after building a collection"""
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report memory used per user record")
+    parser.add_argument("--users", type=int, default=100_000, help="number of synthetic users")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers holding a copy")
+    args = parser.parse_args()
+
+    source = list(generate_users(args.users))
+
+    # Build both layouts from fresh copies so neither shares the source strings
+    def build_dicts():
+        return [
+            {**u, "address": {**u["address"], "geo": dict(u["address"]["geo"])},
+             "company": dict(u["company"])}
+            for u in source
+        ]
+
+    def build_records():
+        return [UserRecord.from_dict(u) for u in source]
+
+    dict_traced = traced_bytes(build_dicts)
+    record_traced = traced_bytes(build_records)
+    dict_deep = deep_sizeof(build_dicts()) / args.users
+    record_deep = deep_sizeof(build_records()) / args.users
+
+    print("=" * 60)
+    print(f"MEMORY REPORT - {args.users:,} users")
+    print("=" * 60)
+    print(f"{'layout':<24}{'deep bytes/user':>18}{'allocated/user':>18}")
+    print(f"{'nested dict':<24}{dict_deep:>18,.0f}{dict_traced / args.users:>18,.0f}")
+    print(f"{'UserRecord (__slots__)':<24}{record_deep:>18,.0f}{record_traced / args.users:>18,.0f}")
+    saved = 1 - record_traced / dict_traced
+    print("-" * 60)
+    print(f"Reduction: {saved:.0%} per user")
+    print(f"Across {args.workers} workers: "
+          f"{dict_traced * args.workers / 2**20:,.1f} MiB -> "
+          f"{record_traced * args.workers / 2**20:,.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
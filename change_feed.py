@@ -0,0 +1,125 @@
+"""
+Bounded change log behind the /api/users/changes feed
+Remembers which user each recent write touched, keyed by the write's
+sequence number, so a polling client can fetch just the users inserted,
+updated or deleted since the version it last saw
+"""
+
+import bisect
+import itertools
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+# Changes kept when CHANGE_LOG_SIZE is unset; clients further behind resync
+DEFAULT_CHANGE_LOG_SIZE = 10000
+
+# Change operations, as written to the write-ahead log; RESET marks a
+# replaced dataset, which every client must fetch again
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+RESET = "reset"
+
+
+class Change(NamedTuple):
+    seq: int
+    op: str
+    user_id: int
+
+
+class ChangeWindow(NamedTuple):
+    """Net effect of the changes after a version, one entry per user"""
+    # User ids by net effect, each in order of first change
+    inserted: List[int]
+    updated: List[int]
+    deleted: List[int]
+    # Version the window runs up to; the client continues from here
+    version: int
+    # True when the window stopped at the limit before the latest version
+    more: bool
+
+
+class ChangeLog:
+    """
+    Recent (sequence number, op, user id) changes in sequence order
+
+    Keeps at least ``max_entries`` changes. A version older than the oldest
+    kept change, or from before a ``reset``, can no longer be served and the
+    client has to fetch everything again. Appends come from one writer at a
+    time; readers never lock.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CHANGE_LOG_SIZE):
+        self.max_entries = max_entries
+        self._changes: List[Change] = []
+        # Lowest version a client can sync from
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    @property
+    def floor(self) -> int:
+        return self._floor
+
+    def record(self, seq: int, op: str, user_id: int) -> None:
+        """Remember one change; ``seq`` must be higher than any recorded so far"""
+        with self._lock:
+            self._changes.append(Change(seq, op, user_id))
+            if len(self._changes) >= 2 * self.max_entries:
+                # Trim in bulk; readers holding the old list keep a consistent view
+                dropped = len(self._changes) - self.max_entries
+                self._floor = max(self._floor, self._changes[dropped - 1].seq)
+                self._changes = self._changes[dropped:]
+
+    def reset(self, seq: int) -> None:
+        """Forget everything up to ``seq``, e.g. after the dataset was replaced"""
+        with self._lock:
+            # Raise the floor first, so readers never pair it with a stale list
+            self._floor = max(self._floor, seq)
+            self._changes = [change for change in self._changes if change.seq > seq]
+
+    def clear(self) -> None:
+        """Forget every change, e.g. before replaying the write log from the start"""
+        with self._lock:
+            self._changes = []
+            self._floor = 0
+
+    def window(self, since: int, version: int, limit: int) -> Optional[ChangeWindow]:
+        """
+        Summarize the changes after ``since`` up to ``version``
+
+        Args:
+            since: Version the client last synced to
+            version: Latest version the caller's data reflects
+            limit: Most users to report; the window ends early to respect it
+
+        Returns:
+            The window, or None if ``since`` is too old (or from the future)
+            and the client has to resync
+        """
+        changes, floor = self._changes, self._floor
+        if since < floor or since > version:
+            return None
+        first: Dict[int, str] = {}
+        last: Dict[int, str] = {}
+        reached, more = since, False
+        start = bisect.bisect_right(changes, since, key=lambda change: change.seq)
+        for change in itertools.islice(changes, start, None):
+            if change.seq > version:
+                break
+            if change.user_id not in first:
+                if len(first) == limit:
+                    more = True
+                    break
+                first[change.user_id] = change.op
+            last[change.user_id] = change.op
+            reached = change.seq
+        inserted, updated, deleted = [], [], []
+        for user_id, op in first.items():
+            if last[user_id] == DELETE:
+                if op != INSERT:
+                    deleted.append(user_id)
+            elif op == INSERT:
+                inserted.append(user_id)
+            else:
+                updated.append(user_id)
+        return ChangeWindow(inserted, updated, deleted, reached if more else version, more)
@@ -0,0 +1,267 @@
+"""
+Copy-on-write tables for the in-memory indexes
+A hash map and a sorted list split into fixed-size parts that copies share
+until one side writes a part, so copying a table costs O(parts) rather than
+O(entries) and a write clones only the part it touches
+"""
+
+import bisect
+import itertools
+from typing import Any, Dict, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+T = TypeVar("T")
+
+# Buckets per CowDict; a write after copy() clones one bucket of len/BUCKETS entries
+DICT_BUCKETS = 256
+
+# Items per CowSortedList chunk when loaded; a chunk splits at twice this
+CHUNK_SIZE = 512
+
+_MASK = DICT_BUCKETS - 1
+_MISSING = object()
+
+
+class CowDict(Generic[K, V]):
+    """
+    Hash map whose copies share buckets until one side writes to them
+
+    Keys are spread over DICT_BUCKETS plain dicts by hash. Iteration order
+    follows the buckets, not insertion.
+    """
+
+    __slots__ = ("_buckets", "_len", "_owned")
+
+    def __init__(self, items: Iterable[Tuple[K, V]] = ()):
+        self._buckets: List[Dict[K, V]] = [{} for _ in range(DICT_BUCKETS)]
+        self._len = 0
+        # After copy(), whether this table may write each bucket in place; None means all
+        self._owned: Optional[List[bool]] = None
+        buckets = self._buckets
+        for key, value in items:
+            buckets[hash(key) & _MASK][key] = value
+        self._len = sum(map(len, buckets))
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, key) -> bool:
+        return key in self._buckets[hash(key) & _MASK]
+
+    def __getitem__(self, key: K) -> V:
+        return self._buckets[hash(key) & _MASK][key]
+
+    def __iter__(self) -> Iterator[K]:
+        return itertools.chain.from_iterable(self._buckets[:])
+
+    def get(self, key, default=None):
+        return self._buckets[hash(key) & _MASK].get(key, default)
+
+    def get_many(self, keys: Iterable) -> List[Optional[V]]:
+        """Return the value (or None) for each key, in order"""
+        buckets = self._buckets
+        return [buckets[hash(key) & _MASK].get(key) for key in keys]
+
+    def values(self) -> Iterator[V]:
+        return itertools.chain.from_iterable(b.values() for b in self._buckets[:])
+
+    def items(self) -> Iterator[Tuple[K, V]]:
+        return itertools.chain.from_iterable(b.items() for b in self._buckets[:])
+
+    def __setitem__(self, key: K, value: V) -> None:
+        bucket = self._writable(hash(key) & _MASK)
+        if key not in bucket:
+            self._len += 1
+        bucket[key] = value
+
+    def __delitem__(self, key: K) -> None:
+        i = hash(key) & _MASK
+        if key not in self._buckets[i]:
+            raise KeyError(key)
+        del self._writable(i)[key]
+        self._len -= 1
+
+    def pop(self, key: K, default: Any = _MISSING):
+        i = hash(key) & _MASK
+        if key not in self._buckets[i]:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        self._len -= 1
+        return self._writable(i).pop(key)
+
+    def copy(self) -> "CowDict[K, V]":
+        """Return an independent copy; costs O(DICT_BUCKETS)"""
+        clone = CowDict.__new__(CowDict)
+        clone._buckets = self._buckets[:]
+        clone._len = self._len
+        self._owned, clone._owned = [False] * DICT_BUCKETS, [False] * DICT_BUCKETS
+        return clone
+
+    def _writable(self, i: int) -> Dict[K, V]:
+        owned = self._owned
+        if owned is not None and not owned[i]:
+            # Still shared with a copy of this table; clone it before writing
+            self._buckets[i] = dict(self._buckets[i])
+            owned[i] = True
+        return self._buckets[i]
+
+
+class CowSortedList(Generic[T]):
+    """
+    Sorted list of distinct items whose copies share chunks until written
+
+    Items live in ordered chunks of up to 2 * CHUNK_SIZE, indexed by each
+    chunk's largest item, so inserts and removals shift one chunk and
+    ``after`` starts a page with two bisections.
+    """
+
+    __slots__ = ("_chunks", "_maxes", "_len", "_owned")
+
+    def __init__(self, items: Iterable[T] = ()):
+        self._load(sorted(set(items)))
+
+    @classmethod
+    def from_sorted(cls, items: List[T]) -> "CowSortedList[T]":
+        """Build from items already sorted and distinct, skipping the sort"""
+        result = cls.__new__(cls)
+        result._load(items)
+        return result
+
+    def _load(self, ordered: List[T]) -> None:
+        self._chunks: List[List[T]] = [ordered[i:i + CHUNK_SIZE]
+                                       for i in range(0, len(ordered), CHUNK_SIZE)]
+        self._maxes: List[T] = [chunk[-1] for chunk in self._chunks]
+        self._len = len(ordered)
+        # After copy(), whether this list may write each chunk in place; None means all
+        self._owned: Optional[List[bool]] = None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[T]:
+        return itertools.chain.from_iterable(self._chunks[:])
+
+    def __contains__(self, value) -> bool:
+        i = bisect.bisect_left(self._maxes, value)
+        if i == len(self._maxes):
+            return False
+        chunk = self._chunks[i]
+        return chunk[bisect.bisect_left(chunk, value)] == value
+
+    def last(self) -> Optional[T]:
+        """Return the largest item, or None when empty"""
+        maxes = self._maxes
+        return maxes[-1] if maxes else None
+
+    def add(self, value: T) -> None:
+        """Insert an item, keeping the list sorted; present items are left alone"""
+        maxes = self._maxes
+        if not maxes:
+            self._chunks.append([value])
+            maxes.append(value)
+            if self._owned is not None:
+                self._owned.append(True)
+            self._len = 1
+            return
+        i = bisect.bisect_left(maxes, value)
+        if i == len(maxes):
+            i -= 1
+        else:
+            chunk = self._chunks[i]
+            if chunk[bisect.bisect_left(chunk, value)] == value:
+                return
+        chunk = self._writable(i)
+        if chunk[-1] < value:
+            chunk.append(value)  # ids usually arrive in ascending order
+        else:
+            bisect.insort(chunk, value)
+        maxes[i] = chunk[-1]
+        self._len += 1
+        if len(chunk) > 2 * CHUNK_SIZE:
+            self._chunks[i:i + 1] = [chunk[:CHUNK_SIZE], chunk[CHUNK_SIZE:]]
+            maxes[i:i + 1] = [chunk[CHUNK_SIZE - 1], chunk[-1]]
+            if self._owned is not None:
+                self._owned[i:i + 1] = [True, True]
+
+    def discard(self, value: T) -> bool:
+        """Remove an item if present, returning whether it was"""
+        maxes = self._maxes
+        i = bisect.bisect_left(maxes, value)
+        if i == len(maxes):
+            return False
+        pos = bisect.bisect_left(self._chunks[i], value)
+        if self._chunks[i][pos] != value:
+            return False
+        chunk = self._writable(i)
+        del chunk[pos]
+        self._len -= 1
+        if chunk:
+            maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i]
+            del maxes[i]
+            if self._owned is not None:
+                del self._owned[i]
+        return True
+
+    def after(self, value: Optional[T] = None,
+              limit: Optional[int] = None) -> Tuple[List[T], bool]:
+        """
+        Return up to ``limit`` items greater than ``value``, in order
+
+        Args:
+            value: Only return items greater than this (None for the first)
+            limit: Maximum number of items to return (None for all)
+
+        Returns:
+            Tuple of (items, whether more items follow them)
+        """
+        chunks = self._chunks[:]
+        if value is None:
+            i, pos = 0, 0
+        else:
+            i = bisect.bisect_right(self._maxes[:], value)
+            if i >= len(chunks):
+                return [], False
+            pos = bisect.bisect_right(chunks[i], value)
+        result: List[T] = []
+        for i in range(i, len(chunks)):
+            chunk = chunks[i]
+            if limit is None:
+                result.extend(chunk[pos:])
+            else:
+                end = pos + limit - len(result)
+                result.extend(chunk[pos:end])
+                if len(result) == limit:
+                    return result, end < len(chunk) or i + 1 < len(chunks)
+            pos = 0
+        return result, False
+
+    def iter_from(self, value: T) -> Iterator[T]:
+        """Iterate over the items not less than ``value``, in order"""
+        chunks = self._chunks[:]
+        i = bisect.bisect_left(self._maxes[:], value)
+        if i < len(chunks):
+            chunk = chunks[i]
+            yield from chunk[bisect.bisect_left(chunk, value):]
+            for chunk in chunks[i + 1:]:
+                yield from chunk
+
+    def copy(self) -> "CowSortedList[T]":
+        """Return an independent copy; costs O(len / CHUNK_SIZE)"""
+        clone = CowSortedList.__new__(CowSortedList)
+        clone._chunks = self._chunks[:]
+        clone._maxes = self._maxes[:]
+        clone._len = self._len
+        self._owned = [False] * len(self._chunks)
+        clone._owned = [False] * len(self._chunks)
+        return clone
+
+    def _writable(self, i: int) -> List[T]:
+        owned = self._owned
+        if owned is not None and not owned[i]:
+            self._chunks[i] = self._chunks[i][:]
+            owned[i] = True
+        return self._chunks[i]
@@ -0,0 +1,87 @@
+"""
+Background file watcher for hot dataset reloads
+Polls a file's identity (inode, size, mtime) from a daemon thread and runs a
+callback once a change has settled, so rebuilding a dataset never happens on
+a request thread
+"""
+
+import logging
+import os
+import threading
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds between polls when USERS_RELOAD_INTERVAL is unset
+DEFAULT_RELOAD_INTERVAL = 2.0
+
+Signature = Optional[Tuple[int, int, int, int]]
+
+
+def file_signature(path: str) -> Signature:
+    """Return a value that changes whenever the file is replaced or rewritten"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class FileReloader:
+    """
+    Run a callback in a background thread whenever a file changes
+
+    A change is acted on only after the file has looked the same for one
+    full poll interval, so a file that is still being written is not
+    loaded half-way. Exceptions from the callback are logged and the
+    previous dataset stays in service.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[], None],
+                 interval: float = DEFAULT_RELOAD_INTERVAL, signature: Signature = None):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        # The file as the running dataset was loaded from it; a process forked
+        # from one that loaded an older file then reloads on its first poll
+        self._signature = signature if signature is not None else file_signature(path)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "FileReloader":
+        """Start polling in a daemon thread"""
+        self._thread = threading.Thread(target=self._run, name=f"reloader:{os.path.basename(self.path)}",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop polling; an in-progress reload is allowed to finish"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def check(self) -> bool:
+        """Poll once, running the callback if the file changed and settled"""
+        current = file_signature(self.path)
+        if current == self._signature or current is None:
+            return False
+        # Wait for writers to finish before loading
+        while not self._stop.wait(self.interval):
+            settled = file_signature(self.path)
+            if settled == current:
+                break
+            current = settled
+        if self._stop.is_set() or current is None:
+            return False
+        self._signature = current
+        try:
+            self.on_change()
+        except Exception:
+            logger.exception("Reloading %s failed; keeping the current dataset", self.path)
+            return False
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
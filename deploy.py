@@ -7,7 +7,6 @@ This script configures the API for public access with production settings
 import os
 import sys
 import subprocess
-from app import app
 
 def check_dependencies():
     """Check if all required dependencies are installed"""
@@ -29,6 +28,9 @@ def run_production_server():
     # Set environment variables for production
     os.environ['DEBUG'] = 'False'
     
+    # Import the app only once its dependencies are known to be present
+    from app import app
+    
     # Get port from command line argument or environment
     port = 5000
     if len(sys.argv) > 1:
@@ -57,7 +59,7 @@ def run_production_server():
     print("   3. Use: http://YOUR_PUBLIC_IP:{port}/api/users")
     print("=" * 60)
     print("⚠️  SECURITY NOTE: This is a public API without authentication")
-    print("   Consider adding API keys or rate limiting for production use")
+    print("   Set RATE_LIMIT_RATE (requests/second per client) to enable rate limiting")
     print("=" * 60)
     
     # Start the application
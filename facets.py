@@ -0,0 +1,185 @@
+"""
+Precomputed facet counts for the /api/users/facets endpoint
+Counts users per city, zipcode prefix and company name, split by status,
+and keeps the counts current as users are added and removed, so a facet
+query costs O(buckets) instead of a pass over every user
+"""
+
+import heapq
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from user_record import UserRecord
+
+# Facets a client can ask for; status counts come from the status index
+FACETS = ("status", "city", "zipcode", "company")
+
+# Buckets listed per facet when the client does not say, and the most it may ask for
+DEFAULT_FACET_BUCKETS = 10
+MAX_FACET_BUCKETS = 1000
+
+# Zipcode prefix lengths counted, and the one used when none is asked for
+ZIP_PREFIX_LENGTHS = (1, 2, 3, 4, 5)
+DEFAULT_ZIP_PREFIX = 3
+
+
+def zipcode_facet(prefix: int) -> str:
+    """Name of the counted dimension for zipcodes cut to ``prefix`` characters"""
+    return f"zipcode{prefix}"
+
+
+_ZIPCODE_FACETS = tuple((zipcode_facet(n), n) for n in ZIP_PREFIX_LENGTHS)
+
+
+def facet_values(user: UserRecord) -> List[Tuple[str, str]]:
+    """Return the (dimension, bucket) pairs a user is counted under"""
+    values = []
+    if user.city:
+        values.append(("city", user.city))
+    if user.company_name:
+        values.append(("company", user.company_name))
+    zipcode = user.zipcode
+    if zipcode:
+        values.extend((dimension, zipcode[:n]) for dimension, n in _ZIPCODE_FACETS)
+    return values
+
+
+def parse_facet_limit(value: Optional[str]) -> Optional[int]:
+    """
+    Validate a facets ``limit`` parameter; "all" (returned as None) lists every bucket
+
+    Raises:
+        ValueError: With a client-facing message if the value is invalid
+    """
+    if value == "all":
+        return None
+    try:
+        limit = int(value) if value is not None else DEFAULT_FACET_BUCKETS
+        if not 1 <= limit <= MAX_FACET_BUCKETS:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f"Invalid limit. Must be all or an integer between 1 and {MAX_FACET_BUCKETS}")
+    return limit
+
+
+def _bucket_order(item: Tuple[str, int]) -> Tuple[int, str]:
+    # Most users first, ties by value
+    return -item[1], item[0]
+
+
+def summarize_facet(counts: Dict[str, int], total: int, limit: Optional[int]) -> Dict:
+    """
+    Shape one facet's counts for a response
+
+    Args:
+        counts: Users per bucket value
+        total: Users matching the query, with or without a value
+        limit: Buckets to list, largest first (None for all)
+
+    Returns:
+        Dict with the top "buckets" ({value, count}), the users in the
+        remaining buckets ("other") and the users without a value ("missing")
+    """
+    items = counts.items()
+    if limit is None:
+        top = sorted(items, key=_bucket_order)
+    else:
+        # O(buckets) rather than a full sort
+        top = heapq.nsmallest(limit, items, key=_bucket_order)
+    counted = sum(counts.values())
+    return {
+        "buckets": [{"value": value, "count": count} for value, count in top],
+        "other": counted - sum(count for _, count in top),
+        "missing": total - counted,
+    }
+
+
+class FacetCounts:
+    """
+    Number of users per bucket of each dimension, kept separately per status
+
+    Buckets are the values as stored, e.g. the city name; users without a
+    value are not counted. ``copy`` shares the per-(status, dimension)
+    tables until either side writes one, like GridSpatialIndex.copy.
+    """
+
+    def __init__(self):
+        self._counts: Dict[Tuple[str, str], Dict[str, int]] = {}
+        # After copy(), tables this instance may write in place; None means all
+        self._owned: Optional[Set[Tuple[str, str]]] = None
+
+    def add(self, user: UserRecord) -> None:
+        """Count a user under each of its buckets"""
+        status, writable = user.status, self._writable
+        for dimension, value in facet_values(user):
+            counts = writable((status, dimension))
+            counts[value] = counts.get(value, 0) + 1
+
+    def add_many(self, users: Iterable[UserRecord]) -> None:
+        """Count many users; into empty counts, one pass per dimension"""
+        if self._counts:
+            for user in users:
+                self.add(user)
+            return
+        by_status: Dict[str, List[UserRecord]] = {}
+        for user in users:
+            by_status.setdefault(user.status, []).append(user)
+        for status, group in by_status.items():
+            counts = {
+                "city": Counter(user.city for user in group if user.city),
+                "company": Counter(user.company_name for user in group if user.company_name),
+            }
+            zipcodes = [user.zipcode for user in group if user.zipcode]
+            for dimension, n in _ZIPCODE_FACETS:
+                counts[dimension] = Counter(zipcode[:n] for zipcode in zipcodes)
+            for dimension, table in counts.items():
+                if table:
+                    self._counts[(status, dimension)] = dict(table)
+
+    def remove(self, user: UserRecord) -> None:
+        """Stop counting a user previously passed to ``add``"""
+        for dimension, value in facet_values(user):
+            counts = self._writable((user.status, dimension))
+            remaining = counts.get(value, 0) - 1
+            if remaining > 0:
+                counts[value] = remaining
+            else:
+                counts.pop(value, None)
+
+    def copy(self) -> "FacetCounts":
+        """Return an independent copy; costs O(statuses x dimensions)"""
+        clone = FacetCounts()
+        clone._counts = dict(self._counts)
+        self._owned, clone._owned = set(), set()
+        return clone
+
+    def counts(self, dimension: str, statuses: Iterable[str]) -> Dict[str, int]:
+        """
+        Return bucket counts of a dimension summed over the given statuses
+
+        Returns:
+            Mapping of bucket value to number of users, O(buckets) to build
+        """
+        tables = [self._counts.get((status, dimension)) for status in statuses]
+        tables = [table for table in tables if table]
+        if len(tables) == 1:
+            return dict(tables[0])
+        merged: Dict[str, int] = {}
+        for table in tables:
+            for value, count in table.items():
+                merged[value] = merged.get(value, 0) + count
+        return merged
+
+    def _writable(self, key: Tuple[str, str]) -> Dict[str, int]:
+        owned = self._owned
+        if owned is None:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = {}
+        elif key not in owned:
+            # Still shared with a copy; clone it before writing
+            counts = self._counts[key] = dict(self._counts.get(key, ()))
+            owned.add(key)
+        else:
+            counts = self._counts[key]
+        return counts
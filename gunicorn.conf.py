@@ -2,14 +2,26 @@
 # Usage: gunicorn -c gunicorn.conf.py app:app
 
 import os
+import tempfile
+
+from autoscale import DEFAULT_COOLDOWN, DEFAULT_INTERVAL, WorkerAutoscaler, worker_bounds
+from metrics import MetricsRegistry, clear_metrics_dir, mark_process_dead
+from rate_limit import listen_queue_depth
 
 # Server socket
 bind = "0.0.0.0:5000"  # Bind to all interfaces for public access
 backlog = 2048
 
-# Worker processes
-workers = 4  # Adjust based on CPU cores (2 * cores + 1)
-worker_class = "sync"
+# Worker processes: 2 * cores + 1 to start, where cores honors container CPU
+# quotas. The autoscaler below adds or removes workers within the bounds.
+_initial_workers, _min_workers, _max_workers = worker_bounds()
+workers = int(os.environ.get("GUNICORN_WORKERS", _initial_workers))
+min_workers = int(os.environ.get("GUNICORN_MIN_WORKERS", min(_min_workers, workers)))
+max_workers = int(os.environ.get("GUNICORN_MAX_WORKERS", max(_max_workers, workers)))
+# GUNICORN_THREADS > 1 switches to threaded workers, e.g. with USERS_DB_PATH
+# where each thread reads through its own database connection
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+worker_class = "gthread" if threads > 1 else "sync"
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -23,12 +35,96 @@ limit_request_line = 4094
 limit_request_fields = 100
 limit_request_field_size = 8190
 
-# Logging
-accesslog = "-"  # Log to stdout
+# Logging: each worker writes JSON access and app lines to STRUCTURED_LOG
+# ("-" for stdout, or a file) from a background thread, so a slow log consumer
+# drops lines (counted in /api/metrics) instead of stalling requests. Set
+# STRUCTURED_LOG= to get gunicorn's synchronous access log back instead.
+os.environ.setdefault("STRUCTURED_LOG", "-")
+accesslog = None if os.environ["STRUCTURED_LOG"] else "-"  # Log to stdout
 errorlog = "-"   # Log to stderr
 loglevel = "info"
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(D)s'
 
+# Metrics: every worker writes counters into this shared directory so that
+# /api/metrics on any worker reports the whole process group
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "users_api_metrics"))
+
+# Rate limiting: with RATE_LIMIT_RATE set, every worker charges clients
+# against token buckets in this one shared file
+os.environ.setdefault("RATE_LIMIT_FILE", os.path.join(tempfile.gettempdir(), "users_api_ratelimit.db"))
+
+# Load shedding: answer 503 + Retry-After once more connections than this wait
+# in the accept queue, instead of letting them queue up to the full backlog
+os.environ.setdefault("LOAD_SHED_MAX_QUEUE", str(workers * 16))
+
+# Writes: with a data file, every worker appends to one log kept next to it
+# and follows the others' writes in it, so all workers serve the same data;
+# it is replayed over that file on restart. Set USERS_WAL_PATH to keep it
+# elsewhere, or to "" for no log
+if os.environ.get("USERS_DATA_PATH"):
+    os.environ.setdefault("USERS_WAL_PATH", os.environ["USERS_DATA_PATH"] + ".wal")
+
+def on_starting(server):
+    """Start each server run with empty metric counters and rate limit buckets"""
+    os.makedirs(os.environ["METRICS_DIR"], exist_ok=True)
+    clear_metrics_dir(os.environ["METRICS_DIR"])
+    if os.path.exists(os.environ["RATE_LIMIT_FILE"]):
+        os.unlink(os.environ["RATE_LIMIT_FILE"])
+
+# Autoscaling: the master samples request busy time (from the shared metrics
+# files) and the accept queue, and sends itself TTIN/TTOU to resize the pool.
+# Set GUNICORN_AUTOSCALE=0 to keep a fixed number of workers.
+autoscale = os.environ.get("GUNICORN_AUTOSCALE", "1") != "0"
+
+def start_autoscaler(server):
+    """Run the worker autoscaler in the master, bounded around the configured pool"""
+    listeners = list(server.LISTENERS)
+
+    def backlog():
+        depths = [depth for depth in map(listen_queue_depth, listeners) if depth is not None]
+        return max(depths) if depths else None
+
+    WorkerAutoscaler(
+        min(min_workers, server.num_workers), max(max_workers, server.num_workers),
+        busy_seconds=MetricsRegistry().busy_seconds, backlog=backlog, threads=threads,
+        interval=float(os.environ.get("AUTOSCALE_INTERVAL", DEFAULT_INTERVAL)),
+        cooldown=float(os.environ.get("AUTOSCALE_COOLDOWN", DEFAULT_COOLDOWN)),
+    ).start(server)
+    server.log.info("Autoscaler: %d-%d workers, starting with %d",
+                    min(min_workers, server.num_workers), max(max_workers, server.num_workers),
+                    server.num_workers)
+
+def nworkers_changed(server, new_value, old_value):
+    """Log every change to the worker pool size (autoscaler or manual TTIN/TTOU)"""
+    if old_value is not None:
+        server.log.info("Worker pool resized: %d -> %d", old_value, new_value)
+
+def child_exit(server, worker):
+    """Fold an exited worker's counters into the archive file"""
+    mark_process_dead(worker.pid, os.environ["METRICS_DIR"])
+
+# Hot reload: with USERS_DATA_PATH set the dataset is rebuilt when the file
+# changes. In snapshot mode the master rebuilds and rewrites the snapshot
+# once and workers only remap it; otherwise each worker rebuilds its own copy.
+def when_ready(server):
+    """Build the user indexes, start the autoscaler, and watch the data file from the master when workers share a snapshot"""
+    import app as users_api
+    # Before any worker forks, so workers share the built indexes' pages
+    # and no request waits for a build
+    users_api.warm_user_indexes()
+    if autoscale:
+        start_autoscaler(server)
+    if os.environ.get("USERS_SNAPSHOT_PATH"):
+        users_api.start_dataset_reloader()
+
+def post_fork(server, worker):
+    """Start the worker's background threads (they do not survive fork) and load shedder"""
+    import app as users_api
+    users_api.start_dataset_reloader(watch_snapshot=bool(os.environ.get("USERS_SNAPSHOT_PATH")))
+    users_api.start_write_log_follower()
+    # Shed load based on the shared listen socket's accept queue
+    users_api.load_shedder.watch_listeners(worker.sockets)
+
 # Process naming
 proc_name = "users_api"
 
@@ -50,4 +146,6 @@ raw_env = [
 ]
 
 # Preload app for better memory usage
+# With USERS_SNAPSHOT_PATH set (e.g. /tmp/users.snapshot) the master writes the
+# user snapshot once and every worker serves from the same memory-mapped pages
 preload_app = True
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Bulk import of users from an NDJSON file
+Validates and loads a newline-delimited JSON file in batches, reporting
+progress and throughput, and can write the result as a snapshot file
+
+Usage:
+    python import_users.py users.jsonl
+    python import_users.py users.jsonl --snapshot /tmp/users.snapshot
+    python import_users.py users.jsonl --db users.db
+    cat users.jsonl | python import_users.py -
+
+Serve the file with USERS_DATA_PATH=users.jsonl, or the database with
+USERS_DB_PATH=users.db (see README.md).
+"""
+
+import argparse
+import sys
+
+from snapshot import write_snapshot
+from sqlite_store import SqliteUserStore
+from user_ndjson import IMPORT_BATCH_SIZE, import_ndjson
+from user_store import UserStore
+
+
+def print_progress(report):
+    print(f"📥 {report['imported']:>12,} users  {report['users_per_second']:>12,.0f} users/s"
+          f"  {report['failed']:,} failed", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import users from an NDJSON file")
+    parser.add_argument("path", help="NDJSON file with one user object per line, or - for stdin")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE,
+                        help="users written to the store per batch")
+    parser.add_argument("--snapshot", help="write the imported users to this snapshot file")
+    parser.add_argument("--db", help="import into this SQLite database instead of memory "
+                                     "(users with existing ids are replaced)")
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args()
+
+    if args.db and args.snapshot:
+        parser.error("--db and --snapshot cannot be combined")
+    store = SqliteUserStore(args.db) if args.db else UserStore()
+    progress = None if args.quiet else print_progress
+    if args.path == "-":
+        report = import_ndjson(store, sys.stdin.buffer, args.batch_size, progress)
+    else:
+        try:
+            with open(args.path, "rb") as f:
+                report = import_ndjson(store, f, args.batch_size, progress)
+        except OSError as e:
+            print(f"❌ Cannot read {args.path}: {e}")
+            sys.exit(1)
+
+    print("=" * 60)
+    print(f"✅ Imported {report['imported']:,} users from {report['lines']:,} lines "
+          f"in {report['seconds']:.2f}s ({report['users_per_second']:,.0f} users/s)")
+    print(f"   Store now holds {len(store):,} users ({report['batches']} batches)")
+    if report["failed"]:
+        print(f"⚠️  Skipped {report['failed']:,} invalid lines:")
+        for error in report["errors"][:10]:
+            print(f"   line {error['line']}: {error['error']}")
+
+    if args.snapshot:
+        count = write_snapshot(args.snapshot, store)
+        print(f"💾 Wrote {count:,} users to {args.snapshot}")
+
+    sys.exit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
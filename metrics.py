@@ -0,0 +1,251 @@
+"""
+Cross-worker request metrics for the Users API
+Each process appends its counters to its own memory-mapped file in a shared
+directory; a scrape on any worker sums every file, so /api/metrics reports
+the whole gunicorn process group in Prometheus text format
+"""
+
+import fcntl
+import glob
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_INITIAL_SIZE = 64 * 1024
+_USED = struct.Struct("<Q")
+_ENTRY_HEAD = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+
+ARCHIVE_FILE = "metrics_archive.db"
+
+# Unlabeled counters incremented through MetricsRegistry.inc, with their help text
+COUNTERS = {
+    "log_lines_dropped_total": "Log lines dropped because a worker's log buffer was full.",
+}
+
+
+def metrics_dir() -> str:
+    """Directory shared by every process of one server instance"""
+    path = os.environ.get("METRICS_DIR")
+    if not path:
+        # Without a configured directory only this process is reported
+        path = os.path.join(tempfile.gettempdir(), f"users_api_metrics_{os.getpid()}")
+        os.environ["METRICS_DIR"] = path
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def clear_metrics_dir(path: str) -> None:
+    """Remove metric files left over from a previous server run"""
+    for name in glob.glob(os.path.join(path, "metrics_*.db")):
+        os.unlink(name)
+
+
+class MmapCounters:
+    """
+    Append-only key/float64 map stored in a memory-mapped file
+
+    Layout: an 8-byte used-length header followed by entries of
+    (uint32 key length, utf-8 key padded to 8 bytes, float64 value). Only
+    the owning process writes; any process may read it concurrently.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._positions: Dict[str, int] = {}
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._file = os.fdopen(fd, "r+b")
+        if os.fstat(fd).st_size == 0:
+            self._file.truncate(_INITIAL_SIZE)
+        self._mmap = mmap.mmap(fd, 0)
+        self._used = _USED.unpack_from(self._mmap, 0)[0] or _USED.size
+        for key, _, pos in _read_entries(self._mmap):
+            self._positions[key] = pos
+
+    def inc(self, key: str, amount: float = 1.0) -> None:
+        pos = self._positions.get(key)
+        if pos is None:
+            pos = self._append(key)
+        value = _VALUE.unpack_from(self._mmap, pos)[0]
+        _VALUE.pack_into(self._mmap, pos, value + amount)
+
+    def items(self) -> List[Tuple[str, float]]:
+        return [(key, value) for key, value, _ in _read_entries(self._mmap)]
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._file.close()
+
+    def _append(self, key: str) -> int:
+        encoded = key.encode("utf-8")
+        padded = encoded + b" " * (-(_ENTRY_HEAD.size + len(encoded)) % 8)
+        size = _ENTRY_HEAD.size + len(padded) + _VALUE.size
+        while self._used + size > len(self._mmap):
+            self._grow()
+        start = self._used
+        _ENTRY_HEAD.pack_into(self._mmap, start, len(encoded))
+        self._mmap[start + _ENTRY_HEAD.size:start + _ENTRY_HEAD.size + len(padded)] = padded
+        pos = start + _ENTRY_HEAD.size + len(padded)
+        _VALUE.pack_into(self._mmap, pos, 0.0)
+        # Publish the entry only once it is fully written
+        self._used += size
+        _USED.pack_into(self._mmap, 0, self._used)
+        self._positions[key] = pos
+        return pos
+
+    def _grow(self) -> None:
+        new_size = len(self._mmap) * 2
+        self._mmap.close()
+        self._file.truncate(new_size)
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+
+
+def _read_entries(buffer) -> Iterable[Tuple[str, float, int]]:
+    used = _USED.unpack_from(buffer, 0)[0]
+    pos = _USED.size
+    while pos < used:
+        key_len = _ENTRY_HEAD.unpack_from(buffer, pos)[0]
+        key = bytes(buffer[pos + _ENTRY_HEAD.size:pos + _ENTRY_HEAD.size + key_len]).decode("utf-8")
+        padded = key_len + (-(_ENTRY_HEAD.size + key_len) % 8)
+        value_pos = pos + _ENTRY_HEAD.size + padded
+        yield key, _VALUE.unpack_from(buffer, value_pos)[0], value_pos
+        pos = value_pos + _VALUE.size
+
+
+def _read_file(path: str) -> List[Tuple[str, float]]:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    if len(data) < _USED.size:
+        return []
+    return [(key, value) for key, value, _ in _read_entries(data)]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_string(labels: Dict[str, str]) -> str:
+    return ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+
+
+class MetricsRegistry:
+    """
+    Request counters and latency histograms shared across worker processes
+
+    Files are opened lazily per process id, so a registry created before
+    gunicorn forks its workers gives every worker its own file.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._counters: Optional[MmapCounters] = None
+
+    def observe_request(self, route: str, method: str, status: int, duration: float) -> None:
+        """Record one finished request"""
+        labels = _label_string({"route": route, "method": method})
+        bucket = next((b for b in self.buckets if duration <= b), None)
+        le = "+Inf" if bucket is None else repr(bucket)
+        with self._lock:
+            counters = self._process_counters()
+            counters.inc(f'http_requests_total{{{labels},status="{status}"}}')
+            # Buckets are stored per-interval and made cumulative on collect
+            counters.inc(f'http_request_duration_seconds_bucket{{{labels},le="{le}"}}')
+            counters.inc(f"http_request_duration_seconds_sum{{{labels}}}", duration)
+            counters.inc(f"http_request_duration_seconds_count{{{labels}}}")
+
+    def inc(self, name: str, amount: float = 1.0) -> None:
+        """Add to one of the COUNTERS"""
+        with self._lock:
+            self._process_counters().inc(name, amount)
+
+    def collect(self) -> Dict[str, float]:
+        """Sum every process file (live and archived) into one sample map"""
+        totals: Dict[str, float] = {}
+        for path in glob.glob(os.path.join(metrics_dir(), "metrics_*.db")):
+            for key, value in _read_file(path):
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def busy_seconds(self) -> float:
+        """Total seconds spent serving requests by every process so far"""
+        return sum(value for key, value in self.collect().items()
+                   if key.startswith("http_request_duration_seconds_sum{"))
+
+    def render(self) -> str:
+        """Render all samples in the Prometheus text exposition format"""
+        samples = self.collect()
+        lines = [
+            "# HELP http_requests_total Total HTTP requests by route, method and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        lines += [f"{k} {_number(v)}" for k, v in sorted(samples.items())
+                  if k.startswith("http_requests_total{")]
+
+        lines += [
+            "# HELP http_request_duration_seconds HTTP request latency by route and method.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        series: Dict[str, Dict[str, float]] = {}
+        for key, value in samples.items():
+            if key.startswith("http_request_duration_seconds_bucket{"):
+                labels, le = key[len("http_request_duration_seconds_bucket{"):-1].rsplit(',le=', 1)
+                series.setdefault(labels, {})[le.strip('"')] = value
+        for labels in sorted(series):
+            cumulative = 0.0
+            for le in [repr(b) for b in self.buckets] + ["+Inf"]:
+                cumulative += series[labels].get(le, 0.0)
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{le}"}} '
+                             f"{_number(cumulative)}")
+            for suffix in ("sum", "count"):
+                value = samples.get(f"http_request_duration_seconds_{suffix}{{{labels}}}", 0.0)
+                lines.append(f"http_request_duration_seconds_{suffix}{{{labels}}} {_number(value)}")
+
+        for name, help_text in COUNTERS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter",
+                      f"{name} {_number(samples.get(name, 0.0))}"]
+        return "\n".join(lines) + "\n"
+
+    def _process_counters(self) -> MmapCounters:
+        pid = os.getpid()
+        if self._pid != pid:
+            # First use in this process (or first use after a fork)
+            self._counters = MmapCounters(os.path.join(metrics_dir(), f"metrics_{pid}.db"))
+            self._pid = pid
+        return self._counters
+
+
+def mark_process_dead(pid: int, path: Optional[str] = None) -> None:
+    """
+    Fold a dead worker's counters into the archive file
+
+    Keeps totals monotonic across worker recycling (max_requests) without
+    the directory growing one file per worker ever started.
+    """
+    path = path or metrics_dir()
+    worker_file = os.path.join(path, f"metrics_{pid}.db")
+    if not os.path.exists(worker_file):
+        return
+    with open(os.path.join(path, ".archive.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive = MmapCounters(os.path.join(path, ARCHIVE_FILE))
+        try:
+            for key, value in _read_file(worker_file):
+                archive.inc(key, value)
+            os.unlink(worker_file)
+        finally:
+            archive.close()
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
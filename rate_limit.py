@@ -0,0 +1,263 @@
+"""
+Cross-worker rate limiting and load shedding for the Users API
+Token buckets live in a memory-mapped file shared by every worker process,
+so a client's limit holds whichever worker accepts its connection. The load
+shedder turns requests away with 503 while the listen queue is deep, so the
+requests that are admitted keep a bounded wait
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from typing import Iterable, List, Mapping, Optional
+
+# Buckets in the shared table; each client hashes to one set of SLOT_WAYS
+# slots and evicts the least recently used bucket of its set when full
+DEFAULT_SLOTS = 65536
+SLOT_WAYS = 4
+
+# Seconds clients are told to wait when a request is shed
+DEFAULT_RETRY_AFTER = 1
+
+# Key hash, tokens left, monotonic time of the last refill
+_SLOT = struct.Struct("<Qdd")
+_SET_SIZE = _SLOT.size * SLOT_WAYS
+
+# Leading fields of Linux struct tcp_info. For a listening socket
+# tcpi_unacked is the accept queue length and tcpi_sacked its limit.
+_TCP_INFO = struct.Struct("<8B6I")
+_TCP_LISTEN = 10
+
+
+def rate_limit_path() -> str:
+    """File shared by every process of one server instance"""
+    path = os.environ.get("RATE_LIMIT_FILE")
+    if not path:
+        # Without a configured file only this process shares the buckets
+        path = os.path.join(tempfile.gettempdir(), f"users_api_ratelimit_{os.getpid()}.db")
+        os.environ["RATE_LIMIT_FILE"] = path
+    return path
+
+
+def client_key(headers: Mapping[str, str], remote_addr: Optional[str],
+               trusted_proxies: int = 0) -> str:
+    """
+    Identify the client a request is charged to
+
+    API keys (X-API-Key or a bearer token) identify a client across
+    addresses; otherwise the client IP is used.
+
+    Args:
+        headers: Request headers, looked up by lower-case name
+        remote_addr: Address of the connecting peer
+        trusted_proxies: Reverse proxies in front of the app; the client IP
+            is then read from X-Forwarded-For, as appended by the outermost
+            trusted proxy, since earlier entries can be forged
+
+    Returns:
+        Key string, prefixed with "key:" or "ip:"
+    """
+    api_key = headers.get("x-api-key")
+    if not api_key:
+        authorization = headers.get("authorization") or ""
+        if authorization[:7].lower() == "bearer ":
+            api_key = authorization[7:].strip()
+    if api_key:
+        return "key:" + api_key
+    if trusted_proxies:
+        forwarded = [hop.strip() for hop in (headers.get("x-forwarded-for") or "").split(",")
+                     if hop.strip()]
+        if len(forwarded) >= trusted_proxies:
+            return "ip:" + forwarded[-trusted_proxies]
+    return "ip:" + (remote_addr or "")
+
+
+def _key_hash(key: str) -> int:
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    # Zero marks an empty slot
+    return int.from_bytes(digest, "little") or 1
+
+
+class SharedTokenBuckets:
+    """
+    Token buckets in a fixed-size memory-mapped table
+
+    Every process maps the same file. A set of slots is updated under a
+    POSIX record lock on its byte range, so workers only contend when their
+    clients hash to the same set. An evicted client simply starts again
+    with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, path: Optional[str] = None,
+                 slots: int = DEFAULT_SLOTS):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.path = path or rate_limit_path()
+        self.sets = max(1, slots // SLOT_WAYS)
+        # Record locks are held per process, so threads also need this
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """
+        Take one token from a client's bucket
+
+        Args:
+            key: Client key, e.g. from client_key()
+            now: time.monotonic() value to refill up to (for tests)
+
+        Returns:
+            0.0 if the request is allowed, otherwise the seconds until the
+            bucket holds a token again
+        """
+        key_hash = _key_hash(key)
+        start = (key_hash % self.sets) * _SET_SIZE
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            table = self._table()
+            fcntl.lockf(self._file, fcntl.LOCK_EX, _SET_SIZE, start)
+            try:
+                victim, oldest = start, math.inf
+                for pos in range(start, start + _SET_SIZE, _SLOT.size):
+                    slot_hash, tokens, updated = _SLOT.unpack_from(table, pos)
+                    if slot_hash == key_hash:
+                        break
+                    if updated < oldest:
+                        victim, oldest = pos, updated
+                else:
+                    pos, tokens, updated = victim, self.burst, now
+                # A table left over from before a reboot holds later times
+                elapsed = max(0.0, now - updated)
+                tokens = min(self.burst, tokens + elapsed * self.rate)
+                if tokens >= 1:
+                    tokens -= 1
+                    wait = 0.0
+                else:
+                    wait = (1 - tokens) / self.rate
+                _SLOT.pack_into(table, pos, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(self._file, fcntl.LOCK_UN, _SET_SIZE, start)
+        return wait
+
+    def _table(self) -> mmap.mmap:
+        pid = os.getpid()
+        if self._pid != pid:
+            # First use in this process (or first use after a fork)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._file = os.fdopen(fd, "r+b")
+            size = self.sets * _SET_SIZE
+            if os.fstat(fd).st_size < size:
+                self._file.truncate(size)
+            self._mmap = mmap.mmap(fd, size)
+            self._pid = pid
+        return self._mmap
+
+
+def listen_queue_depth(sock) -> Optional[int]:
+    """Connections waiting in a TCP listening socket's accept queue, if known"""
+    try:
+        info = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, _TCP_INFO.size)
+    except (OSError, AttributeError):
+        # Not a TCP socket, or a platform without TCP_INFO
+        return None
+    fields = _TCP_INFO.unpack_from(info)
+    return fields[12] if fields[0] == _TCP_LISTEN else None
+
+
+def request_queue_seconds(request_start: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds since a proxy received the request, from X-Request-Start
+
+    Accepts nginx's "t=<seconds>.<ms>" as well as integer milliseconds or
+    microseconds since the epoch, optionally prefixed with "t=".
+    """
+    if not request_start:
+        return None
+    try:
+        stamp = float(request_start.strip().removeprefix("t="))
+    except ValueError:
+        return None
+    if stamp > 1e14:
+        stamp /= 1e6
+    elif stamp > 1e11:
+        stamp /= 1e3
+    return (time.time() if now is None else now) - stamp
+
+
+class LoadShedder:
+    """
+    Reject work early while the server is saturated
+
+    A request is shed when the accept queue of a watched listening socket
+    is longer than ``max_queue``, when this process already has
+    ``max_inflight`` requests running, or when a proxy's X-Request-Start
+    shows it has waited longer than ``max_wait`` seconds. Rejecting at the
+    door is cheap, so workers drain the queue instead of timing out on it.
+    Limits of 0 are disabled.
+    """
+
+    def __init__(self, max_queue: int = 0, max_inflight: int = 0, max_wait: float = 0.0,
+                 retry_after: int = DEFAULT_RETRY_AFTER):
+        self.max_queue = max_queue
+        self.max_inflight = max_inflight
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.inflight = 0
+        self._listeners: List = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_queue or self.max_inflight or self.max_wait)
+
+    def watch_listeners(self, sockets: Iterable) -> None:
+        """Use these listening sockets' accept queues (TCP only) for shedding"""
+        self._listeners = [sock for sock in sockets if listen_queue_depth(sock) is not None]
+
+    def queue_depth(self) -> Optional[int]:
+        """Longest accept queue among the watched sockets, or None"""
+        depths = [listen_queue_depth(sock) for sock in self._listeners]
+        depths = [depth for depth in depths if depth is not None]
+        return max(depths) if depths else None
+
+    def admit(self, request_start: Optional[str] = None) -> Optional[str]:
+        """
+        Decide whether to serve a request
+
+        Admitted requests count as in flight until ``release`` is called.
+
+        Args:
+            request_start: X-Request-Start header value, if any
+
+        Returns:
+            None when admitted, otherwise the reason the request was shed
+        """
+        if self.max_wait:
+            waited = request_queue_seconds(request_start)
+            if waited is not None and waited > self.max_wait:
+                return f"queued for {waited * 1000:.0f} ms"
+        if self.max_queue and self._listeners:
+            depth = self.queue_depth()
+            if depth is not None and depth > self.max_queue:
+                return f"{depth} connections queued"
+        with self._lock:
+            if self.max_inflight and self.inflight >= self.max_inflight:
+                return f"{self.inflight} requests in flight"
+            self.inflight += 1
+        return None
+
+    def release(self) -> None:
+        """Mark an admitted request as finished"""
+        with self._lock:
+            self.inflight -= 1
@@ -0,0 +1,189 @@
+"""
+Read-through cache for the Users API
+Sits in front of a slower source of values: entries expire after a TTL, the
+least recently used ones are evicted to stay within entry and byte limits,
+and concurrent misses for one key share a single load
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires")
+
+    def __init__(self, value: Any, size: int, expires: Optional[float]):
+        self.value = value
+        self.size = size
+        self.expires = expires
+
+
+class _Flight:
+    """A load in progress that other readers of the same key wait on"""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ReadThroughCache:
+    """
+    Thread-safe LRU cache that loads missing keys itself
+
+    Every key has at most one load in flight: readers that miss while a
+    load is running wait for its result (or its exception) instead of
+    starting their own, so a burst of misses for one key costs a single
+    backend fetch. Failed loads are not cached.
+    """
+
+    def __init__(self, loader: Optional[Callable[[Hashable], Any]] = None,
+                 ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = sys.getsizeof):
+        """
+        Args:
+            loader: Called with a key on a miss; may be overridden per get()
+            ttl: Seconds an entry stays fresh (None for no expiry)
+            max_entries: Maximum number of cached entries (None for no limit)
+            max_bytes: Maximum total size of cached values (None for no limit)
+            sizeof: Size in bytes charged for a value against max_bytes
+        """
+        self.loader = loader
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._bytes = 0
+        # Bumped by invalidation so loads that started earlier aren't stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._coalesced = 0
+        self._evictions = self._expirations = 0
+
+    def get(self, key: Hashable, loader: Optional[Callable[[Hashable], Any]] = None) -> Any:
+        """
+        Return the value for a key, loading and caching it on a miss
+
+        Args:
+            key: Cache key, passed to the loader
+            loader: Loader to use instead of the cache's own for this call
+
+        Returns:
+            The cached or freshly loaded value
+
+        Raises:
+            Whatever the loader raises, in the loading thread and in every
+            thread that waited on the same load
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires is None or entry.expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry.value
+                self._discard(key)
+                self._expirations += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                generation = self._generation
+                self._misses += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = (loader or self.loader)(key)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and generation == self._generation:
+                    self._store(key, flight.value)
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def peek(self, key: Hashable) -> Any:
+        """Return a fresh cached value without loading it, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry.expires is not None and entry.expires <= time.monotonic()):
+                return None
+            return entry.value
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop one key, including the result of a load already running for it"""
+        with self._lock:
+            self._discard(key)
+            self._generation += 1
+
+    def clear(self) -> None:
+        """Drop every entry; loads already running are not stored"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return counters since the cache was created
+
+        Returns:
+            Dict with hits, misses (loads started), coalesced (misses that
+            waited on another thread's load), evictions, expirations,
+            entries, bytes and hit_ratio
+        """
+        with self._lock:
+            lookups = self._hits + self._misses + self._coalesced
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Would evict everything else and still not fit
+            return
+        self._discard(key)
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._entries[key] = _Entry(value, size, expires)
+        self._bytes += size
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._evictions += 1
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
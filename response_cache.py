@@ -0,0 +1,196 @@
+"""
+Pre-serialized response cache for the Users API
+Each cacheable response variant is encoded once per dataset version and
+served from bytes, with a strong ETag for conditional GET support and
+compressed copies stored alongside the identity body
+"""
+
+import gzip
+import hashlib
+import threading
+import zlib
+from typing import Callable, Dict, Hashable, Optional, Tuple, Union
+
+from read_cache import ReadThroughCache
+
+BuildResult = Union[bytes, Tuple[bytes, Dict[str, str]]]
+
+# Total body bytes a ResponseCache keeps before evicting variants
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Bodies smaller than this are always sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+
+# Supported content-codings in server preference order
+COMPRESSORS = {
+    "gzip": lambda body: gzip.compress(body, compresslevel=6, mtime=0),
+    "deflate": lambda body: zlib.compress(body, 6),
+}
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a supported content-coding from an Accept-Encoding header
+
+    Honors q-values (q=0 rejects a coding) and the ``*`` wildcard.
+
+    Returns:
+        "gzip", "deflate" or None for the identity encoding
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in COMPRESSORS:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CachedResponse:
+    """Serialized response body together with its strong ETag"""
+
+    __slots__ = ("body", "etag", "headers", "_encoded")
+
+    def __init__(self, body: bytes, headers: Optional[Dict[str, str]] = None):
+        self.body = body
+        # Extra headers derived from the same data (e.g. pagination cursors)
+        self.headers = headers or {}
+        # Strong validator: derived from the exact bytes that go on the wire
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        # Compressed copies, built on first request for each coding
+        self._encoded: Dict[str, bytes] = {}
+
+    def representation(self, encoding: Optional[str]) -> Tuple[bytes, str, Optional[str]]:
+        """
+        Return the body to send for a negotiated content-coding
+
+        Compression runs at most once per coding for the lifetime of the
+        entry, i.e. once per dataset version. Each coding gets its own ETag,
+        since a strong validator must differ between representations.
+
+        Returns:
+            Tuple of (body, etag, content-coding or None for identity)
+        """
+        coding = self._coding(encoding)
+        if coding is None:
+            return self.body, self.etag, None
+        encoded = self._encoded.get(coding)
+        if encoded is None:
+            encoded = self._encoded.setdefault(coding, COMPRESSORS[coding](self.body))
+        return encoded, self.etag_for(coding), coding
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """ETag of the representation for a negotiated coding, without compressing"""
+        coding = self._coding(encoding)
+        return self.etag if coding is None else self.etag[:-1] + "-" + coding + '"'
+
+    def needs_compression(self, encoding: Optional[str]) -> bool:
+        """True if representation() would have to compress for this coding"""
+        coding = self._coding(encoding)
+        return coding is not None and coding not in self._encoded
+
+    def _coding(self, encoding: Optional[str]) -> Optional[str]:
+        # Small bodies and unknown codings are sent as they are
+        if encoding not in COMPRESSORS or len(self.body) < COMPRESSION_MIN_SIZE:
+            return None
+        return encoding
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Weak comparison of an If-None-Match header against any representation"""
+        if not if_none_match:
+            return False
+        base = self.etag[1:-1]
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate == "*":
+                return True
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            tag = candidate.strip('"')
+            if tag == base or (tag.startswith(base + "-") and tag[len(base) + 1:] in COMPRESSORS):
+                return True
+        return False
+
+
+class ResponseCache:
+    """
+    Thread-safe cache of serialized response bodies keyed by dataset version
+
+    Entries built for an older dataset version are discarded the first time
+    a newer version is requested, so a body is never served for data it was
+    not built from. Within a version the least recently used variants are
+    evicted to stay under ``max_entries`` and ``max_bytes``, and concurrent
+    requests for an uncached variant share one build.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._version: Optional[int] = None
+        self._cache = ReadThroughCache(max_entries=max_entries, max_bytes=max_bytes,
+                                       sizeof=_response_size)
+        self._lock = threading.Lock()
+
+    def get_or_build(self, version: int, key: Hashable,
+                     build: Callable[[], BuildResult]) -> CachedResponse:
+        """
+        Return the cached response for a variant, building it on a miss
+
+        Args:
+            version: Dataset version the response is derived from
+            key: Variant key (e.g. the normalized query parameters)
+            build: Callable returning the serialized body for the variant,
+                or a (body, headers) tuple
+
+        Returns:
+            CachedResponse holding the body bytes and ETag
+        """
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._version = version
+                self._cache.clear()
+            stale = version < self._version
+
+        def load(_key=None) -> CachedResponse:
+            # Serialized outside any lock, so slow builds don't block other variants
+            built = build()
+            return CachedResponse(*built) if isinstance(built, tuple) else CachedResponse(built)
+
+        if stale:
+            # Built from data that has since been replaced; don't store it
+            return load()
+        return self._cache.get((version, key), load)
+
+    def peek(self, version: int, key: Hashable) -> Optional[CachedResponse]:
+        """Return the cached response for a variant without building it"""
+        return self._cache.peek((version, key))
+
+    def clear(self) -> None:
+        """Drop every cached variant"""
+        with self._lock:
+            self._version = None
+            self._cache.clear()
+
+    def stats(self) -> Dict:
+        """Return the cached dataset version with the hit, miss and eviction counters"""
+        stats = self._cache.stats()
+        stats["version"] = self._version
+        return stats
+
+
+def _response_size(cached: CachedResponse) -> int:
+    # Compressed copies are built later and are smaller than the body
+    return len(cached.body)
@@ -0,0 +1,217 @@
+"""
+Full-text search index over user and company fields
+Keeps an inverted index from normalized terms to sorted user id lists and a
+sorted vocabulary for prefix expansion, so searches and type-ahead
+completions touch only the matching postings instead of every user
+"""
+
+import bisect
+import itertools
+import re
+import threading
+from typing import Callable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from cow_tables import CowDict, CowSortedList
+
+# UserRecord attributes that are searchable
+SEARCH_ATTRS = ("name", "username", "email", "company_name", "catch_phrase")
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+# Up to this many new or emptied terms are applied one by one; larger
+# batches rebuild the vocabulary with a single sort
+_INSERT_BATCH = 64
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lower-case alphanumeric terms"""
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+def document_terms(record) -> Set[str]:
+    """Return the distinct search terms of a user record"""
+    terms: Set[str] = set()
+    for attr in SEARCH_ATTRS:
+        terms.update(tokenize(getattr(record, attr)))
+    return terms
+
+
+def _contains(ids: Sequence[int], user_id: int) -> bool:
+    i = bisect.bisect_left(ids, user_id)
+    return i < len(ids) and ids[i] == user_id
+
+
+class SearchIndex:
+    """
+    Inverted index with prefix completion
+
+    ``match`` intersects the posting lists of every query term and pages
+    through the result in id order. ``complete`` treats the last term as a
+    prefix: matching vocabulary terms are a contiguous range of the sorted
+    vocabulary (standing in for a trie), visited in alphabetical order.
+    """
+
+    def __init__(self):
+        self._postings: CowDict[str, List[int]] = CowDict()
+        self._vocabulary: CowSortedList[str] = CowSortedList()
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        # After copy(), posting lists this index may write in place; None means all
+        self._owned: Optional[Set[str]] = None
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def add(self, user_id: int, terms: Iterable[str]) -> None:
+        """Index a user under each of its terms"""
+        postings = self._postings
+        with self._lock:
+            owned = self._owned
+            for term in terms:
+                ids = postings.get(term)
+                if ids is None:
+                    postings[term] = [user_id]
+                    self._pending.add(term)
+                    if owned is not None:
+                        owned.add(term)
+                    continue
+                if owned is not None and term not in owned:
+                    ids = self._writable(term)
+                if ids[-1] < user_id:
+                    ids.append(user_id)  # ids usually arrive in ascending order
+                else:
+                    bisect.insort(ids, user_id)
+
+    def remove(self, user_id: int, terms: Iterable[str]) -> None:
+        """Remove a user previously added with the same terms"""
+        with self._lock:
+            for term in terms:
+                ids = self._postings.get(term)
+                if ids is None:
+                    continue
+                i = bisect.bisect_left(ids, user_id)
+                if i < len(ids) and ids[i] == user_id:
+                    ids = self._writable(term)
+                    del ids[i]
+                if not ids:
+                    # The vocabulary entry is dropped on the next merge
+                    del self._postings[term]
+                    self._pending.add(term)
+
+    def copy(self) -> "SearchIndex":
+        """
+        Return an independent copy of the index
+
+        Posting lists and the term table's buckets stay shared until one
+        side writes to them, and the vocabulary is never modified in place,
+        so copying costs O(buckets) rather than O(terms).
+        """
+        with self._lock:
+            clone = SearchIndex()
+            clone._postings = self._postings.copy()
+            clone._vocabulary = self._vocabulary
+            clone._pending = set(self._pending)
+            self._owned, clone._owned = set(), set()
+        return clone
+
+    def _writable(self, term: str) -> Optional[List[int]]:
+        ids = self._postings.get(term)
+        if ids is not None and self._owned is not None and term not in self._owned:
+            # Still shared with a copy of this index; clone it before writing
+            ids = self._postings[term] = ids[:]
+            self._owned.add(term)
+        return ids
+
+    # ---------------------------------------------------------------- queries
+
+    def match(self, terms: Sequence[str], after: Optional[int] = None,
+              limit: Optional[int] = None,
+              accept: Optional[Callable[[int], bool]] = None) -> Tuple[List[int], Optional[int]]:
+        """
+        Return ids of users matching every term, in id order
+
+        Args:
+            terms: Normalized query terms
+            after: Only return ids greater than this
+            limit: Maximum number of ids to return (None for all)
+            accept: Optional predicate on user id; rejected users are skipped
+
+        Returns:
+            Tuple of (ids, id to continue after or None on the last page)
+        """
+        lists = [self._postings.get(term) or [] for term in set(terms)]
+        if not lists:
+            return [], None
+        # Walk the shortest list and probe the others
+        lists.sort(key=len)
+        smallest, others = lists[0], lists[1:]
+        start = 0 if after is None else bisect.bisect_right(smallest, after)
+        result: List[int] = []
+        for user_id in itertools.islice(smallest, start, None):
+            if accept is not None and not accept(user_id):
+                continue
+            if all(_contains(ids, user_id) for ids in others):
+                if limit is not None and len(result) == limit:
+                    return result, result[-1]
+                result.append(user_id)
+        return result, None
+
+    def complete(self, terms: Sequence[str], prefix: str, limit: int,
+                 accept: Optional[Callable[[int], bool]] = None) -> List[int]:
+        """
+        Return up to ``limit`` ids for a type-ahead query
+
+        Users must contain every term in ``terms`` plus some term starting
+        with ``prefix``. Results are ordered by the completed term, then id.
+        """
+        required = [self._postings.get(term) or [] for term in set(terms)]
+        if any(not ids for ids in required):
+            return []
+        self.merge_pending()
+        vocabulary = self._vocabulary
+        postings = self._postings
+        result: List[int] = []
+        seen: Set[int] = set()
+        for term in vocabulary.iter_from(prefix):
+            if not term.startswith(prefix):
+                break
+            for user_id in postings.get(term, ()):
+                if user_id in seen:
+                    continue
+                if accept is not None and not accept(user_id):
+                    continue
+                if all(_contains(ids, user_id) for ids in required):
+                    seen.add(user_id)
+                    result.append(user_id)
+                    if len(result) == limit:
+                        return result
+        return result
+
+    def merge_pending(self) -> None:
+        """
+        Fold terms added or emptied since the last merge into the vocabulary
+
+        Writers call this after a batch so readers never pay for the merge;
+        ``complete`` also calls it in case a writer did not. A small batch
+        edits a copy of the vocabulary, cloning only the chunks it touches.
+        """
+        if not self._pending:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            postings = self._postings
+            if len(pending) <= _INSERT_BATCH:
+                vocabulary = self._vocabulary.copy()
+                for term in pending:
+                    if term in postings:
+                        vocabulary.add(term)
+                    else:
+                        vocabulary.discard(term)
+            else:
+                # Two sorted runs, so this sort is a linear merge
+                merged = sorted(itertools.chain(self._vocabulary, sorted(pending)))
+                # Drop duplicates and terms whose postings emptied
+                vocabulary = CowSortedList.from_sorted(
+                    [t for i, t in enumerate(merged)
+                     if t in postings and (i == 0 or merged[i - 1] != t)])
+            self._vocabulary = vocabulary
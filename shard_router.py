@@ -0,0 +1,601 @@
+#!/usr/bin/env python3
+"""
+Scatter-gather router for a sharded Users API
+Users are partitioned by id across shard processes, each running app.py
+over its own share of the data (USERS_SHARD). The router serves the same
+routes: point lookups and writes go to the owning shard, while list,
+search, facet, batch and export queries go to every shard in parallel and
+the results are merged, keeping the id-ordered keyset pagination of a
+single server
+
+Usage:
+    python shard_router.py --shards 4      # start 4 local shards, route on $PORT
+    SHARD_URLS=http://10.0.0.5:5000,http://10.0.0.6:5000 gunicorn shard_router:router
+"""
+
+import argparse
+import atexit
+import http.client
+import heapq
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+from urllib.parse import urlencode, urlsplit
+
+from flask import Flask, jsonify, request
+from flask_cors import CORS
+
+from facets import parse_facet_limit, summarize_facet
+from response_cache import CachedResponse, negotiate_encoding
+from search_index import document_terms, tokenize
+from sharding import shard_for
+from spatial_index import haversine_km, parse_point
+from user_record import UserRecord
+from user_store import (
+    DEFAULT_NEAREST, DEFAULT_PAGE_SIZE, DEFAULT_SUGGESTIONS, encode_cursor, normalize_key,
+    parse_fields, project_user
+)
+
+# Seconds to wait for a shard's response
+DEFAULT_SHARD_TIMEOUT = 10.0
+
+# Seconds locally started shards get to pass their health check
+SHARD_STARTUP_TIMEOUT = 60.0
+
+# Port of the first locally started shard; shard i listens on this + i
+DEFAULT_SHARD_BASE_PORT = 5101
+
+# Settings naming per-process files; each local shard gets its own copy
+SHARD_PATH_VARIABLES = ('USERS_WAL_PATH', 'USERS_SNAPSHOT_PATH', 'USERS_DB_PATH')
+
+# Lines per chunk of a merged export stream
+EXPORT_CHUNK_LINES = 1000
+
+# Batch lookup keys and how each is matched, in the order results are listed
+BATCH_KEYS = (
+    ('ids', lambda user: user['id'], lambda key: key),
+    ('usernames', lambda user: normalize_key(user['username']) if user.get('username') else None,
+     normalize_key),
+    ('emails', lambda user: normalize_key(user['email']) if user.get('email') else None,
+     normalize_key),
+)
+
+
+class ShardUnavailable(Exception):
+    """A shard could not be reached or did not answer in time"""
+
+
+class ShardResponse(NamedTuple):
+    status: int
+    headers: http.client.HTTPMessage
+    body: bytes
+
+
+class ShardClient:
+    """
+    HTTP client for a fixed list of shards
+
+    Each thread keeps one keep-alive connection per shard for reads; a
+    connection the shard has closed meanwhile is reopened and the read
+    retried once. Writes use a fresh connection, so they are never sent
+    twice. ``scatter`` queries every shard at once from a thread pool.
+    """
+
+    def __init__(self, urls: Sequence[str], timeout: float = DEFAULT_SHARD_TIMEOUT):
+        self.urls = list(urls)
+        self.timeout = timeout
+        self._addresses = [(parts.hostname, parts.port or 80) for parts in map(urlsplit, self.urls)]
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=4 * len(self.urls), thread_name_prefix='shard')
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def connect(self, shard: int) -> http.client.HTTPConnection:
+        """Open a new connection to a shard"""
+        host, port = self._addresses[shard]
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def request(self, shard: int, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> ShardResponse:
+        """
+        Send one request to a shard and read the whole response
+
+        Raises:
+            ShardUnavailable: If the shard cannot be reached or times out
+        """
+        reading = method in ('GET', 'HEAD')
+        for attempt in range(2):
+            conn = self._connection(shard) if reading else self.connect(shard)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+                if response.will_close or not reading:
+                    conn.close()
+                return ShardResponse(response.status, response.headers, data)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                if not reading or attempt:
+                    raise ShardUnavailable(f"Shard {shard} ({self.urls[shard]}) unavailable: {e}")
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise ShardUnavailable(f"Shard {shard} ({self.urls[shard]}) unavailable: {e}")
+
+    def scatter(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> List[ShardResponse]:
+        """Send the same request to every shard in parallel, returning responses in shard order"""
+        return list(self._pool.map(lambda shard: self.request(shard, method, path, body, headers),
+                                   range(len(self.urls))))
+
+    def _connection(self, shard: int) -> http.client.HTTPConnection:
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        conn = connections.get(shard)
+        if conn is None:
+            conn = connections[shard] = self.connect(shard)
+        return conn
+
+
+router = Flask(__name__)
+CORS(router)
+
+# Shards to route to; set from SHARD_URLS, or by main() for local shards
+shards: Optional[ShardClient] = (
+    ShardClient(os.environ['SHARD_URLS'].split(','),
+                float(os.environ.get('SHARD_TIMEOUT', DEFAULT_SHARD_TIMEOUT)))
+    if os.environ.get('SHARD_URLS') else None
+)
+
+# Spreads creates without an id over the shards
+_next_create = itertools.count()
+
+
+def shard_query(**overrides) -> str:
+    """Return this request's query string with parameters replaced (None drops one)"""
+    args = request.args.to_dict()
+    for name, value in overrides.items():
+        if value is None:
+            args.pop(name, None)
+        else:
+            args[name] = value
+    return urlencode(args)
+
+
+def shard_path(path: str, **overrides) -> str:
+    query = shard_query(**overrides)
+    return f"{path}?{query}" if query else path
+
+
+def relay(response: ShardResponse):
+    """Pass a shard's response through unchanged"""
+    relayed = router.response_class(response.body, status=response.status,
+                                    content_type=response.headers.get('Content-Type'))
+    if response.headers.get('Location'):
+        relayed.headers['Location'] = response.headers['Location']
+    return relayed
+
+
+def first_error(responses: List[ShardResponse]) -> Optional[ShardResponse]:
+    """Return the first non-200 response; shards validate queries identically"""
+    return next((response for response in responses if response.status != 200), None)
+
+
+def json_response(data, headers: Optional[Dict[str, str]] = None):
+    """
+    Build a conditional, content-negotiated JSON response for merged data
+
+    Merged bodies are not cached, but still carry a strong ETag (answered
+    with 304 Not Modified) and are compressed like the shards' responses.
+    """
+    cached = CachedResponse(json.dumps(data, separators=(',', ':')).encode('utf-8') + b"\n", headers)
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if cached.matches(request.headers.get('If-None-Match')):
+        response = router.response_class(status=304)
+    else:
+        body, _, coding = cached.representation(encoding)
+        response = router.response_class(body, status=200, mimetype='application/json')
+        if coding:
+            response.headers['Content-Encoding'] = coding
+    response.headers['ETag'] = cached.etag_for(encoding)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers.update(cached.headers)
+    if 'X-Next-Cursor' in cached.headers:
+        args = request.args.to_dict()
+        args['after'] = cached.headers['X-Next-Cursor']
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def merge_users(responses: List[ShardResponse], key: Callable[[Dict], object],
+                limit: Optional[int], fields, paginated: bool = True):
+    """
+    Merge per-shard user lists, each already sorted by ``key``, into one response
+
+    Every shard returned up to ``limit`` users after the same cursor, so the
+    first ``limit`` of the merged lists are exactly the users one server
+    would have returned. The next cursor is the last returned id, since
+    cursors only encode an id.
+    """
+    pages = [json.loads(response.body) for response in responses]
+    users = list(heapq.merge(*pages, key=key))
+    more = any(response.headers.get('X-Next-Cursor') for response in responses)
+    if limit is not None and len(users) > limit:
+        users, more = users[:limit], True
+    headers = {}
+    if paginated and more and users:
+        headers['X-Next-Cursor'] = encode_cursor(users[-1]['id'])
+    if fields:
+        users = [project_user(user, fields) for user in users]
+    return json_response(users, headers)
+
+
+def parse_fields_arg(value: Optional[str]):
+    return parse_fields(value) if value is not None else None
+
+
+def user_distance(lat: float, lng: float) -> Callable[[Dict], tuple]:
+    def key(user: Dict) -> tuple:
+        geo = (user.get('address') or {}).get('geo') or {}
+        return haversine_km(lat, lng, float(geo['lat']), float(geo['lng'])), user['id']
+    return key
+
+
+def completion_order(prefix: str) -> Callable[[Dict], tuple]:
+    # Prefix search results are ordered by the completed word, then id
+    def key(user: Dict) -> tuple:
+        terms = document_terms(UserRecord.from_dict(user))
+        return min(term for term in terms if term.startswith(prefix)), user['id']
+    return key
+
+
+def by_id(user: Dict) -> int:
+    return user['id']
+
+
+@router.errorhandler(ShardUnavailable)
+def shard_unavailable(e):
+    return jsonify({"error": str(e)}), 502
+
+
+@router.route('/api/users', methods=['GET'])
+def get_users():
+    """Fan a list query out to every shard and merge the pages (see app.get_users)"""
+    try:
+        try:
+            fields = parse_fields_arg(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # Shards return whole users, so merge keys are always present
+        responses = shards.scatter('GET', shard_path('/api/users', fields=None))
+        error = first_error(responses)
+        if error is not None:
+            return relay(error)
+
+        args = request.args
+        if 'near' in args:
+            lat, lng = parse_point(args['near'])
+            k = int(args.get('k', DEFAULT_NEAREST))
+            return merge_users(responses, user_distance(lat, lng), k, fields, paginated=False)
+        if 'limit' in args:
+            limit = int(args['limit'])
+        else:
+            limit = DEFAULT_PAGE_SIZE if 'after' in args else None
+        return merge_users(responses, by_id, limit, fields)
+    except ShardUnavailable:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@router.route('/api/users/search', methods=['GET'])
+def search_users():
+    """Run a search on every shard and merge the results (see app.search_users)"""
+    try:
+        try:
+            fields = parse_fields_arg(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        responses = shards.scatter('GET', shard_path('/api/users/search', fields=None))
+        error = first_error(responses)
+        if error is not None:
+            return relay(error)
+
+        q = request.args.get('q', '')
+        if request.args.get('mode') == 'prefix':
+            limit = int(request.args.get('limit', DEFAULT_SUGGESTIONS))
+            # Completions while the last word is being typed, else a term
+            # search; prefix mode is a single page either way
+            key = completion_order(tokenize(q)[-1]) if q[-1:].isalnum() else by_id
+            return merge_users(responses, key, limit, fields, paginated=False)
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        return merge_users(responses, by_id, limit, fields)
+    except ShardUnavailable:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@router.route('/api/users/facets', methods=['GET'])
+def get_user_facets():
+    """Add up every shard's facet counts (see app.get_user_facets)"""
+    try:
+        try:
+            limit = parse_facet_limit(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # Each shard's top buckets are not enough to rank the merged ones
+        responses = shards.scatter('GET', shard_path('/api/users/facets', limit='all'))
+        error = first_error(responses)
+        if error is not None:
+            return relay(error)
+
+        results = [json.loads(response.body) for response in responses]
+        total = sum(result['total'] for result in results)
+        counts: Dict[str, Dict[str, int]] = {}
+        for result in results:
+            for facet, summary in result['facets'].items():
+                merged = counts.setdefault(facet, {})
+                for bucket in summary['buckets']:
+                    merged[bucket['value']] = merged.get(bucket['value'], 0) + bucket['count']
+        facets = {facet: summarize_facet(merged, total, limit) for facet, merged in counts.items()}
+        return json_response({"facets": facets, "total": total})
+    except ShardUnavailable:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@router.route('/api/users/batch', methods=['POST'])
+def batch_get_users():
+    """Look keys up on every shard and merge the answers (see app.batch_get_users)"""
+    try:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+        fields = payload.get('fields')
+        if fields is not None and not isinstance(fields, str):
+            return jsonify({"error": "'fields' must be a comma-separated string"}), 400
+        try:
+            fields = parse_fields_arg(fields)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # Usernames and emails can live on any shard, so every shard gets every key
+        body = json.dumps({name: payload[name] for name, _, _ in BATCH_KEYS if name in payload})
+        responses = shards.scatter('POST', '/api/users/batch', body.encode('utf-8'),
+                                   {'Content-Type': 'application/json'})
+        error = first_error(responses)
+        if error is not None:
+            return relay(error)
+
+        found_users = [user for response in responses for user in json.loads(response.body)['users']]
+        users, seen, missing = [], set(), {}
+        for name, user_key, request_key in BATCH_KEYS:
+            index = {user_key(user): user for user in found_users}
+            for key in payload.get(name, []):
+                user = index.get(request_key(key))
+                if user is None:
+                    missing.setdefault(name, []).append(key)
+                elif user['id'] not in seen:
+                    seen.add(user['id'])
+                    users.append(user)
+        if fields:
+            users = [project_user(user, fields) for user in users]
+        return jsonify({"users": users, "missing": missing}), 200
+    except ShardUnavailable:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@router.route('/api/users/export', methods=['GET'])
+def export_users():
+    """Merge every shard's NDJSON export into one id-ordered stream (see app.export_users)"""
+    try:
+        fields = parse_fields_arg(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # The merge needs each line's id, so it is exported even when not asked for
+    strip_id = bool(fields) and 'id' not in fields
+    path = shard_path('/api/users/export', fields=','.join(('id',) + fields) if strip_id else None)
+
+    connections, streams = [], []
+
+    def close_all():
+        for conn in connections:
+            conn.close()
+
+    for shard in range(len(shards)):
+        conn = shards.connect(shard)
+        connections.append(conn)
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            close_all()
+            raise ShardUnavailable(f"Shard {shard} ({shards.urls[shard]}) unavailable: {e}")
+        if response.status != 200:
+            error = ShardResponse(response.status, response.headers, response.read())
+            close_all()
+            return relay(error)
+        streams.append(response)
+
+    def keyed_lines(stream) -> Iterator:
+        for line in iter(stream.readline, b''):
+            if line.strip():
+                yield json.loads(line)['id'], line
+
+    def generate() -> Iterator[bytes]:
+        try:
+            chunk = []
+            for _, line in heapq.merge(*map(keyed_lines, streams)):
+                if strip_id:
+                    user = json.loads(line)
+                    del user['id']
+                    line = json.dumps(user, separators=(',', ':')).encode('utf-8') + b"\n"
+                chunk.append(line)
+                if len(chunk) >= EXPORT_CHUNK_LINES:
+                    yield b"".join(chunk)
+                    chunk = []
+            if chunk:
+                yield b"".join(chunk)
+        finally:
+            close_all()
+
+    response = router.response_class(generate(), status=200, mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename="users.ndjson"'
+    return response
+
+
+@router.route('/api/users', methods=['POST'])
+def create_user():
+    """Create a user on the shard owning its id, or on the next shard in turn"""
+    payload = request.get_json(silent=True)
+    user_id = payload.get('id') if isinstance(payload, dict) else None
+    if isinstance(user_id, int) and not isinstance(user_id, bool):
+        shard = shard_for(user_id, len(shards))
+    else:
+        # The shard assigns an id it owns (or rejects the body)
+        shard = next(_next_create) % len(shards)
+    return relay(shards.request(shard, 'POST', '/api/users', request.get_data(),
+                                {'Content-Type': 'application/json'}))
+
+
+@router.route('/api/users/<int:user_id>', methods=['GET', 'PUT', 'DELETE'])
+def user_by_id(user_id: int):
+    """Send a single-user read or write to the shard that owns the id"""
+    headers = {'Content-Type': request.content_type} if request.content_type else {}
+    body = request.get_data() if request.method == 'PUT' else None
+    return relay(shards.request(shard_for(user_id, len(shards)), request.method,
+                                f'/api/users/{user_id}', body, headers))
+
+
+@router.route('/api/users/changes', methods=['GET'])
+def get_user_changes():
+    """Versions are per shard, so the change feed is only served by the shards themselves"""
+    return jsonify({"error": "The change feed is not available through the shard router; "
+                             "poll each shard's /api/users/changes"}), 501
+
+
+@router.route('/api/health', methods=['GET'])
+def health_check():
+    """Healthy only when every shard is"""
+    def probe(shard: int) -> Dict:
+        try:
+            status = shards.request(shard, 'GET', '/api/health').status
+        except ShardUnavailable:
+            status = None
+        return {"url": shards.urls[shard], "healthy": status == 200}
+
+    report = list(shards._pool.map(probe, range(len(shards))))
+    healthy = all(shard['healthy'] for shard in report)
+    return jsonify({
+        "status": "healthy" if healthy else "degraded",
+        "message": f"Routing to {len(shards)} shards",
+        "shards": report,
+    }), 200 if healthy else 503
+
+
+@router.route('/', methods=['GET'])
+def home():
+    """API documentation, as served by the first shard"""
+    return relay(shards.request(0, 'GET', '/'))
+
+
+# ------------------------------------------------------------- local shards
+
+def start_local_shards(count: int, base_port: int) -> List[subprocess.Popen]:
+    """
+    Start ``count`` shard processes running app.py on consecutive local ports
+
+    Each shard gets USERS_SHARD and PORT, plus its own copy of any file set
+    in SHARD_PATH_VARIABLES (suffixed ".shard<i>"). Output goes to
+    users_api_shard<i>.log in the temp directory.
+    """
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    processes = []
+    for index in range(count):
+        env = dict(os.environ, PORT=str(base_port + index), USERS_SHARD=f"{index}/{count}")
+        for name in SHARD_PATH_VARIABLES:
+            if env.get(name):
+                env[name] = f"{env[name]}.shard{index}"
+        log = open(os.path.join(tempfile.gettempdir(), f"users_api_shard{index}.log"), 'ab')
+        processes.append(subprocess.Popen([sys.executable, app_path], env=env,
+                                          stdout=log, stderr=subprocess.STDOUT))
+        log.close()
+    return processes
+
+
+def stop_local_shards(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def wait_for_shards(client: ShardClient, processes: List[subprocess.Popen],
+                    timeout: float = SHARD_STARTUP_TIMEOUT) -> None:
+    """
+    Block until every shard answers its health check
+
+    Raises:
+        RuntimeError: If a shard exits or is not healthy within the timeout
+    """
+    deadline = time.monotonic() + timeout
+    pending = set(range(len(client)))
+    while pending:
+        for shard in list(pending):
+            if processes and processes[shard].poll() is not None:
+                raise RuntimeError(f"Shard {shard} exited with code {processes[shard].returncode}")
+            try:
+                if client.request(shard, 'GET', '/api/health').status == 200:
+                    pending.discard(shard)
+            except ShardUnavailable:
+                pass
+        if pending:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Shards {sorted(pending)} not healthy after {timeout:.0f}s")
+            time.sleep(0.2)
+
+
+def main():
+    global shards
+    parser = argparse.ArgumentParser(description="Route Users API requests across shard processes")
+    parser.add_argument('--shards', type=int, default=int(os.environ.get('SHARDS', 2)),
+                        help="local shard processes to start (ignored with SHARD_URLS)")
+    parser.add_argument('--shard-base-port', type=int, default=DEFAULT_SHARD_BASE_PORT,
+                        help="port of the first local shard")
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)),
+                        help="port the router listens on")
+    args = parser.parse_args()
+
+    processes = []
+    if shards is None:
+        processes = start_local_shards(args.shards, args.shard_base_port)
+        atexit.register(stop_local_shards, processes)
+        # Exit normally on SIGTERM too, so the shards are stopped with the router
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        shards = ShardClient([f"http://127.0.0.1:{args.shard_base_port + i}" for i in range(args.shards)])
+    print(f"⏳ Waiting for {len(shards)} shards...")
+    wait_for_shards(shards, processes)
+    for shard, url in enumerate(shards.urls):
+        print(f"  - shard {shard}/{len(shards)}: {url}")
+    print(f"🔀 Shard router listening on http://0.0.0.0:{args.port}")
+    router.run(host='0.0.0.0', port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Id-based partitioning of the user dataset across shard processes
+Each shard runs the normal Users API over the users it owns; the router in
+shard_router.py uses the same mapping to send point lookups and writes to
+the owning shard
+"""
+
+from typing import Iterable, NamedTuple, Union
+
+from user_record import UserRecord
+from user_store import validate_user
+
+
+def shard_for(user_id: int, count: int) -> int:
+    """Return the index of the shard that owns a user id"""
+    # Ids are dense integers, so plain modulo spreads them evenly and lets
+    # each shard hand out new ids without asking the others
+    return user_id % count
+
+
+class ShardSpec(NamedTuple):
+    """One shard's position in a partitioning of ``count`` shards"""
+    index: int
+    count: int
+
+    def owns(self, user_id: int) -> bool:
+        return shard_for(user_id, self.count) == self.index
+
+    def next_owned(self, user_id: int) -> int:
+        """Return the smallest id at or above user_id that this shard owns"""
+        return user_id + (self.index - user_id) % self.count
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def parse_shard(spec: str) -> ShardSpec:
+    """
+    Parse a USERS_SHARD value of the form "<index>/<count>", e.g. "0/4"
+
+    Raises:
+        ValueError: If the value is malformed or the index is out of range
+    """
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {spec!r}. Expected <index>/<count>, e.g. 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {spec!r}. Index must be between 0 and count - 1")
+    return ShardSpec(index, count)
+
+
+class ShardFilter:
+    """Write-only store wrapper that keeps just the users one shard owns"""
+
+    def __init__(self, store, shard: ShardSpec):
+        self.store = store
+        self.shard = shard
+
+    def add_many(self, users: Iterable[Union[dict, UserRecord]]) -> int:
+        """Write the owned users to the wrapped store, returning how many"""
+        owns = self.shard.owns
+        return self.store.add_many(user for user in map(validate_user, users) if owns(user.id))
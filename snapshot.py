@@ -0,0 +1,394 @@
+"""
+Memory-mapped user snapshot for the Users API
+Writes the user dataset to a read-only binary file that every gunicorn
+worker maps into memory, so the data lives once in the shared page cache
+instead of once per worker as Python objects
+"""
+
+import bisect
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from facets import DEFAULT_ZIP_PREFIX, FacetCounts, zipcode_facet
+from search_index import SearchIndex, document_terms
+from spatial_index import GridSpatialIndex
+from user_record import UserRecord
+from user_store import UserStore, UserType, normalize_key
+
+MAGIC = b"USRSNAP2"
+
+# Header: magic, dataset version, user count, section count
+_HEADER = struct.Struct("<8sQQI4x")
+# Section table entry: byte offset and number of items
+_SECTION = struct.Struct("<QQ")
+
+_STATUSES = [t.value for t in UserType]
+
+# Columnar sections in file order, with their array item format
+_SECTIONS = (
+    ("ids", "q"),
+    ("offsets", "Q"),
+    ("lengths", "I"),
+    ("statuses", "B"),
+    ("lats", "d"),
+    ("lngs", "d"),
+    *((f"status_{s}", "I") for s in _STATUSES),
+    ("username_hash", "Q"), ("username_pos", "I"),
+    ("email_hash", "Q"), ("email_pos", "I"),
+    ("city_hash", "Q"), ("city_pos", "I"),
+    ("records", "B"),
+)
+
+
+def _hash(value: str) -> int:
+    """Stable 64-bit hash of a normalized index key (same in every process)"""
+    digest = hashlib.blake2b(normalize_key(value).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def default_encode(user: Dict) -> bytes:
+    """Compact JSON encoding with sorted keys, matching Flask's jsonify"""
+    return json.dumps(user, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def write_snapshot(path: str, store: UserStore,
+                   encode: Optional[Callable[[Dict], bytes]] = None) -> int:
+    """
+    Write a store's users to a snapshot file
+
+    The file is written next to ``path`` and renamed into place, so readers
+    never observe a partially written snapshot.
+
+    Args:
+        path: Destination file path
+        store: Store to snapshot
+        encode: Serializer for one public user dict; the stored bytes are
+            served verbatim, so it must match the API's JSON encoding.
+            Defaults to UserRecord.to_json (same bytes as default_encode)
+
+    Returns:
+        Number of users written
+    """
+    records = store.all()
+    if encode is None:
+        bodies = [record.to_json() for record in records]
+    else:
+        bodies = [encode(record.to_dict()) for record in records]
+
+    offsets, lengths, position = [], [], 0
+    for body in bodies:
+        offsets.append(position)
+        lengths.append(len(body))
+        position += len(body)
+
+    status_codes = {status: code for code, status in enumerate(_STATUSES)}
+    columns: Dict[str, Iterable[int]] = {
+        "ids": [r.id for r in records],
+        "offsets": offsets,
+        "lengths": lengths,
+        "statuses": [status_codes[r.status] for r in records],
+        # NaN marks users without coordinates
+        "lats": [math.nan if r.lat is None else r.lat for r in records],
+        "lngs": [math.nan if r.lng is None else r.lng for r in records],
+    }
+    for status in _STATUSES:
+        columns[f"status_{status}"] = [i for i, r in enumerate(records) if r.status == status]
+    for name, attr in (("username", "username"), ("email", "email"), ("city", "city")):
+        # Sorting by (hash, position) keeps equal keys in id order
+        pairs = sorted((_hash(getattr(r, attr)), i) for i, r in enumerate(records)
+                       if getattr(r, attr))
+        columns[f"{name}_hash"] = [h for h, _ in pairs]
+        columns[f"{name}_pos"] = [i for _, i in pairs]
+
+    blobs = []
+    for name, fmt in _SECTIONS:
+        if name == "records":
+            blobs.append((b"".join(bodies), position))
+        else:
+            values = list(columns[name])
+            blobs.append((struct.pack(f"<{len(values)}{fmt}", *values), len(values)))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            table_size = _HEADER.size + _SECTION.size * len(_SECTIONS)
+            offset = table_size
+            table = []
+            for data, count in blobs:
+                offset += -offset % 8  # keep every column 8-byte aligned
+                table.append((offset, count))
+                offset += len(data)
+            f.write(_HEADER.pack(MAGIC, store.version, len(records), len(_SECTIONS)))
+            for entry in table:
+                f.write(_SECTION.pack(*entry))
+            for (data, _), (section_offset, _) in zip(blobs, table):
+                f.write(b"\0" * (section_offset - f.tell()))
+                f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(records)
+
+
+class MmapUserStore:
+    """
+    Read-only user store backed by a memory-mapped snapshot file
+
+    Implements the read API of UserStore. Lookups binary-search columnar
+    arrays directly in the mapped pages and records are decoded only when
+    asked for; ``page_raw`` hands out the stored JSON bytes so list
+    responses are assembled without building any per-user objects.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self._count, sections = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or sections != len(_SECTIONS):
+            self._mmap.close()
+            raise ValueError(f"Not a user snapshot file: {path}")
+
+        view = memoryview(self._mmap)
+        self._columns = {}
+        for i, (name, fmt) in enumerate(_SECTIONS):
+            offset, count = _SECTION.unpack_from(self._mmap, _HEADER.size + i * _SECTION.size)
+            size = count * struct.calcsize(fmt)
+            self._columns[name] = view[offset:offset + size].cast(fmt)
+        self._ids = self._columns["ids"]
+        self._offsets = self._columns["offsets"]
+        self._lengths = self._columns["lengths"]
+        self._records = self._columns["records"]
+        # Built per process on first use: the grid from the lat/lng columns,
+        # the search index and facet counts by decoding every record once
+        self._spatial: Optional[GridSpatialIndex] = None
+        self._search: Optional[SearchIndex] = None
+        self._facets: Optional[FacetCounts] = None
+        self._index_lock = threading.Lock()
+
+    def warm_indexes(self, like=None) -> None:
+        """
+        Build the lazily created spatial and search indexes and facet counts ahead of use
+
+        Args:
+            like: Store being replaced; only the indexes it had already
+                built are created, so unused features cost nothing
+        """
+        if like is None or getattr(like, "_spatial", None) is not None:
+            self._spatial_index()
+        if like is None or getattr(like, "_search", None) is not None:
+            self._search_index()
+        if like is None or getattr(like, "_facets", None) is not None:
+            self._facet_counts()
+
+    def close(self) -> None:
+        """Release the mapping"""
+        for column in self._columns.values():
+            column.release()
+        self._columns = {}
+        self._mmap.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, user_id: int) -> bool:
+        return self._find(user_id) >= 0
+
+    # ------------------------------------------------------------------ reads
+
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        """Return the user with the given id, or None"""
+        pos = self._find(user_id)
+        return None if pos < 0 else self._record(pos)
+
+    def get_raw(self, user_id: int) -> Optional[bytes]:
+        """Return the stored JSON bytes for a user, or None"""
+        pos = self._find(user_id)
+        return None if pos < 0 else self._raw(pos)
+
+    def get_by_username(self, username: str) -> Optional[UserRecord]:
+        """Return the user with the given username (case-insensitive), or None"""
+        return next(self._lookup("username", username), None)
+
+    def get_by_email(self, email: str) -> Optional[UserRecord]:
+        """Return the user with the given email (case-insensitive), or None"""
+        return next(self._lookup("email", email), None)
+
+    def all(self) -> List[UserRecord]:
+        """Return every user in id order"""
+        return [self._record(pos) for pos in range(self._count)]
+
+    def filter_by_status(self, status: str) -> List[UserRecord]:
+        """Return users whose status matches a UserType value, in id order"""
+        return [self._record(pos) for pos in self._status_positions(status)]
+
+    def filter_by_city(self, city: str) -> List[UserRecord]:
+        """Return users living in the given city (case-insensitive), in id order"""
+        return list(self._lookup("city", city))
+
+    def nearest(self, lat: float, lng: float, k: int,
+                status: Optional[str] = None) -> List[UserRecord]:
+        """Return the k users closest to a point, nearest first"""
+        accept = self._status_filter(status)
+        return [self.get(uid) for _, uid in self._spatial_index().nearest(lat, lng, k, accept)]
+
+    def search(self, terms: Sequence[str], status: Optional[str] = None, after: Optional[int] = None,
+               limit: Optional[int] = None) -> Tuple[List[UserRecord], Optional[int]]:
+        """Return one keyset page of users matching every search term"""
+        ids, next_after = self._search_index().match(terms, after, limit,
+                                                     self._status_filter(status))
+        return [self.get(uid) for uid in ids], next_after
+
+    def autocomplete(self, terms: Sequence[str], prefix: str, limit: int,
+                     status: Optional[str] = None) -> List[UserRecord]:
+        """Return up to ``limit`` users matching ``terms`` and a term starting with ``prefix``"""
+        ids = self._search_index().complete(terms, prefix, limit, self._status_filter(status))
+        return [self.get(uid) for uid in ids]
+
+    def page(self, status: Optional[str] = None, after: Optional[int] = None,
+             limit: Optional[int] = None,
+             bbox: Optional[Tuple[float, float, float, float]] = None
+             ) -> Tuple[List[UserRecord], Optional[int]]:
+        """Return one keyset page of users in id order (see UserStore.page)"""
+        positions, next_after = self._page_positions(status, after, limit, bbox)
+        return [self._record(pos) for pos in positions], next_after
+
+    def page_raw(self, status: Optional[str] = None, after: Optional[int] = None,
+                 limit: Optional[int] = None,
+                 bbox: Optional[Tuple[float, float, float, float]] = None
+                 ) -> Tuple[List[bytes], Optional[int]]:
+        """Like page(), but return each user's stored JSON bytes"""
+        positions, next_after = self._page_positions(status, after, limit, bbox)
+        return [self._raw(pos) for pos in positions], next_after
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Return the number of users per status"""
+        return {s: len(self._columns[f"status_{s}"]) for s in _STATUSES}
+
+    def facet_counts(self, facet: str, status: Optional[str] = None,
+                     zip_prefix: int = DEFAULT_ZIP_PREFIX) -> Dict[str, int]:
+        """Return the number of users per value of a facet (see UserStore.facet_counts)"""
+        statuses = _STATUSES if status is None else [status.upper()]
+        if facet == "status":
+            return {s: len(self._status_positions(s)) for s in statuses if s in _STATUSES}
+        if facet == "zipcode":
+            facet = zipcode_facet(zip_prefix)
+        return self._facet_counts().counts(facet, statuses)
+
+    # ----------------------------------------------------------------- writes
+
+    def add(self, user) -> None:
+        raise RuntimeError("Snapshot store is read-only")
+
+    add_many = add
+
+    def remove(self, user_id: int) -> bool:
+        raise RuntimeError("Snapshot store is read-only")
+
+    # -------------------------------------------------------------- internals
+
+    def _find(self, user_id: int) -> int:
+        pos = bisect.bisect_left(self._ids, user_id)
+        if pos < self._count and self._ids[pos] == user_id:
+            return pos
+        return -1
+
+    def _raw(self, pos: int) -> bytes:
+        start = self._offsets[pos]
+        return self._records[start:start + self._lengths[pos]].tobytes()
+
+    def _record(self, pos: int) -> UserRecord:
+        return UserRecord.from_dict(json.loads(self._raw(pos)))
+
+    def _status_positions(self, status: str):
+        column = self._columns.get(f"status_{status.upper()}")
+        return column if column is not None else []
+
+    def _status_filter(self, status: Optional[str]):
+        if status is None:
+            return None
+        code = _STATUSES.index(status.upper())
+        statuses = self._columns["statuses"]
+        return lambda uid: statuses[self._find(uid)] == code
+
+    def _search_index(self) -> SearchIndex:
+        if self._search is None:
+            with self._index_lock:
+                if self._search is None:
+                    index = SearchIndex()
+                    for pos in range(self._count):
+                        index.add(self._ids[pos], document_terms(self._record(pos)))
+                    index.merge_pending()
+                    self._search = index
+        return self._search
+
+    def _facet_counts(self) -> FacetCounts:
+        if self._facets is None:
+            with self._index_lock:
+                if self._facets is None:
+                    counts = FacetCounts()
+                    counts.add_many(self._record(pos) for pos in range(self._count))
+                    self._facets = counts
+        return self._facets
+
+    def _spatial_index(self) -> GridSpatialIndex:
+        if self._spatial is None:
+            with self._index_lock:
+                if self._spatial is None:
+                    index = GridSpatialIndex()
+                    index.add_many(zip(self._ids, self._columns["lats"], self._columns["lngs"]))
+                    self._spatial = index
+        return self._spatial
+
+    def _page_positions(self, status: Optional[str], after: Optional[int],
+                        limit: Optional[int],
+                        bbox: Optional[Tuple[float, float, float, float]] = None
+                        ) -> Tuple[List[int], Optional[int]]:
+        if bbox is not None:
+            positions = [self._find(uid) for uid in self._spatial_index().within_bbox(*bbox)]
+            if status is not None:
+                code = _STATUSES.index(status.upper())
+                statuses = self._columns["statuses"]
+                positions = [pos for pos in positions if statuses[pos] == code]
+            ids = [self._ids[pos] for pos in positions]
+            start = 0 if after is None else bisect.bisect_right(ids, after)
+            total = len(positions)
+            end = total if limit is None else min(start + limit, total)
+            positions = positions[start:end]
+        elif status is None:
+            start = 0 if after is None else bisect.bisect_right(self._ids, after)
+            total = self._count
+            end = total if limit is None else min(start + limit, total)
+            positions = list(range(start, end))
+        else:
+            column = self._status_positions(status)
+            ids = self._ids
+            start = 0 if after is None else bisect.bisect_right(column, after, key=ids.__getitem__)
+            total = len(column)
+            end = total if limit is None else min(start + limit, total)
+            positions = list(column[start:end])
+        if limit is not None and end < total and positions:
+            return positions, self._ids[positions[-1]]
+        return positions, None
+
+    def _lookup(self, name: str, value: str):
+        hashes = self._columns[f"{name}_hash"]
+        positions = self._columns[f"{name}_pos"]
+        target = _hash(value)
+        i = bisect.bisect_left(hashes, target)
+        while i < len(hashes) and hashes[i] == target:
+            record = self._record(positions[i])
+            # Guard against 64-bit hash collisions
+            if normalize_key(getattr(record, name) or "") == normalize_key(value):
+                yield record
+            i += 1
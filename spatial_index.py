@@ -0,0 +1,284 @@
+"""
+Grid spatial index over user coordinates
+Buckets users into fixed-size latitude/longitude cells so nearest-neighbour
+and bounding-box queries only visit the cells around the query instead of
+scanning every user
+"""
+
+import heapq
+import math
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_point(value: str) -> Tuple[float, float]:
+    """
+    Parse a ``lat,lng`` query value
+
+    Raises:
+        ValueError: If the value is malformed or out of range
+    """
+    parts = value.split(",")
+    if len(parts) != 2:
+        raise ValueError("Invalid near. Expected near=lat,lng")
+    try:
+        lat, lng = float(parts[0]), float(parts[1])
+    except ValueError:
+        raise ValueError("Invalid near. Expected near=lat,lng")
+    _check_range(lat, lng, "near")
+    return lat, lng
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """
+    Parse a ``minLat,minLng,maxLat,maxLng`` query value
+
+    minLng may exceed maxLng for boxes that cross the antimeridian.
+
+    Raises:
+        ValueError: If the value is malformed or out of range
+    """
+    parts = value.split(",")
+    message = "Invalid bbox. Expected bbox=minLat,minLng,maxLat,maxLng"
+    if len(parts) != 4:
+        raise ValueError(message)
+    try:
+        min_lat, min_lng, max_lat, max_lng = (float(p) for p in parts)
+    except ValueError:
+        raise ValueError(message)
+    _check_range(min_lat, min_lng, "bbox")
+    _check_range(max_lat, max_lng, "bbox")
+    if min_lat > max_lat:
+        raise ValueError("Invalid bbox. minLat must not exceed maxLat")
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def _check_range(lat: float, lng: float, name: str) -> None:
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        raise ValueError(f"Invalid {name}. Latitude must be within ±90 and longitude within ±180")
+
+
+class _Cell:
+    __slots__ = ("ids", "lats", "lngs")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.lats = array("d")
+        self.lngs = array("d")
+
+    def copy(self) -> "_Cell":
+        cell = _Cell()
+        cell.ids, cell.lats, cell.lngs = self.ids[:], self.lats[:], self.lngs[:]
+        return cell
+
+
+class GridSpatialIndex:
+    """
+    Fixed-size lat/lng grid with incremental inserts and removals
+
+    Each cell keeps its points in parallel typed arrays. Queries visit only
+    the cells that can contain a result, so their cost depends on the
+    local point density rather than on the total number of users.
+    """
+
+    def __init__(self, cell_size: float = 1.0):
+        self.cell_size = cell_size
+        self.rows = int(math.ceil(180.0 / cell_size))
+        self.cols = int(math.ceil(360.0 / cell_size))
+        self._cells: Dict[Tuple[int, int], _Cell] = {}
+        self._count = 0
+        # After copy(), cells this index may write in place; None means all
+        self._owned: Optional[Set[Tuple[int, int]]] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _cell_key(self, lat: float, lng: float) -> Tuple[int, int]:
+        row = min(self.rows - 1, int((lat + 90.0) / self.cell_size))
+        col = int((lng + 180.0) / self.cell_size) % self.cols
+        return row, col
+
+    def add(self, user_id: int, lat: Optional[float], lng: Optional[float]) -> None:
+        """Index a point; users without coordinates are ignored"""
+        if lat is None or lng is None or math.isnan(lat) or math.isnan(lng):
+            return
+        key = self._cell_key(lat, lng)
+        cell = self._writable_cell(key)
+        if cell is None:
+            cell = self._cells[key] = _Cell()
+            if self._owned is not None:
+                self._owned.add(key)
+        cell.ids.append(user_id)
+        cell.lats.append(lat)
+        cell.lngs.append(lng)
+        self._count += 1
+
+    def add_many(self, points: Iterable[Tuple[int, Optional[float], Optional[float]]]) -> None:
+        for user_id, lat, lng in points:
+            self.add(user_id, lat, lng)
+
+    def remove(self, user_id: int, lat: Optional[float], lng: Optional[float]) -> None:
+        """Remove a point previously added with the same coordinates"""
+        if lat is None or lng is None or math.isnan(lat) or math.isnan(lng):
+            return
+        key = self._cell_key(lat, lng)
+        cell = self._cells.get(key)
+        if cell is None:
+            return
+        try:
+            i = cell.ids.index(user_id)
+        except ValueError:
+            return
+        cell = self._writable_cell(key)
+        for column in (cell.ids, cell.lats, cell.lngs):
+            column.pop(i)
+        self._count -= 1
+        if not cell.ids:
+            del self._cells[key]
+
+    def copy(self) -> "GridSpatialIndex":
+        """
+        Return an independent copy of the index
+
+        Only the cell table is copied. Cells stay shared until one side
+        writes to them, so copying costs O(cells) rather than O(points).
+        """
+        clone = GridSpatialIndex(self.cell_size)
+        clone._cells = dict(self._cells)
+        clone._count = self._count
+        self._owned, clone._owned = set(), set()
+        return clone
+
+    def _writable_cell(self, key: Tuple[int, int]) -> Optional[_Cell]:
+        cell = self._cells.get(key)
+        if cell is not None and self._owned is not None and key not in self._owned:
+            # Still shared with a copy of this index; clone it before writing
+            cell = self._cells[key] = cell.copy()
+            self._owned.add(key)
+        return cell
+
+    # ---------------------------------------------------------------- queries
+
+    def within_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[int]:
+        """
+        Return ids of points inside a bounding box, in ascending id order
+
+        A box with min_lng > max_lng wraps across the antimeridian.
+        """
+        row_lo, _ = self._cell_key(min_lat, 0.0)
+        row_hi, _ = self._cell_key(max_lat, 0.0)
+        if min_lng <= max_lng:
+            spans = [(min_lng, max_lng)]
+        else:
+            spans = [(min_lng, 180.0), (-180.0, max_lng)]
+
+        result: List[int] = []
+        for lng_lo, lng_hi in spans:
+            col_lo = int((lng_lo + 180.0) / self.cell_size)
+            col_hi = min(self.cols - 1, int((lng_hi + 180.0) / self.cell_size))
+            for row in range(row_lo, row_hi + 1):
+                for col in range(col_lo, col_hi + 1):
+                    cell = self._cells.get((row, col % self.cols))
+                    if cell is None:
+                        continue
+                    lats, lngs = cell.lats, cell.lngs
+                    result.extend(
+                        uid for i, uid in enumerate(cell.ids)
+                        if min_lat <= lats[i] <= max_lat and lng_lo <= lngs[i] <= lng_hi
+                    )
+        result = sorted(set(result)) if len(spans) > 1 else sorted(result)
+        return result
+
+    def nearest(self, lat: float, lng: float, k: int,
+                accept=None) -> List[Tuple[float, int]]:
+        """
+        Return the k nearest points as (distance_km, id), closest first
+
+        Cells are visited in square rings around the query cell. The search
+        stops once no unvisited ring can hold a point closer than the
+        current k-th best, so the result is exact.
+
+        Args:
+            lat, lng: Query point
+            k: Number of neighbours to return
+            accept: Optional predicate on user id; rejected users are skipped
+        """
+        if k <= 0 or not self._count:
+            return []
+        row0, col0 = self._cell_key(lat, lng)
+        heap: List[Tuple[float, int]] = []  # max-heap of (-distance, id)
+        max_ring = max(self.rows, self.cols)
+        seen_cols_all = False
+        visited = set()  # rings wrap around in longitude on very wide searches
+
+        for ring in range(max_ring + 1):
+            for row, col in self._ring_cells(row0, col0, ring, visited):
+                cell = self._cells.get((row, col))
+                if cell is None:
+                    continue
+                lats, lngs = cell.lats, cell.lngs
+                for i, uid in enumerate(cell.ids):
+                    if accept is not None and not accept(uid):
+                        continue
+                    d = haversine_km(lat, lng, lats[i], lngs[i])
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d, uid))
+                    elif d < -heap[0][0]:
+                        heapq.heapreplace(heap, (-d, uid))
+
+            if 2 * ring + 1 >= self.cols:
+                seen_cols_all = True
+            if seen_cols_all and row0 - ring <= 0 and row0 + ring >= self.rows - 1:
+                break  # every cell has been visited
+            if accept is None and len(heap) == self._count:
+                break  # every indexed point is already in the result
+            if len(heap) == k and -heap[0][0] <= self._unvisited_bound_km(lat, ring):
+                break
+
+        return sorted((-d, uid) for d, uid in heap)
+
+    def _ring_cells(self, row0: int, col0: int, ring: int, seen: set):
+        """Yield the not yet visited (row, col) cells on the ring at a given radius"""
+        for drow in range(-ring, ring + 1):
+            row = row0 + drow
+            if not 0 <= row < self.rows:
+                continue
+            if abs(drow) == ring:
+                dcols = range(-ring, ring + 1)
+            else:
+                dcols = (-ring, ring) if ring else (0,)
+            for dcol in dcols:
+                col = (col0 + dcol) % self.cols
+                if (row, col) not in seen:
+                    seen.add((row, col))
+                    yield row, col
+
+    def _unvisited_bound_km(self, lat: float, ring: int) -> float:
+        """
+        Lower bound on the distance from the query to any unvisited cell
+
+        After visiting rings 0..ring, every unvisited point differs from the
+        query by at least ``ring`` cells in latitude or in longitude.
+        """
+        gap_deg = ring * self.cell_size
+        if gap_deg <= 0:
+            return 0.0
+        lat_gap = math.radians(gap_deg) * EARTH_RADIUS_KM
+        # Cross-track distance to the meridian gap_deg away; beyond 90 degrees
+        # the closest unvisited point is no nearer than the pole
+        lng_gap = math.asin(min(1.0, abs(math.cos(math.radians(lat)))
+                                * math.sin(math.radians(min(gap_deg, 90.0))))) * EARTH_RADIUS_KM
+        if 2 * ring + 1 >= self.cols:
+            lng_gap = float("inf")  # all longitudes already covered
+        return min(lat_gap, lng_gap)
@@ -0,0 +1,532 @@
+"""
+SQLite-backed user store for the Users API
+Keeps users in a WAL-mode database file so datasets larger than memory can
+be served, with one pooled connection per thread so threaded servers read
+concurrently without a global lock
+"""
+
+import bisect
+import json
+import math
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from facets import DEFAULT_ZIP_PREFIX
+from search_index import document_terms
+from spatial_index import GridSpatialIndex
+from user_record import UserRecord
+from user_store import UserType, normalize_key, validate_user
+
+# Prepared statements kept per connection by the sqlite3 module
+STATEMENT_CACHE_SIZE = 256
+
+# Milliseconds a writer waits for another process's write to finish
+BUSY_TIMEOUT_MS = 5000
+
+# Bytes of the database file each process maps for reads
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Users fetched per statement when checking which ids already exist
+_ID_BATCH = 500
+
+# Postings counted per term when choosing which term drives a search
+_TERM_COUNT_CAP = 10000
+
+# Degrees per grid cell of the stored cell column (see GridSpatialIndex)
+CELL_SIZE = 1.0
+
+# Bounding boxes spanning up to this many cells are answered from the cell
+# index; larger ones scan users in id order, which stops at the page limit
+BBOX_CELL_LIMIT = 400
+
+_GRID = GridSpatialIndex(CELL_SIZE)
+
+# The users table holds each user's compact JSON body plus the columns that
+# are filtered on. Secondary indexes implicitly end in the rowid (the user
+# id), so the status, city and company indexes cover id-ordered keyset scans
+# and counts, and users_cell covers nearest-neighbour and small bounding-box
+# probes, without touching the table. terms is an inverted index clustered by (term, id).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    username_key TEXT,
+    email_key TEXT,
+    city_key TEXT,
+    company_key TEXT,
+    lat REAL,
+    lng REAL,
+    cell INTEGER,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_status ON users (status);
+CREATE INDEX IF NOT EXISTS users_city ON users (city_key);
+CREATE INDEX IF NOT EXISTS users_company ON users (company_key);
+CREATE INDEX IF NOT EXISTS users_username ON users (username_key);
+CREATE INDEX IF NOT EXISTS users_email ON users (email_key);
+CREATE INDEX IF NOT EXISTS users_cell ON users (cell, status, lat, lng);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (term, id)
+) WITHOUT ROWID;
+"""
+
+_SELECT_VERSION = "SELECT value FROM meta WHERE key = 'version'"
+_BUMP_VERSION = "UPDATE meta SET value = value + 1 WHERE key = 'version'"
+_UPSERT_USER = (
+    "INSERT OR REPLACE INTO users (id, status, username_key, email_key, city_key, "
+    "company_key, lat, lng, cell, body) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_DELETE_USER = "DELETE FROM users WHERE id = ?"
+_INSERT_TERM = "INSERT OR IGNORE INTO terms (term, id) VALUES (?, ?)"
+_DELETE_TERM = "DELETE FROM terms WHERE term = ? AND id = ?"
+_SELECT_BY_ID = "SELECT body FROM users WHERE id = ?"
+_SELECT_BY_USERNAME = "SELECT body FROM users WHERE username_key = ? LIMIT 1"
+_SELECT_BY_EMAIL = "SELECT body FROM users WHERE email_key = ? LIMIT 1"
+_SELECT_BY_CITY = "SELECT body FROM users WHERE city_key = ? ORDER BY id"
+_SELECT_BY_COMPANY = "SELECT body FROM users WHERE company_key = ? ORDER BY id"
+_SELECT_ALL = "SELECT body FROM users ORDER BY id"
+_SELECT_BY_STATUS = "SELECT body FROM users WHERE status = ? ORDER BY id"
+_COUNT_USERS = "SELECT count(*) FROM users"
+_COUNT_BY_STATUS = "SELECT status, count(*) FROM users GROUP BY status"
+# Facet buckets grouped from the stored JSON, one scan per query
+_FACET_PATHS = {"city": "$.address.city", "zipcode": "$.address.zipcode", "company": "$.company.name"}
+_COUNT_FACET = (
+    "SELECT {bucket}, count(*) FROM "
+    "(SELECT json_extract(CAST(body AS TEXT), ?) AS value FROM users WHERE {where}) "
+    "WHERE value IS NOT NULL AND value != '' GROUP BY 1"
+)
+_COUNT_LOCATED = "SELECT count(*) FROM users WHERE cell IS NOT NULL"
+_COUNT_LOCATED_BY_STATUS = "SELECT count(*) FROM users WHERE cell IS NOT NULL AND status = ?"
+_SELECT_CELL = "SELECT id, lat, lng FROM users WHERE cell = ?"
+_SELECT_CELL_BY_STATUS = "SELECT id, lat, lng FROM users WHERE cell = ? AND status = ?"
+_COUNT_TERM = "SELECT count(*) FROM (SELECT 1 FROM terms WHERE term = ? LIMIT ?)"
+
+# Lower bound for keyset scans started without a cursor
+_MIN_ID = -(1 << 63)
+
+
+def _cell(lat: Optional[float], lng: Optional[float]) -> Optional[int]:
+    if lat is None or lng is None or math.isnan(lat) or math.isnan(lng):
+        return None
+    row, col = _GRID._cell_key(lat, lng)
+    return row * _GRID.cols + col
+
+
+def _key(value: Optional[str]) -> Optional[str]:
+    return normalize_key(value) if value else None
+
+
+def _decode(body: bytes) -> UserRecord:
+    return UserRecord.from_dict(json.loads(body))
+
+
+def _row(user: UserRecord) -> tuple:
+    return (user.id, user.status, _key(user.username), _key(user.email), _key(user.city),
+            _key(user.company_name), user.lat, user.lng, _cell(user.lat, user.lng),
+            user.to_json())
+
+
+class _CellRows(NamedTuple):
+    ids: List[int]
+    lats: List[float]
+    lngs: List[float]
+
+
+class _DatabaseCells:
+    """Mapping-like view of grid cells, read from the users_cell index on demand"""
+
+    def __init__(self, conn: sqlite3.Connection, status: Optional[str]):
+        self._conn = conn
+        self._status = status
+
+    def get(self, key: Tuple[int, int]) -> Optional[_CellRows]:
+        row, col = key
+        if self._status is None:
+            rows = self._conn.execute(_SELECT_CELL, (row * _GRID.cols + col,)).fetchall()
+        else:
+            rows = self._conn.execute(_SELECT_CELL_BY_STATUS,
+                                      (row * _GRID.cols + col, self._status)).fetchall()
+        if not rows:
+            return None
+        ids, lats, lngs = zip(*rows)
+        return _CellRows(list(ids), list(lats), list(lngs))
+
+
+class _DatabaseGrid(GridSpatialIndex):
+    """Read-only GridSpatialIndex over the stored cell column, for one query"""
+
+    def __init__(self, conn: sqlite3.Connection, status: Optional[str], count: int = 0):
+        super().__init__(CELL_SIZE)
+        self._cells = _DatabaseCells(conn, status)
+        # Located users matching the status; only nearest() relies on it
+        self._count = count
+
+
+def _bbox_cells(bbox: Tuple[float, float, float, float]) -> int:
+    min_lat, min_lng, max_lat, max_lng = bbox
+    rows = int((max_lat - min_lat) / CELL_SIZE) + 2
+    width = max_lng - min_lng if min_lng <= max_lng else 360.0 - (min_lng - max_lng)
+    return rows * (int(width / CELL_SIZE) + 2)
+
+
+class SqliteUserStore:
+    """
+    User store backed by a SQLite database file
+
+    Implements the UserRepository API. Each thread (and each process after a
+    fork) gets its own connection, opened on first use and reused after
+    that, so threaded servers read in parallel under WAL without any Python
+    lock. Writes run in immediate transactions and bump a version counter
+    kept in the database, so every process sees the same ``version``.
+
+    Stored bodies are the users' compact JSON, which ``page_raw`` splices
+    straight into responses. Nearest-neighbour queries walk the same grid as
+    GridSpatialIndex, but read each cell from an index instead of memory,
+    and search runs against an inverted index table. No per-process index
+    has to be built or kept current.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._located: Dict[Tuple[int, Optional[str]], int] = {}
+        # Create the schema once; WAL mode is persistent in the file
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    # ------------------------------------------------------------ connections
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        pid = os.getpid()
+        if conn is not None and self._local.pid == pid:
+            return conn
+        if self._pid != pid:
+            # Connections must never be shared across a fork
+            self._connections = []
+            self._pid = pid
+        conn = sqlite3.connect(self.path, isolation_level=None,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        self._local.conn = conn
+        self._local.pid = pid
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close every connection this process opened"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute(_BUMP_VERSION)
+        conn.execute("COMMIT")
+
+    # ----------------------------------------------------------------- status
+
+    @property
+    def version(self) -> int:
+        return self._connection().execute(_SELECT_VERSION).fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._connection().execute(_COUNT_USERS).fetchone()[0]
+
+    def __contains__(self, user_id: int) -> bool:
+        return self._connection().execute(_SELECT_BY_ID, (user_id,)).fetchone() is not None
+
+    def warm_indexes(self, like=None) -> None:
+        """Nothing to build: every index lives in the database"""
+
+    # ----------------------------------------------------------------- writes
+
+    def add(self, user: Union[Dict, UserRecord]) -> None:
+        """Insert or replace a single user"""
+        self.add_many([user])
+
+    def add_many(self, users: Iterable[Union[Dict, UserRecord]]) -> int:
+        """
+        Insert or replace users in one transaction
+
+        Args:
+            users: UserRecords or public user dictionaries; ``status``
+                defaults to ACTIVE
+
+        Returns:
+            Number of users written
+
+        Raises:
+            ValueError: If a user is invalid; nothing is written
+        """
+        # The last copy of a repeated id wins, as in UserStore
+        records = list({user.id: user for user in map(validate_user, users)}.values())
+        if not records:
+            return 0
+        with self._write() as conn:
+            stale = []
+            ids = [user.id for user in records]
+            for start in range(0, len(ids), _ID_BATCH):
+                chunk = ids[start:start + _ID_BATCH]
+                rows = conn.execute(f"SELECT id, body FROM users WHERE id IN "
+                                    f"({','.join('?' * len(chunk))})", chunk)
+                stale.extend((term, user_id) for user_id, body in rows
+                             for term in document_terms(_decode(body)))
+            conn.executemany(_DELETE_TERM, stale)
+            conn.executemany(_UPSERT_USER, map(_row, records))
+            conn.executemany(_INSERT_TERM, ((term, user.id) for user in records
+                                            for term in document_terms(user)))
+        return len(records)
+
+    def remove(self, user_id: int) -> bool:
+        """Delete a user by id, returning False if it did not exist"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(_SELECT_BY_ID, (user_id,)).fetchone()
+            if row is not None:
+                conn.executemany(_DELETE_TERM, ((term, user_id)
+                                                for term in document_terms(_decode(row[0]))))
+                conn.execute(_DELETE_USER, (user_id,))
+                conn.execute(_BUMP_VERSION)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return row is not None
+
+    # ------------------------------------------------------------------ reads
+
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        """Return the user with the given id, or None"""
+        body = self.get_raw(user_id)
+        return None if body is None else _decode(body)
+
+    def get_raw(self, user_id: int) -> Optional[bytes]:
+        """Return the stored JSON bytes for a user, or None"""
+        row = self._connection().execute(_SELECT_BY_ID, (user_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def get_by_username(self, username: str) -> Optional[UserRecord]:
+        """Return the user with the given username (case-insensitive), or None"""
+        return self._first(_SELECT_BY_USERNAME, normalize_key(username))
+
+    def get_by_email(self, email: str) -> Optional[UserRecord]:
+        """Return the user with the given email (case-insensitive), or None"""
+        return self._first(_SELECT_BY_EMAIL, normalize_key(email))
+
+    def all(self) -> List[UserRecord]:
+        """Return every user in id order"""
+        return self._records(_SELECT_ALL)
+
+    def filter_by_status(self, status: str) -> List[UserRecord]:
+        """Return users whose status matches a UserType value, in id order"""
+        return self._records(_SELECT_BY_STATUS, status.upper())
+
+    def filter_by_city(self, city: str) -> List[UserRecord]:
+        """Return users living in the given city (case-insensitive), in id order"""
+        return self._records(_SELECT_BY_CITY, normalize_key(city))
+
+    def filter_by_company(self, company: str) -> List[UserRecord]:
+        """Return users working for the given company (case-insensitive), in id order"""
+        return self._records(_SELECT_BY_COMPANY, normalize_key(company))
+
+    def nearest(self, lat: float, lng: float, k: int,
+                status: Optional[str] = None) -> List[UserRecord]:
+        """Return the k users closest to a point, nearest first"""
+        status = status.upper() if status is not None else None
+        conn = self._connection()
+        grid = _DatabaseGrid(conn, status, self._located_count(conn, status))
+        return [self.get(uid) for _, uid in grid.nearest(lat, lng, k)]
+
+    def search(self, terms: Sequence[str], status: Optional[str] = None,
+               after: Optional[int] = None,
+               limit: Optional[int] = None) -> Tuple[List[UserRecord], Optional[int]]:
+        """Return one keyset page of users matching every search term (see page)"""
+        bodies, next_after = self._match(terms, status, after, limit)
+        return [_decode(body) for body in bodies], next_after
+
+    def autocomplete(self, terms: Sequence[str], prefix: str, limit: int,
+                     status: Optional[str] = None) -> List[UserRecord]:
+        """
+        Return up to ``limit`` users matching ``terms`` and a term starting with ``prefix``
+
+        Ordered by the completed term, then id, as SearchIndex.complete.
+        """
+        required = sorted(set(terms))
+        sql = ("SELECT t.id, u.body FROM terms t JOIN users u ON u.id = t.id "
+               "WHERE t.term >= ? AND t.term < ?" + self._search_filters(required, status)
+               + " ORDER BY t.term, t.id")
+        # Terms sort by code point, which UTF-8 byte order preserves
+        params = [prefix, prefix + "\U0010ffff", *required]
+        if status is not None:
+            params.append(status.upper())
+        result: List[UserRecord] = []
+        seen = set()
+        for user_id, body in self._connection().execute(sql, params):
+            if user_id not in seen:
+                seen.add(user_id)
+                result.append(_decode(body))
+                if len(result) == limit:
+                    break
+        return result
+
+    def page(self, status: Optional[str] = None, after: Optional[int] = None,
+             limit: Optional[int] = None,
+             bbox: Optional[Tuple[float, float, float, float]] = None
+             ) -> Tuple[List[UserRecord], Optional[int]]:
+        """Return one keyset page of users in id order (see UserStore.page)"""
+        bodies, next_after = self.page_raw(status, after, limit, bbox)
+        return [_decode(body) for body in bodies], next_after
+
+    def page_raw(self, status: Optional[str] = None, after: Optional[int] = None,
+                 limit: Optional[int] = None,
+                 bbox: Optional[Tuple[float, float, float, float]] = None
+                 ) -> Tuple[List[bytes], Optional[int]]:
+        """Like page(), but return each user's stored JSON bytes"""
+        status = status.upper() if status is not None else None
+        if bbox is not None and _bbox_cells(bbox) <= BBOX_CELL_LIMIT:
+            return self._page_in_cells(status, after, limit, bbox)
+        conditions = ["id > ?"]
+        params: List = [_MIN_ID if after is None else after]
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if bbox is not None:
+            min_lat, min_lng, max_lat, max_lng = bbox
+            conditions.append("lat BETWEEN ? AND ?")
+            params += [min_lat, max_lat]
+            if min_lng <= max_lng:
+                conditions.append("lng BETWEEN ? AND ?")
+            else:
+                # Box crossing the antimeridian
+                conditions.append("(lng >= ? OR lng <= ?)")
+            params += [min_lng, max_lng]
+        sql = f"SELECT id, body FROM users WHERE {' AND '.join(conditions)} ORDER BY id"
+        return self._keyset(sql, params, limit)
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Return the number of users per status"""
+        counts = {t.value: 0 for t in UserType}
+        counts.update(self._connection().execute(_COUNT_BY_STATUS).fetchall())
+        return counts
+
+    def facet_counts(self, facet: str, status: Optional[str] = None,
+                     zip_prefix: int = DEFAULT_ZIP_PREFIX) -> Dict[str, int]:
+        """
+        Return the number of users per value of a facet (see UserStore.facet_counts)
+
+        Unlike the in-memory stores, nothing is precomputed: each call
+        groups the stored JSON in one scan, so callers should cache results
+        per version.
+        """
+        if facet == "status":
+            counts = self.count_by_status()
+            return counts if status is None else {s: n for s, n in counts.items() if s == status.upper()}
+        bucket = f"substr(value, 1, {int(zip_prefix)})" if facet == "zipcode" else "value"
+        where, params = ("status = ?", [status.upper()]) if status is not None else ("1", [])
+        sql = _COUNT_FACET.format(bucket=bucket, where=where)
+        return dict(self._connection().execute(sql, [_FACET_PATHS[facet]] + params))
+
+    # -------------------------------------------------------------- internals
+
+    def _first(self, sql: str, *params) -> Optional[UserRecord]:
+        row = self._connection().execute(sql, params).fetchone()
+        return None if row is None else _decode(row[0])
+
+    def _records(self, sql: str, *params) -> List[UserRecord]:
+        return [_decode(body) for body, in self._connection().execute(sql, params)]
+
+    def _keyset(self, sql: str, params: List, limit: Optional[int]
+                ) -> Tuple[List[bytes], Optional[int]]:
+        # One row past the page tells whether another page follows
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = [*params, limit + 1]
+        rows = self._connection().execute(sql, params).fetchall()
+        if limit is not None and len(rows) > limit:
+            return [body for _, body in rows[:limit]], rows[limit - 1][0]
+        return [body for _, body in rows], None
+
+    def _page_in_cells(self, status: Optional[str], after: Optional[int], limit: Optional[int],
+                       bbox: Tuple[float, float, float, float]) -> Tuple[List[bytes], Optional[int]]:
+        conn = self._connection()
+        ids = _DatabaseGrid(conn, status).within_bbox(*bbox)
+        start = 0 if after is None else bisect.bisect_right(ids, after)
+        end = len(ids) if limit is None else min(start + limit, len(ids))
+        page_ids = ids[start:end]
+        bodies = []
+        for chunk_start in range(0, len(page_ids), _ID_BATCH):
+            chunk = page_ids[chunk_start:chunk_start + _ID_BATCH]
+            rows = conn.execute(f"SELECT body FROM users WHERE id IN ({','.join('?' * len(chunk))}) "
+                                f"ORDER BY id", chunk)
+            bodies.extend(body for body, in rows)
+        if end < len(ids) and page_ids:
+            return bodies, page_ids[-1]
+        return bodies, None
+
+    def _located_count(self, conn: sqlite3.Connection, status: Optional[str]) -> int:
+        # Counting walks an index, so it is done once per data version
+        key = (self.version, status)
+        count = self._located.get(key)
+        if count is None:
+            if status is None:
+                count = conn.execute(_COUNT_LOCATED).fetchone()[0]
+            else:
+                count = conn.execute(_COUNT_LOCATED_BY_STATUS, (status,)).fetchone()[0]
+            if len(self._located) > 16:
+                self._located.clear()
+            self._located[key] = count
+        return count
+
+    def _match(self, terms: Sequence[str], status: Optional[str], after: Optional[int],
+               limit: Optional[int]) -> Tuple[List[bytes], Optional[int]]:
+        distinct = set(terms)
+        if not distinct:
+            return [], None
+        conn = self._connection()
+        # Drive the scan from the rarest term and probe the others
+        driver = min(sorted(distinct),
+                     key=lambda term: conn.execute(_COUNT_TERM, (term, _TERM_COUNT_CAP)).fetchone()[0])
+        required = sorted(distinct - {driver})
+        sql = ("SELECT t.id, u.body FROM terms t JOIN users u ON u.id = t.id "
+               "WHERE t.term = ? AND t.id > ?" + self._search_filters(required, status)
+               + " ORDER BY t.id")
+        params = [driver, _MIN_ID if after is None else after, *required]
+        if status is not None:
+            params.append(status.upper())
+        return self._keyset(sql, params, limit)
+
+    @staticmethod
+    def _search_filters(required: Sequence[str], status: Optional[str]) -> str:
+        sql = " AND EXISTS (SELECT 1 FROM terms r WHERE r.term = ? AND r.id = t.id)" * len(required)
+        if status is not None:
+            sql += " AND u.status = ?"
+        return sql
@@ -0,0 +1,79 @@
+"""
+Startup timing for the Users API
+Breaks process startup into named phases and reports them, plus the time
+to the first response, so cold starts on scale-to-zero platforms can be
+checked against a budget
+
+Enable the report with STARTUP_REPORT=1, or set STARTUP_BUDGET_MS to also
+warn when startup takes longer than the budget.
+"""
+
+import os
+import sys
+import time
+from typing import List, Optional, Tuple
+
+# Measured from the moment this module is first imported; app.py imports it
+# before anything else so library imports are included
+IMPORTED_AT = time.perf_counter()
+
+
+def process_age_ms() -> Optional[float]:
+    """Milliseconds since the OS spawned this process (Linux only, ~10 ms resolution)"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesised command name; starttime is field 22
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return (uptime - start_ticks / os.sysconf("SC_CLK_TCK")) * 1000
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """Record the duration of each startup phase"""
+
+    def __init__(self, started: float = IMPORTED_AT):
+        self.phases: List[Tuple[str, float]] = []
+        self.started = started
+        self._last = started
+        self._first_response_seen = False
+        budget = os.environ.get("STARTUP_BUDGET_MS")
+        self.budget_ms = float(budget) if budget else None
+        self.enabled = os.environ.get("STARTUP_REPORT", "").lower() in ("1", "true") \
+            or self.budget_ms is not None
+
+    def mark(self, phase: str) -> None:
+        """End the current phase, naming it"""
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000))
+        self._last = now
+
+    @property
+    def total_ms(self) -> float:
+        return (self._last - self.started) * 1000
+
+    def finish(self) -> None:
+        """Print the phase report and check the budget, when enabled"""
+        if not self.enabled:
+            return
+        age = process_age_ms()
+        lines = [f"⏱️  Startup (pid {os.getpid()}): {self.total_ms:.1f} ms in app"
+                 + (f", {age:.0f} ms since spawn" if age is not None else "")]
+        lines += [f"   {name:<20}{ms:>9.1f} ms" for name, ms in self.phases]
+        spent = age if age is not None else self.total_ms
+        if self.budget_ms is not None and spent > self.budget_ms:
+            lines.append(f"⚠️  Startup over budget: {spent:.0f} ms > {self.budget_ms:.0f} ms")
+        print("\n".join(lines), file=sys.stderr, flush=True)
+
+    def first_response(self, method: str, path: str) -> None:
+        """Report the time from spawn to the first response, once per process"""
+        if self._first_response_seen:
+            return
+        self._first_response_seen = True
+        if self.enabled:
+            age = process_age_ms()
+            since = f"{age:.0f} ms after spawn" if age is not None else \
+                f"{(time.perf_counter() - self.started) * 1000:.0f} ms after import"
+            print(f"⏱️  First response {since} ({method} {path})", file=sys.stderr, flush=True)
@@ -0,0 +1,282 @@
+"""
+Non-blocking structured logging for the Users API
+Request threads only put a dict on a bounded in-process queue; a background
+thread encodes entries as JSON lines and writes them out in batches, so a
+slow log consumer costs dropped lines instead of stalled requests
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import select
+import stat
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Entries buffered per process when LOG_BUFFER_SIZE is unset; more are dropped
+DEFAULT_LOG_BUFFER = 10000
+
+# Most entries encoded into one write when LOG_BATCH_SIZE is unset
+DEFAULT_LOG_BATCH = 256
+
+# Seconds a closing process waits for buffered entries to be written
+CLOSE_TIMEOUT = 1.0
+
+_CLOSE = object()
+
+
+def _timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat(timespec="milliseconds")
+
+
+def _chunks(lines: List[bytes], limit: Optional[int]) -> Iterator[bytes]:
+    """Join lines into writes of at most ``limit`` bytes (a longer line goes alone)"""
+    if limit is None:
+        yield b"".join(lines)
+        return
+    chunk: List[bytes] = []
+    size = 0
+    for line in lines:
+        if chunk and size + len(line) > limit:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+        chunk.append(line)
+        size += len(line)
+    if chunk:
+        yield b"".join(chunk)
+
+
+class LogWriter:
+    """
+    Write JSON log lines from a bounded queue on a daemon thread
+
+    ``write`` never blocks: when the queue is full the entry is dropped and
+    counted (and passed to ``on_drop`` right away, so monitoring sees drops
+    while the output is stalled), and the writer reports the count in a
+    "log_dropped" line once it catches up. The queue and thread are created
+    lazily per process id, so a writer created before gunicorn forks gives
+    every worker its own, like MetricsRegistry.
+
+    Args:
+        destination: "-" for stdout, else a file appended to
+        max_queue: Entries buffered before new ones are dropped
+        batch_size: Most entries encoded into one write
+        on_drop: Called with the number of entries lost: with 1 on the
+            caller's thread by each ``write`` that finds the queue full, and
+            on the writer thread with the line count of a failed write
+    """
+
+    def __init__(self, destination: str = "-", max_queue: int = DEFAULT_LOG_BUFFER,
+                 batch_size: int = DEFAULT_LOG_BATCH,
+                 on_drop: Optional[Callable[[int], None]] = None):
+        self.destination = destination
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._reported = 0
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self, entry: Dict) -> bool:
+        """
+        Queue one entry without blocking
+
+        The entry is encoded later on the writer thread, so the caller must
+        not change it afterwards. A float "time" is written as ISO 8601 UTC.
+
+        Returns:
+            False if the buffer was full and the entry was dropped
+        """
+        try:
+            self._process_queue().put_nowait(entry)
+        except queue.Full:
+            # Unlocked: a lost increment under contention only undercounts
+            self.dropped += 1
+            if self.on_drop is not None:
+                self.on_drop(1)
+            return False
+        return True
+
+    def close(self, timeout: float = CLOSE_TIMEOUT) -> None:
+        """Write out what is buffered, waiting at most ``timeout`` seconds"""
+        with self._lock:
+            thread, entries = self._thread, self._queue
+            if self._pid != os.getpid() or thread is None:
+                return
+            self._pid = None
+        try:
+            entries.put(_CLOSE, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def _process_queue(self) -> queue.Queue:
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    # First use in this process (or first use after a fork,
+                    # which leaves the parent's thread behind)
+                    self._queue = queue.Queue(self.max_queue)
+                    self.dropped = self._reported = 0
+                    self._thread = threading.Thread(target=self._run, args=(self._queue,),
+                                                    name="log-writer", daemon=True)
+                    self._thread.start()
+                    self._pid = pid
+        return self._queue
+
+    def _open(self):
+        if self.destination == "-":
+            return 1, self._atomic_limit(1), False
+        fd = os.open(self.destination, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return fd, self._atomic_limit(fd), True
+
+    @staticmethod
+    def _atomic_limit(fd: int) -> Optional[int]:
+        # Workers share stdout; a pipe only keeps writes of up to PIPE_BUF
+        # bytes from interleaving, so batches to one are split to that size
+        mode = os.fstat(fd).st_mode
+        return select.PIPE_BUF if stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) else None
+
+    def _run(self, entries: queue.Queue) -> None:
+        fd, limit, owned = self._open()
+        pid = os.getpid()
+        try:
+            while True:
+                batch = [entries.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(entries.get_nowait())
+                    except queue.Empty:
+                        break
+                closing = batch[-1] is _CLOSE
+                if closing:
+                    batch.pop()
+                lines = [self._encode(entry, pid) for entry in batch]
+                dropped = self.dropped - self._reported
+                if dropped:
+                    self._reported += dropped
+                    lines.append(self._encode({"type": "log_dropped", "time": time.time(),
+                                               "dropped": dropped}, pid))
+                for chunk in _chunks(lines, limit):
+                    try:
+                        self._write_all(fd, chunk)
+                    except OSError:
+                        # Closed pipe, full disk: count the lines as dropped
+                        # and keep the thread (and the queue) draining
+                        lost = chunk.count(b"\n")
+                        self.dropped += lost
+                        self._reported += lost
+                        if self.on_drop is not None:
+                            self.on_drop(lost)
+                if closing:
+                    return
+        finally:
+            if owned:
+                os.close(fd)
+
+    @staticmethod
+    def _encode(entry: Dict, pid: int) -> bytes:
+        if isinstance(entry.get("time"), float):
+            entry["time"] = _timestamp(entry["time"])
+        entry["pid"] = pid
+        return json.dumps(entry, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+
+    @staticmethod
+    def _write_all(fd: int, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(fd, view)
+            except InterruptedError:
+                continue
+            view = view[written:]
+
+
+class AccessSampler:
+    """
+    Decide which requests get an access log line
+
+    Every response except a 200 is logged; 200s are logged with probability
+    ``ok_rate``, and their lines carry "sample_rate" so counts derived from
+    the log can be scaled back up.
+    """
+
+    def __init__(self, ok_rate: float = 1.0):
+        if not 0.0 <= ok_rate <= 1.0:
+            raise ValueError(f"Invalid sample rate {ok_rate}. Must be between 0 and 1")
+        self.ok_rate = ok_rate
+
+    def sample_rate(self, status: int) -> Optional[float]:
+        """Return the rate a request's line was sampled at, or None to skip it"""
+        if status != 200 or self.ok_rate >= 1.0:
+            return 1.0
+        if random.random() < self.ok_rate:
+            return self.ok_rate
+        return None
+
+
+def access_entry(method: str, path: str, route: str, status: int, duration: float,
+                 size: Optional[int], dataset_version: Optional[int],
+                 remote_addr: Optional[str], sample_rate: float = 1.0) -> Dict:
+    """Build the access log entry for one finished request"""
+    entry = {
+        "type": "access",
+        "time": time.time(),
+        "method": method,
+        "path": path,
+        "route": route,
+        "status": status,
+        "duration_ms": round(duration * 1000, 3),
+        "bytes": size,
+        "dataset_version": dataset_version,
+        "remote_addr": remote_addr,
+    }
+    if sample_rate != 1.0:
+        entry["sample_rate"] = sample_rate
+    return entry
+
+
+class QueueLogHandler(logging.Handler):
+    """logging handler that sends records to a LogWriter as "app" entries"""
+
+    def __init__(self, writer: LogWriter, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.writer = writer
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            entry = {
+                "type": "app",
+                "time": record.created,
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+            }
+            if record.exc_info:
+                entry["exception"] = logging.Formatter().formatException(record.exc_info)
+            self.writer.write(entry)
+        except Exception:
+            self.handleError(record)
+
+
+def install(writer: LogWriter, level: int = logging.INFO) -> QueueLogHandler:
+    """
+    Route the root logger (and every logger propagating to it) through ``writer``
+
+    Also writes out buffered entries when the process exits.
+    """
+    handler = QueueLogHandler(writer)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+    atexit.register(writer.close)
+    return handler
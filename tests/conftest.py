@@ -0,0 +1,44 @@
+"""
+Shared fixtures for the Users API tests
+The modules live at the repository root, which is put on sys.path here so
+the suite runs with a plain ``python -m pytest`` from anywhere
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def make_user(user_id, username=None, email=None, **fields):
+    """A valid public user dict; fields override the defaults"""
+    user = {
+        "id": user_id,
+        "name": f"User {user_id}",
+        "username": username or f"user{user_id}",
+        "email": email or f"user{user_id}@example.com",
+        "address": {
+            "street": "Main Street",
+            "suite": "Apt. 1",
+            "city": "Springfield",
+            "zipcode": "12345-6789",
+            "geo": {"lat": "10.0", "lng": "20.0"},
+        },
+        "phone": "555-0100",
+        "website": "example.com",
+        "status": "ACTIVE",
+        "company": {"name": "Acme", "catchPhrase": "Things", "bs": "stuff"},
+    }
+    user.update(fields)
+    return user
+
+
+@pytest.fixture
+def client():
+    """Flask test client for the app module, serving the sample users"""
+    import app as users_api
+    return users_api.app.test_client()
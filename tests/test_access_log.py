@@ -0,0 +1,66 @@
+"""Tests for the dataset version reported in access log lines"""
+
+import pytest
+
+from conftest import make_user
+
+
+class Recorder:
+    def __init__(self):
+        self.entries = []
+
+    def write(self, entry):
+        self.entries.append(entry)
+        return True
+
+
+@pytest.fixture
+def access_log(monkeypatch):
+    import app as users_api
+    recorder = Recorder()
+    monkeypatch.setattr(users_api, "log_writer", recorder)
+    return recorder
+
+
+def test_logged_version_is_the_served_one_not_the_latest(client, access_log, monkeypatch):
+    import app as users_api
+    build = users_api.build_users_page
+
+    def build_then_write(store, query):
+        # A write publishes a newer store after this request took its own
+        result = build(store, query)
+        users_api.user_writer.create(make_user(800))
+        return result
+
+    monkeypatch.setattr(users_api, "build_users_page", build_then_write)
+    response = client.get("/api/users?limit=17")  # a query no other test caches
+    served = int(response.headers["X-Dataset-Version"])
+    assert users_api.user_store.seq > served
+    assert access_log.entries[-1]["dataset_version"] == served
+    client.delete("/api/users/800")
+
+
+def test_write_logs_the_version_it_published(client, access_log):
+    import app as users_api
+    assert client.post("/api/users", json=make_user(801)).status_code == 201
+    assert access_log.entries[-1]["dataset_version"] == users_api.user_store.seq
+    client.delete("/api/users/801")
+
+
+def test_asgi_logs_the_served_version(access_log):
+    from test_asgi import call
+    status, headers, _ = call("GET", "/api/users", query=b"limit=2")
+    assert status == 200
+    assert access_log.entries[-1]["dataset_version"] == int(headers["x-dataset-version"])
+
+
+@pytest.mark.parametrize("method", ["GET", "HEAD"])
+def test_exports_log_the_served_version(client, access_log, method):
+    import app as users_api
+    from test_asgi import call
+    version = users_api.user_store.seq
+    status, _, body = call(method, "/api/users/export", as_bytes=True)
+    assert status == 200 and (body == b"") == (method == "HEAD")
+    assert access_log.entries[-1]["dataset_version"] == version
+    client.open("/api/users/export", method=method).close()
+    assert access_log.entries[-1]["dataset_version"] == version
@@ -0,0 +1,70 @@
+"""Tests that the ASGI entry point serves the same routes as the Flask app"""
+
+import asyncio
+import json
+
+import pytest
+
+from conftest import make_user
+
+
+def call(method, path, body=None, query=b"", as_bytes=False, headers=()):
+    """Run one request through asgi.application; returns (status, headers, body)
+
+    The body is decoded as JSON unless ``as_bytes`` asks for the bytes.
+    """
+    import asgi
+    raw = b"" if body is None else json.dumps(body).encode()
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": query,
+        "headers": [(b"content-type", b"application/json")] + [
+            (name.lower().encode(), value.encode()) for name, value in headers],
+        "client": ("127.0.0.1", 1),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": raw, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi.application(scope, receive, send))
+    start = messages[0]
+    headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    payload = b"".join(m.get("body", b"") for m in messages[1:])
+    if as_bytes:
+        return start["status"], headers, payload
+    return start["status"], headers, json.loads(payload) if payload else None
+
+
+def test_write_routes_round_trip():
+    status, headers, created = call("POST", "/api/users", make_user(700))
+    assert status == 201 and headers["location"] == "/api/users/700"
+    assert call("GET", "/api/users/700")[2]["username"] == "user700"
+    status, _, replaced = call("PUT", "/api/users/700", make_user(700, name="Renamed"))
+    assert status == 200 and replaced["name"] == "Renamed"
+    assert call("POST", "/api/users", make_user(701, username="user700"))[0] == 409
+    status, headers, body = call("DELETE", "/api/users/700")
+    assert status == 204 and body is None and "content-length" not in headers
+    assert call("GET", "/api/users/700")[0] == 404
+
+
+def test_batch_and_changes_match_the_flask_app(client):
+    lookup = {"ids": [1, 2], "usernames": ["samantha"], "emails": ["nobody@example.com"]}
+    assert call("POST", "/api/users/batch", lookup)[2] == client.post("/api/users/batch", json=lookup).get_json()
+    assert call("GET", "/api/users/changes", query=b"since=0")[2] == \
+        client.get("/api/users/changes?since=0").get_json()
+    assert call("GET", "/api/users/changes")[0] == 400
+
+
+@pytest.mark.parametrize("method, path", [("DELETE", "/api/users"), ("GET", "/api/users/batch"),
+                                          ("POST", "/api/users/1")])
+def test_unsupported_methods_get_405_with_allow(method, path):
+    status, headers, _ = call(method, path)
+    assert status == 405
+    assert "OPTIONS" in headers["allow"]
+
+
+def test_negative_ids_do_not_match_the_user_route():
+    assert call("GET", "/api/users/-5")[0] == 404
@@ -0,0 +1,71 @@
+"""Tests for the change log behind /api/users/changes"""
+
+import pytest
+
+from change_feed import ChangeLog
+from conftest import make_user
+from user_store import UserStore
+from user_writer import UserWriter
+
+
+@pytest.fixture
+def writer():
+    holder = {"store": UserStore([make_user(1), make_user(2), make_user(3)])}
+    return UserWriter(lambda: holder["store"], lambda store: holder.update(store=store),
+                      changes=ChangeLog())
+
+
+def window(writer, since, limit=100):
+    return writer.changes.window(since, writer.get_store().seq, limit)
+
+
+def test_window_reports_net_effect_per_user(writer):
+    writer.create(make_user(10))
+    writer.replace(1, make_user(1, name="Renamed"))
+    writer.create(make_user(11))
+    writer.delete(11)  # inserted and deleted in the window: not reported
+    writer.delete(2)
+    writer.replace(10, make_user(10, name="Changed"))  # still an insert
+    changes = window(writer, 0)
+    assert (changes.inserted, changes.updated, changes.deleted) == ([10], [1], [2])
+    assert changes.version == writer.get_store().seq == 6 and not changes.more
+    assert window(writer, 6) == ([], [], [], 6, False)
+
+
+def test_window_stops_at_the_limit_and_continues(writer):
+    for user_id in (10, 11, 12):
+        writer.create(make_user(user_id))
+    first = window(writer, 0, limit=2)
+    assert first.inserted == [10, 11] and first.more and first.version == 2
+    rest = window(writer, first.version, limit=2)
+    assert rest.inserted == [12] and not rest.more and rest.version == 3
+
+
+def test_reset_and_trimming_force_a_resync(writer):
+    writer.create(make_user(10))
+    # What a reload does: mark the reset, then replay onto the new data
+    writer.mark_reset()
+    reloaded = UserStore([make_user(1)])
+    writer.replay(reloaded)
+    writer.publish(reloaded)
+    assert window(writer, 1) is None
+    assert window(writer, 2) == ([], [], [], 2, False)
+    assert window(writer, 99) is None  # from the future
+
+    changes = ChangeLog(max_entries=2)
+    for seq in range(1, 5):
+        changes.record(seq, "update", seq)
+    assert changes.floor == 2
+    assert changes.window(1, 4, 10) is None
+    assert changes.window(2, 4, 10).updated == [3, 4]
+
+
+def test_api_changes_follow_a_full_fetch(client):
+    version = int(client.get("/api/users").headers["X-Dataset-Version"])
+    created = client.post("/api/users", json=make_user(900)).get_json()
+    body = client.get(f"/api/users/changes?since={version}").get_json()
+    assert body["inserted"] == [created] and body["version"] == version + 1
+    client.delete("/api/users/900")
+    body = client.get(f"/api/users/changes?since={version}&fields=id").get_json()
+    assert body["inserted"] == [] and body["deleted"] == []
+    assert client.get("/api/users/changes?since=-1").status_code == 400
@@ -0,0 +1,59 @@
+"""Tests for hot reloads: FileReloader polling and the logged dataset resets"""
+
+import os
+
+from change_feed import RESET
+from conftest import make_user
+from dataset_reloader import FileReloader, file_signature
+from user_store import UserStore
+from user_writer import UserWriter
+from write_log import WriteAheadLog
+
+
+def write_file(path, text, mtime):
+    with open(path, "w") as f:
+        f.write(text)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_reloader_started_from_an_older_signature_reloads_at_once(tmp_path):
+    path = str(tmp_path / "users.ndjson")
+    write_file(path, "old\n", 1_000_000_000)
+    loaded = file_signature(path)
+    # Changed after the dataset was loaded but before this process watches it,
+    # e.g. a worker forked from a master holding the boot dataset
+    write_file(path, "newer\n", 2_000_000_000)
+    calls = []
+    reloader = FileReloader(path, lambda: calls.append(1), interval=0.01, signature=loaded)
+    assert reloader.check()
+    assert calls == [1]
+    assert not reloader.check()
+
+
+def test_reloader_without_signature_starts_from_the_current_file(tmp_path):
+    path = str(tmp_path / "users.ndjson")
+    write_file(path, "data\n", 1_000_000_000)
+    reloader = FileReloader(path, lambda: None, interval=0.01)
+    assert not reloader.check()
+
+
+def _writer(log):
+    holder = {"store": UserStore([make_user(1)])}
+    writer = UserWriter(lambda: holder["store"], lambda store: holder.update(store=store), log)
+    writer.replay(holder["store"])
+    return writer
+
+
+def test_each_file_change_logs_one_reset_across_processes(tmp_path):
+    path = str(tmp_path / "wal.log")
+    # Two writers on one log stand in for two worker processes
+    first, second = _writer(WriteAheadLog(path, fsync=False)), _writer(WriteAheadLog(path, fsync=False))
+    first.mark_reset(source=[1, 2, 3, 4])
+    second.mark_reset(source=[1, 2, 3, 4])
+    first.create(make_user(2))
+    second.mark_reset(source=[1, 2, 3, 4])
+    first.mark_reset(source=[1, 2, 3, 5])
+    second.mark_reset(source=[1, 2, 3, 5])
+    entries, _ = WriteAheadLog(path, fsync=False).read(0)
+    assert [entry["op"] for entry in entries] == [RESET, "insert", RESET]
+    assert [entry["seq"] for entry in entries] == [1, 2, 3]
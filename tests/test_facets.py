@@ -0,0 +1,65 @@
+"""Tests that incrementally maintained facet counts match a full recount"""
+
+import random
+
+from conftest import make_user
+from facets import zipcode_facet
+from user_store import UserStore
+
+CITIES = ("Gwenborough", "Wisokyburgh", "McKenziehaven", None)
+COMPANIES = ("Acme", "Globex", "Initech")
+
+
+def random_user(rng, user_id):
+    return make_user(
+        user_id,
+        status=rng.choice(("ACTIVE", "INACTIVE")),
+        address={"city": rng.choice(CITIES), "zipcode": rng.choice(("12345", "12399", "90210")),
+                 "geo": {"lat": "1.0", "lng": "2.0"}},
+        company={"name": rng.choice(COMPANIES)},
+    )
+
+
+def all_counts(store):
+    dimensions = ("status", "city", "company", "zipcode")
+    return {(dimension, status, prefix): store.facet_counts(dimension, status, prefix)
+            for dimension in dimensions
+            for status in (None, "ACTIVE", "INACTIVE")
+            for prefix in (1, 3, 5)}
+
+
+def test_counts_stay_equal_to_a_recount_through_writes_and_copies():
+    rng = random.Random(3)
+    store = UserStore([random_user(rng, n) for n in range(1, 40)])
+    before = all_counts(store)
+    current = store.copy()
+    for _ in range(200):
+        user_id = rng.randrange(1, 60)
+        if rng.random() < 0.3:
+            current.remove(user_id)
+        else:
+            current.add(random_user(rng, user_id))
+        if rng.random() < 0.1:
+            current = current.copy()
+    recount = UserStore([user.to_dict() for user in current.all()])
+    assert all_counts(current) == all_counts(recount)
+    assert all_counts(store) == before
+
+
+def test_zipcode_buckets_by_prefix():
+    store = UserStore([make_user(1, address={"zipcode": "12345"}),
+                       make_user(2, address={"zipcode": "12399"}),
+                       make_user(3, address={"zipcode": "90210"})])
+    assert store.facet_counts("zipcode", zip_prefix=3) == {"123": 2, "902": 1}
+    assert store.facet_counts("zipcode", zip_prefix=5) == {"12345": 1, "12399": 1, "90210": 1}
+    assert zipcode_facet(3) == "zipcode3"
+
+
+def test_api_facets_summarize_buckets(client):
+    body = client.get("/api/users/facets?facets=status,city&limit=1").get_json()
+    statuses = body["facets"]["status"]
+    assert sum(b["count"] for b in statuses["buckets"]) + statuses["other"] == body["total"]
+    city = body["facets"]["city"]
+    assert len(city["buckets"]) == 1
+    assert sum(b["count"] for b in city["buckets"]) + city["other"] + city["missing"] == body["total"]
+    assert client.get("/api/users/facets?facets=planet").status_code == 400
@@ -0,0 +1,23 @@
+"""Tests for building the lazy user indexes off the request path"""
+
+from conftest import make_user
+from user_store import UserStore
+
+
+def test_warm_indexes_builds_both_indexes():
+    store = UserStore([make_user(1), make_user(2)])
+    assert store._spatial is None and store._search is None
+    store.warm_indexes()
+    assert store._spatial is not None and store._search is not None
+    # Copies carry the built indexes, so published writes need no rebuild
+    copy = store.copy()
+    assert copy._spatial is not None and copy._search is not None
+
+
+def test_app_warms_the_serving_store_in_the_background():
+    import app as users_api
+    users_api.publish_user_store(users_api.user_store.copy())
+    users_api.user_store._spatial = users_api.user_store._search = None
+    users_api.warm_user_indexes(background=True).join(5)
+    assert users_api.user_store._spatial is not None
+    assert users_api.user_store._search is not None
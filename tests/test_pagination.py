@@ -0,0 +1,36 @@
+"""Tests for cursor pagination and field projection on /api/users"""
+
+from conftest import make_user
+from test_search import follow
+
+
+def walk(client, url):
+    response = client.get(url)
+    pages = [response.get_json()]
+    while (response := follow(client, response)) is not None:
+        assert response.status_code == 200
+        pages.append(response.get_json())
+    return pages
+
+
+def test_link_walk_returns_every_user_once(client):
+    everything = [user["id"] for user in client.get("/api/users").get_json()]
+    pages = walk(client, "/api/users?limit=2&fields=id")
+    assert all(len(page) <= 2 for page in pages)
+    assert [user["id"] for page in pages for user in page] == everything
+    assert all(set(user) == {"id"} for page in pages for user in page)
+
+
+def test_cursor_is_stable_across_writes(client):
+    first = client.get("/api/users?limit=1")
+    cursor = first.headers["X-Next-Cursor"]
+    after = first.get_json()[0]["id"]
+    assert client.post("/api/users", json=make_user(950)).status_code == 201
+    page = client.get(f"/api/users?after={cursor}&limit=100").get_json()
+    assert page[0]["id"] > after and page[-1]["id"] == 950
+    client.delete("/api/users/950")
+
+
+def test_bad_cursor_and_fields_are_400(client):
+    assert client.get("/api/users?after=42").status_code == 400
+    assert client.get("/api/users?fields=id,password").status_code == 400
@@ -0,0 +1,56 @@
+"""Tests for conditional GET and compression of cached responses"""
+
+import pytest
+
+import response_cache
+from response_cache import CachedResponse
+
+
+@pytest.fixture
+def compressions(monkeypatch):
+    """Count the bodies gzip-compressed while a test runs"""
+    calls = []
+    gzip = response_cache.COMPRESSORS["gzip"]
+
+    def counting(body):
+        calls.append(len(body))
+        return gzip(body)
+
+    monkeypatch.setitem(response_cache.COMPRESSORS, "gzip", counting)
+    return calls
+
+
+def test_etag_for_matches_representation_without_compressing(compressions):
+    cached = CachedResponse(b"x" * 4096)
+    tag = cached.etag_for("gzip")
+    assert not compressions
+    assert cached.representation("gzip")[1] == tag and compressions == [4096]
+    small = CachedResponse(b"{}")
+    assert small.etag_for("gzip") == small.representation("gzip")[1] == small.etag
+    assert cached.etag_for("br") == cached.etag
+
+
+def identity_etag(client, url):
+    response = client.get(url)
+    assert len(response.data) >= response_cache.COMPRESSION_MIN_SIZE
+    return response.headers["ETag"]
+
+
+def test_flask_revalidation_never_compresses(client, compressions):
+    url = "/api/users?limit=7"  # a variant no other test caches
+    etag = identity_etag(client, url)
+    response = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag[:-1] + '-gzip"'
+    assert not compressions
+    assert client.get(url, headers={"Accept-Encoding": "gzip"}).headers["Content-Encoding"] == "gzip"
+    assert len(compressions) == 1
+
+
+def test_asgi_revalidation_never_compresses(client, compressions):
+    from test_asgi import call
+    etag = identity_etag(client, "/api/users?limit=8")
+    status, headers, _ = call("GET", "/api/users", query=b"limit=8",
+                              headers=[("Accept-Encoding", "gzip"), ("If-None-Match", etag)])
+    assert status == 304 and headers["etag"] == etag[:-1] + '-gzip"'
+    assert not compressions
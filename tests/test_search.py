@@ -0,0 +1,35 @@
+"""Tests for /api/users/search pagination"""
+
+import re
+
+import pytest
+
+
+def follow(client, response):
+    """Return the next page named by a response's Link header, or None"""
+    link = response.headers.get("Link")
+    if link is None:
+        return None
+    url = re.match(r'<http://localhost(.*)>; rel="next"', link).group(1)
+    return client.get(url)
+
+
+def test_match_mode_link_walks_every_page(client):
+    response = client.get("/api/users/search?q=romaguera&limit=1")
+    ids = [user["id"] for user in response.get_json()]
+    while True:
+        response = follow(client, response)
+        if response is None:
+            break
+        assert response.status_code == 200
+        ids += [user["id"] for user in response.get_json()]
+    assert ids == [1, 3]
+
+
+@pytest.mark.parametrize("q", ["romaguera ", "romaguera", "rom"])
+def test_prefix_mode_is_a_single_page(client, q):
+    response = client.get("/api/users/search", query_string={"q": q, "mode": "prefix", "limit": 1})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 1
+    assert "X-Next-Cursor" not in response.headers
+    assert follow(client, response) is None
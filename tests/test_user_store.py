@@ -0,0 +1,72 @@
+"""Tests for UserStore copies and the copy-on-write tables under them"""
+
+import random
+
+import pytest
+
+import cow_tables
+from conftest import make_user
+from cow_tables import CowDict, CowSortedList
+from user_store import UserStore
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Small chunks so a handful of ids spans several and splits them
+    monkeypatch.setattr(cow_tables, "CHUNK_SIZE", 4)
+
+
+def test_sorted_list_pages_and_edits(small_chunks):
+    items = CowSortedList(range(0, 100, 2))
+    assert items.after(None, 5) == ([0, 2, 4, 6, 8], True)
+    assert items.after(89, 5) == ([90, 92, 94, 96, 98], False)
+    assert items.after(98, 5) == ([], False)
+    assert items.after(40, None)[0] == list(range(42, 100, 2))
+    for value in range(1, 100, 2):
+        items.add(value)
+    assert list(items) == list(range(100)) and len(items) == 100
+    for value in range(0, 100, 3):
+        assert items.discard(value)
+    assert not items.discard(3)
+    assert list(items) == [v for v in range(100) if v % 3]
+    assert 4 in items and 6 not in items
+    assert items.last() == 98 and list(items.iter_from(95)) == [95, 97, 98]
+
+
+def test_copies_share_nothing_observable(small_chunks):
+    original = CowSortedList(range(40))
+    table = CowDict((n, str(n)) for n in range(40))
+    items, mapping = original.copy(), table.copy()
+    rng = random.Random(7)
+    for _ in range(200):
+        value = rng.randrange(80)
+        if rng.random() < 0.5:
+            items.add(value)
+            mapping[value] = "new"
+        else:
+            items.discard(value)
+            mapping.pop(value, None)
+    assert list(original) == list(range(40))
+    assert sorted(table.items()) == [(n, str(n)) for n in range(40)]
+    assert list(items) == sorted(mapping) and len(items) == len(mapping)
+
+
+def test_store_copy_is_isolated_from_later_writes(small_chunks):
+    store = UserStore([make_user(n) for n in range(1, 30)])
+    store.warm_indexes()
+    clone = store.copy()
+    clone.remove(3)
+    clone.add(make_user(3, "renamed", status="INACTIVE"))
+    clone.add(make_user(100, name="Zebedee"))
+    clone.remove(7)
+
+    assert [u.id for u in store.all()] == list(range(1, 30))
+    assert store.get_by_username("user3").id == 3 and store.get_by_username("renamed") is None
+    assert store.count_by_status() == {"ACTIVE": 29, "INACTIVE": 0}
+    assert store.search(["zebedee"]) == ([], None)
+
+    assert clone.get_by_username("renamed").id == 3 and clone.get_by_username("user7") is None
+    assert clone.count_by_status() == {"ACTIVE": 28, "INACTIVE": 1}
+    assert [u.id for u in clone.page(after=27, limit=2)[0]] == [28, 29]
+    assert clone.search(["zebedee"])[0][0].id == 100
+    assert clone.max_id() == 100 and store.max_id() == 29
@@ -0,0 +1,95 @@
+"""Tests for UserWriter's write path and the unique username/email indexes"""
+
+import pytest
+
+from conftest import make_user
+from user_store import UserStore
+from user_writer import UserExists, UserNotFound, UserWriter, _Mutation
+
+
+@pytest.fixture
+def writer():
+    holder = {"store": UserStore([make_user(1, "bret", "sincere@april.biz"), make_user(2)])}
+    return UserWriter(lambda: holder["store"], lambda store: holder.update(store=store))
+
+
+def test_create_rejects_taken_username_and_email(writer):
+    with pytest.raises(UserExists):
+        writer.create(make_user(99, username="BRET"))
+    with pytest.raises(UserExists):
+        writer.create(make_user(99, email="Sincere@April.biz"))
+    store = writer.get_store()
+    assert 99 not in store
+    assert store.get_by_username("bret").id == 1
+
+
+def test_replace_rejects_another_users_username(writer):
+    with pytest.raises(UserExists):
+        writer.replace(2, make_user(2, username="bret"))
+    # Keeping its own username is fine
+    assert writer.replace(1, make_user(1, "Bret", "sincere@april.biz", name="Renamed")).name == "Renamed"
+
+
+def test_freed_username_can_be_reused(writer):
+    writer.replace(1, make_user(1, "leanne", "sincere@april.biz"))
+    assert writer.create(make_user(3, username="bret")).id == 3
+    writer.delete(1)
+    assert writer.create(make_user(4, email="sincere@april.biz")).id == 4
+    store = writer.get_store()
+    assert store.get_by_username("bret").id == 3
+    assert store.get_by_email("sincere@april.biz").id == 4
+
+
+def test_conflicts_within_one_group_are_checked_in_order(writer):
+    first = _Mutation("create", 10, make_user(10, username="same"))
+    second = _Mutation("create", 11, make_user(11, username="same"))
+    writer._commit([first, second])
+    assert first.error is None and isinstance(second.error, UserExists)
+
+
+def test_unindex_keeps_keys_owned_by_another_user():
+    # Loaded data bypasses the writer's checks; the later duplicate owns the
+    # keys, and removing the earlier user must not drop them
+    store = UserStore([make_user(1, "bret", "a@example.com"), make_user(99, "bret", "a@example.com")])
+    store.remove(1)
+    assert store.get_by_username("bret").id == 99
+    assert store.get_by_email("a@example.com").id == 99
+
+
+def test_delete_unknown_user(writer):
+    with pytest.raises(UserNotFound):
+        writer.delete(12345)
+
+
+def test_api_duplicate_username_is_409_and_lookups_survive_delete(client):
+    body = make_user(99, username="Bret", email="Sincere@april.biz")
+    assert client.post("/api/users", json=body).status_code == 409
+    assert client.delete("/api/users/99").status_code == 404
+    found = client.post("/api/users/batch", json={"usernames": ["bret"], "emails": ["sincere@april.biz"]})
+    assert found.status_code == 200
+    assert not found.get_json().get("missing", {}).get("usernames")
+    assert not found.get_json().get("missing", {}).get("emails")
+
+
+@pytest.mark.parametrize("body", [
+    make_user(-5),
+    make_user(0),
+    {"id": 50, "name": "bad"},
+    dict(make_user(51), username=""),
+    dict(make_user(52), email=None),
+    dict(make_user(53), status=None),
+])
+def test_api_rejects_unreachable_or_incomplete_users(client, body):
+    response = client.post("/api/users", json=body)
+    assert response.status_code == 400
+    assert client.get(f"/api/users/{body['id']}").status_code in (404, 405)
+
+
+def test_api_writes_to_a_read_only_store_are_405_with_allow(client, monkeypatch):
+    import app as users_api
+    monkeypatch.setattr(users_api, "user_store", object())
+    for response in (client.post("/api/users", json=make_user(99)),
+                     client.put("/api/users/1", json=make_user(1)),
+                     client.delete("/api/users/1")):
+        assert response.status_code == 405
+        assert response.headers["Allow"] == "GET, HEAD"
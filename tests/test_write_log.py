@@ -0,0 +1,126 @@
+"""Tests for recovering and sharing writes through the write-ahead log"""
+
+import pytest
+
+from conftest import make_user
+from user_store import UserStore
+from user_writer import UserExists, UserWriter
+from write_log import WriteAheadLog
+
+
+def base_store():
+    return UserStore([make_user(1), make_user(2)])
+
+
+def open_writer(path):
+    """A writer over a fresh copy of the base data, with the log replayed"""
+    holder = {"store": base_store()}
+    writer = UserWriter(lambda: holder["store"], lambda store: holder.update(store=store),
+                        log=WriteAheadLog(str(path), fsync=False))
+    writer.replay(holder["store"])
+    return writer
+
+
+@pytest.fixture
+def wal_path(tmp_path):
+    return tmp_path / "users.wal"
+
+
+def test_replay_restores_every_write(wal_path):
+    writer = open_writer(wal_path)
+    writer.create(make_user(3))
+    writer.create(make_user(9))
+    writer.replace(1, make_user(1, name="Renamed"))
+    writer.delete(2)
+    writer.delete(9)
+    before = writer.get_store()
+
+    restarted = open_writer(wal_path).get_store()
+    assert [u.to_dict() for u in restarted.all()] == [u.to_dict() for u in before.all()]
+    assert restarted.seq == before.seq == 5
+    assert restarted.get_by_username("user2") is None
+
+
+def test_replay_keeps_deleted_ids_retired(wal_path):
+    writer = open_writer(wal_path)
+    writer.create(make_user(9))
+    writer.delete(9)
+    new_user = make_user(None, "fresh", "fresh@example.com")
+    del new_user["id"]
+    assert open_writer(wal_path).create(new_user).id == 10
+
+
+def test_torn_tail_is_cut_before_replay(wal_path):
+    writer = open_writer(wal_path)
+    writer.create(make_user(3))
+    with open(wal_path, "ab") as log:
+        log.write(b'{"op":"insert","seq":2,"user":{"id":')
+    restarted = open_writer(wal_path)
+    assert 3 in restarted.get_store() and restarted.get_store().seq == 1
+    # The next write lands on a clean line and survives another restart
+    restarted.create(make_user(4))
+    assert 4 in open_writer(wal_path).get_store()
+
+
+def test_writers_sharing_a_log_converge(wal_path):
+    first, second = open_writer(wal_path), open_writer(wal_path)
+    first.create(make_user(3))
+    assert second.catch_up() == 1
+    assert 3 in second.get_store()
+    # Uniqueness is checked against the other process's writes too
+    second.create(make_user(4, username="other"))
+    with pytest.raises(UserExists):
+        first.create(make_user(5, username="other"))
+    assert first.get_store().seq == second.get_store().seq == 2
+
+
+def fail_once(monkeypatch, log, name):
+    """Make one call of log.<name> raise OSError"""
+    real = getattr(log, name)
+
+    def failing(*args, **kwargs):
+        monkeypatch.setattr(log, name, real)
+        raise OSError(f"{name} failed")
+
+    monkeypatch.setattr(log, name, failing)
+
+
+@pytest.mark.parametrize("step", ["append", "sync"])
+def test_failed_log_write_fails_the_whole_group(wal_path, monkeypatch, step):
+    writer = open_writer(wal_path)
+    writer.create(make_user(3))
+    fail_once(monkeypatch, writer.log, step)
+    with pytest.raises(OSError):
+        writer.create(make_user(4))
+    store = writer.get_store()
+    assert 4 not in store and len(store) == 3 and store.seq == 1
+
+    writer.create(make_user(5))
+    store = writer.get_store()
+    # An entry appended before a failed sync is in the log, where every
+    # process applies it, so this one does too instead of drifting apart
+    assert (4 in store) == (step == "sync")
+    assert store.seq == (3 if step == "sync" else 2)
+    restarted = open_writer(wal_path).get_store()
+    assert [u.id for u in restarted.all()] == [u.id for u in store.all()]
+    assert restarted.seq == store.seq
+
+
+def test_replay_after_a_reload_skips_writes_from_before_the_reset(wal_path):
+    writer = open_writer(wal_path)
+    writer.create(make_user(9))
+    writer.delete(1)
+    # What reload_user_store does: log the reset, then load and replay
+    writer.mark_reset(source=["users.ndjson", 1])
+    reloaded = base_store()
+    writer.replay(reloaded)
+    writer.publish(reloaded)
+    assert [u.id for u in reloaded.all()] == [1, 2] and reloaded.seq == 3
+
+    writer.create(make_user(4))
+    for store in (writer.get_store(), open_writer(wal_path).get_store()):
+        assert [u.id for u in store.all()] == [1, 2, 4] and store.seq == 4
+    # Ids written before the reset are still never handed out again
+    new_user = make_user(None, "fresh", "fresh@example.com")
+    del new_user["id"]
+    assert writer.create(new_user).id == 10
@@ -0,0 +1,120 @@
+"""
+NDJSON export and import for the user dataset
+Streams users out one id-ordered chunk at a time and reads newline-delimited
+JSON back in fixed-size batches, so neither direction ever holds the whole
+dataset as a single response or document
+"""
+
+import json
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Union
+
+from snapshot import default_encode
+from user_store import project_user, validate_user
+
+# Users fetched from the store per exported chunk
+EXPORT_CHUNK_SIZE = 1000
+
+# Users written to the store per import batch
+IMPORT_BATCH_SIZE = 5000
+
+# Per-line errors kept in an import report; later ones are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+def export_ndjson(store, status: Optional[str] = None,
+                  fields: Optional[Sequence[str]] = None,
+                  encode: Callable[[Dict], bytes] = default_encode,
+                  chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield the users of a store as NDJSON, one chunk of lines at a time
+
+    Walks the store with keyset pagination, so memory stays bounded by the
+    chunk size and users added or removed mid-export never shift the
+    remaining chunks.
+
+    Args:
+        store: UserStore or MmapUserStore
+        status: Optional UserType value to filter on
+        fields: Optional field paths to project each user to
+        encode: Serializer for one public user dict
+        chunk_size: Users per yielded chunk
+
+    Yields:
+        Bytes holding up to ``chunk_size`` newline-terminated JSON lines
+    """
+    after = None
+    while True:
+        if not fields and hasattr(store, "page_raw"):
+            lines, after = store.page_raw(status, after, chunk_size)
+        else:
+            records, after = store.page(status, after, chunk_size)
+            users = [record.to_dict() for record in records]
+            if fields:
+                users = [project_user(user, fields) for user in users]
+            lines = [encode(user) for user in users]
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+        if after is None:
+            return
+
+
+def import_ndjson(store, lines: Iterable[Union[bytes, str]],
+                  batch_size: int = IMPORT_BATCH_SIZE,
+                  on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Load users from NDJSON lines into a store in batches
+
+    Each line must hold one public user object. Invalid lines are skipped
+    and reported; valid users are inserted (or replace the user with the
+    same id) with one ``add_many`` call per batch.
+
+    Args:
+        store: Writable UserStore
+        lines: Iterable of NDJSON lines, e.g. an open file
+        batch_size: Users per store write
+        on_progress: Called with the running report after every batch
+
+    Returns:
+        Report dict with lines, imported, failed, batches, seconds,
+        users_per_second and the first errors as {"line", "error"}
+    """
+    report = {"lines": 0, "imported": 0, "failed": 0, "batches": 0,
+              "seconds": 0.0, "users_per_second": 0.0, "errors": []}
+    started = time.perf_counter()
+    batch = []
+
+    def update_timing():
+        elapsed = time.perf_counter() - started
+        report["seconds"] = round(elapsed, 3)
+        report["users_per_second"] = round(report["imported"] / elapsed, 1) if elapsed else 0.0
+
+    def flush():
+        report["imported"] += store.add_many(batch)
+        report["batches"] += 1
+        batch.clear()
+        update_timing()
+        if on_progress is not None:
+            on_progress(report)
+
+    for number, line in enumerate(lines, 1):
+        report["lines"] = number
+        if not line.strip():
+            continue
+        try:
+            user = json.loads(line)
+            if not isinstance(user, dict):
+                raise ValueError("Expected a JSON object")
+            batch.append(validate_user(user))
+        except (ValueError, TypeError, AttributeError) as e:
+            # Malformed JSON, a non-object line or a wrongly shaped user
+            report["failed"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": number, "error": str(e)})
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    update_timing()
+    return report
@@ -0,0 +1,84 @@
+"""
+Repository interface for user data
+Describes the operations every user backend provides, so the API can serve
+from the in-memory store, a memory-mapped snapshot or a SQLite database
+without knowing which one it has
+"""
+
+from typing import Dict, Iterable, List, Optional, Protocol, Sequence, Tuple, Union
+
+from facets import DEFAULT_ZIP_PREFIX
+from user_record import UserRecord
+
+Page = Tuple[List[UserRecord], Optional[int]]
+BBox = Tuple[float, float, float, float]
+
+
+class UserRepository(Protocol):
+    """
+    Read and write API shared by UserStore, MmapUserStore and SqliteUserStore
+
+    Results come back in id order unless stated otherwise. ``version``
+    changes whenever the data does, so responses derived from it can be
+    cached per version. Backends that keep each user's compact JSON may
+    also offer ``page_raw``, returning those bytes instead of records.
+    """
+
+    version: int
+
+    def __len__(self) -> int: ...
+
+    def __contains__(self, user_id: int) -> bool: ...
+
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        """Return the user with the given id, or None"""
+
+    def get_by_username(self, username: str) -> Optional[UserRecord]:
+        """Return the user with the given username (case-insensitive), or None"""
+
+    def get_by_email(self, email: str) -> Optional[UserRecord]:
+        """Return the user with the given email (case-insensitive), or None"""
+
+    def all(self) -> List[UserRecord]:
+        """Return every user"""
+
+    def filter_by_status(self, status: str) -> List[UserRecord]:
+        """Return users whose status matches a UserType value"""
+
+    def filter_by_city(self, city: str) -> List[UserRecord]:
+        """Return users living in the given city (case-insensitive)"""
+
+    def page(self, status: Optional[str] = None, after: Optional[int] = None,
+             limit: Optional[int] = None, bbox: Optional[BBox] = None) -> Page:
+        """Return one keyset page of users and the id to continue after"""
+
+    def nearest(self, lat: float, lng: float, k: int,
+                status: Optional[str] = None) -> List[UserRecord]:
+        """Return the k users closest to a point, nearest first"""
+
+    def search(self, terms: Sequence[str], status: Optional[str] = None,
+               after: Optional[int] = None, limit: Optional[int] = None) -> Page:
+        """Return one keyset page of users matching every search term"""
+
+    def autocomplete(self, terms: Sequence[str], prefix: str, limit: int,
+                     status: Optional[str] = None) -> List[UserRecord]:
+        """Return users matching ``terms`` and a term starting with ``prefix``"""
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Return the number of users per status"""
+
+    def facet_counts(self, facet: str, status: Optional[str] = None,
+                     zip_prefix: int = DEFAULT_ZIP_PREFIX) -> Dict[str, int]:
+        """Return the number of users per value of a facet (see facets.FACETS)"""
+
+    def warm_indexes(self, like=None) -> None:
+        """Build lazily created indexes ahead of use"""
+
+    def add(self, user: Union[Dict, UserRecord]) -> None:
+        """Insert or replace a single user"""
+
+    def add_many(self, users: Iterable[Union[Dict, UserRecord]]) -> int:
+        """Insert or replace users in one batch, returning how many were written"""
+
+    def remove(self, user_id: int) -> bool:
+        """Delete a user by id, returning False if it did not exist"""
@@ -0,0 +1,508 @@
+"""
+Indexed in-memory user store for the Users API
+Keeps secondary indexes on status, id, username, email and city, plus
+facet counts, so that filters, lookups and aggregates never have to walk
+the full user list
+"""
+
+import base64
+import binascii
+import bisect
+import threading
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from cow_tables import CowDict, CowSortedList
+from facets import DEFAULT_ZIP_PREFIX, FacetCounts, zipcode_facet
+from search_index import SearchIndex, document_terms
+from spatial_index import GridSpatialIndex
+from user_record import UserRecord
+
+
+class UserType(Enum):
+    ACTIVE = "ACTIVE"
+    INACTIVE = "INACTIVE"
+
+
+# Every field path a caller may request through ``fields=`` projections
+USER_FIELDS = (
+    "id", "name", "username", "email",
+    "address", "address.street", "address.suite", "address.city", "address.zipcode",
+    "address.geo", "address.geo.lat", "address.geo.lng",
+    "phone", "website", "status",
+    "company", "company.name", "company.catchPhrase", "company.bs",
+)
+
+# Page size used when a cursor is given without an explicit limit
+DEFAULT_PAGE_SIZE = 100
+
+# Neighbours returned by near= when k is not given
+DEFAULT_NEAREST = 10
+
+# Suggestions returned by search in prefix mode when limit is not given
+DEFAULT_SUGGESTIONS = 10
+
+_CURSOR_PREFIX = "id:"
+
+
+def encode_cursor(user_id: int) -> str:
+    """Encode the last id of a page as an opaque pagination cursor"""
+    raw = f"{_CURSOR_PREFIX}{user_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not raw.startswith(_CURSOR_PREFIX):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    try:
+        return int(raw[len(_CURSOR_PREFIX):])
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+def parse_fields(spec: str) -> Tuple[str, ...]:
+    """
+    Parse a comma-separated ``fields=`` value into known field paths
+
+    Paths nested under another requested path are dropped, so
+    ``address,address.city`` projects the whole address once.
+
+    Raises:
+        ValueError: If any path is not in USER_FIELDS
+    """
+    paths = [p.strip() for p in spec.split(",") if p.strip()]
+    unknown = [p for p in paths if p not in USER_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    selected = set(paths)
+    kept = [
+        p for p in paths
+        if not any(p.startswith(parent + ".") for parent in selected)
+    ]
+    # Preserve canonical field order and drop duplicates
+    return tuple(f for f in USER_FIELDS if f in kept)
+
+
+def project_user(user: Dict, fields: Sequence[str]) -> Dict:
+    """Return a copy of a user holding only the requested field paths"""
+    result: Dict = {}
+    for path in fields:
+        *parents, leaf = path.split(".")
+        source, target = user, result
+        for part in parents:
+            source = source.get(part)
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(part, {})
+        else:
+            if leaf in source:
+                target[leaf] = source[leaf]
+    return result
+
+
+def normalize_key(value: str) -> str:
+    """Normalize a string index key for case-insensitive lookups"""
+    return value.strip().lower()
+
+
+def validate_user(user: Union[Dict, UserRecord]) -> UserRecord:
+    """
+    Convert a user to a UserRecord with a normalized status
+
+    Raises:
+        ValueError: If the id, coordinates or status are invalid
+    """
+    if not isinstance(user, UserRecord):
+        user = UserRecord.from_dict(user)
+    try:
+        status = UserType(str(user.status).upper()).value
+    except ValueError:
+        raise ValueError(f"Invalid status for user {user.id}: {user.status!r}")
+    if status != user.status:
+        user = user.replace(status=status)
+    return user
+
+
+class UserStore:
+    """
+    In-memory user collection with secondary indexes
+
+    Lookups by id, username and email are O(1); filtering by status or city
+    is O(k) in the number of matching users. Id lists are kept sorted so
+    results come back in id order, matching the original SAMPLE_USERS list.
+    A grid spatial index over address.geo answers nearest-neighbour and
+    bounding-box queries, and an inverted index answers text searches; both
+    are built by ``warm_indexes`` (or, failing that, on first use) and then
+    kept current.
+    Facet counts are maintained on every change, so ``facet_counts`` costs
+    O(buckets).
+
+    Users are held as compact UserRecord objects; callers convert them with
+    ``to_dict()`` only when serializing.
+
+    Readers never lock. Writers serialize on an internal lock and bump
+    ``version`` after every change so derived caches can be invalidated.
+    ``copy`` gives writers a private store to change and publish as the next
+    version, leaving the one readers hold untouched; the tables are
+    copy-on-write (see cow_tables), so a copy costs O(buckets) and a write
+    then clones only the parts it touches.
+    """
+
+    def __init__(self, users: Iterable[Union[Dict, UserRecord]] = ()):
+        self.version = 0
+        # Sequence number of the last logged write this data includes (see
+        # UserWriter); unlike version it is the same in every process
+        self.seq = 0
+        self._by_id: CowDict[int, UserRecord] = CowDict()
+        self._ids: CowSortedList[int] = CowSortedList()
+        self._by_status: Dict[str, CowSortedList[int]] = {t.value: CowSortedList() for t in UserType}
+        self._by_username: CowDict[str, int] = CowDict()
+        self._by_email: CowDict[str, int] = CowDict()
+        self._by_city: CowDict[str, List[int]] = CowDict()
+        self._facets = FacetCounts()
+        self._spatial: Optional[GridSpatialIndex] = None
+        self._search: Optional[SearchIndex] = None
+        # After copy(), city id lists this store may write in place; None means all
+        self._owned_cities: Optional[Set[str]] = None
+        self._lock = threading.Lock()
+        self.add_many(users)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._by_id
+
+    # ----------------------------------------------------------------- writes
+
+    def add(self, user: Union[Dict, UserRecord]) -> None:
+        """Insert or replace a single user"""
+        self.add_many([user])
+
+    def add_many(self, users: Iterable[Union[Dict, UserRecord]]) -> int:
+        """
+        Insert or replace users in one batch
+
+        Args:
+            users: UserRecords or public user dictionaries; ``status``
+                defaults to ACTIVE
+
+        Returns:
+            Number of users written
+        """
+        count = 0
+        with self._lock:
+            if not self._by_id and self._spatial is None and self._search is None:
+                # Loading into an empty store builds every table in one pass
+                records: Dict[int, UserRecord] = {}
+                for user in users:
+                    user = validate_user(user)
+                    records[user.id] = user
+                    count += 1
+                if count:
+                    self._load(records)
+                    self.version += 1
+                return count
+            for user in users:
+                user = validate_user(user)
+                if user.id in self._by_id:
+                    self._unindex(self._by_id[user.id])
+                self._index(user)
+                count += 1
+            if count:
+                if self._search is not None:
+                    self._search.merge_pending()
+                self.version += 1
+        return count
+
+    def remove(self, user_id: int) -> bool:
+        """Delete a user by id, returning False if it did not exist"""
+        with self._lock:
+            user = self._by_id.get(user_id)
+            if user is None:
+                return False
+            self._unindex(user)
+            self.version += 1
+            return True
+
+    def copy(self) -> "UserStore":
+        """
+        Return an independent copy of the store, e.g. to build its next version
+
+        Records are immutable and shared, and so are the parts of every
+        table and index until either store writes them. The cost is
+        O(buckets + users / CHUNK_SIZE), not O(users). Built indexes carry
+        over, so the copy answers every query at once.
+        """
+        with self._lock:
+            clone = UserStore.__new__(UserStore)
+            clone.version = self.version
+            clone.seq = self.seq
+            clone._by_id = self._by_id.copy()
+            clone._ids = self._ids.copy()
+            clone._by_status = {status: ids.copy() for status, ids in self._by_status.items()}
+            clone._by_username = self._by_username.copy()
+            clone._by_email = self._by_email.copy()
+            clone._by_city = self._by_city.copy()
+            self._owned_cities, clone._owned_cities = set(), set()
+            clone._facets = self._facets.copy()
+            clone._spatial = None if self._spatial is None else self._spatial.copy()
+            clone._search = None if self._search is None else self._search.copy()
+            clone._lock = threading.Lock()
+        return clone
+
+    # ------------------------------------------------------------------ reads
+
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        """Return the user with the given id, or None"""
+        return self._by_id.get(user_id)
+
+    def get_by_username(self, username: str) -> Optional[UserRecord]:
+        """Return the user with the given username (case-insensitive), or None"""
+        user_id = self._by_username.get(normalize_key(username))
+        return None if user_id is None else self._by_id.get(user_id)
+
+    def get_by_email(self, email: str) -> Optional[UserRecord]:
+        """Return the user with the given email (case-insensitive), or None"""
+        user_id = self._by_email.get(normalize_key(email))
+        return None if user_id is None else self._by_id.get(user_id)
+
+    def all(self) -> List[UserRecord]:
+        """Return every user in id order"""
+        return self._resolve(self._ids)
+
+    def max_id(self) -> int:
+        """Return the highest user id, or 0 when the store is empty"""
+        last = self._ids.last()
+        return 0 if last is None else last
+
+    def filter_by_status(self, status: str) -> List[UserRecord]:
+        """Return users whose status matches a UserType value, in id order"""
+        return self._resolve(self._by_status.get(status.upper(), []))
+
+    def filter_by_city(self, city: str) -> List[UserRecord]:
+        """Return users living in the given city (case-insensitive), in id order"""
+        return self._resolve(self._by_city.get(normalize_key(city), []))
+
+    def nearest(self, lat: float, lng: float, k: int,
+                status: Optional[str] = None) -> List[UserRecord]:
+        """Return the k users closest to a point, nearest first"""
+        accept = self._status_filter(status)
+        return self._resolve([uid for _, uid in self._spatial_index().nearest(lat, lng, k, accept)])
+
+    def search(self, terms: Sequence[str], status: Optional[str] = None,
+               after: Optional[int] = None,
+               limit: Optional[int] = None) -> Tuple[List[UserRecord], Optional[int]]:
+        """Return one keyset page of users matching every search term (see page)"""
+        ids, next_after = self._search_index().match(terms, after, limit,
+                                                     self._status_filter(status))
+        return self._resolve(ids), next_after
+
+    def autocomplete(self, terms: Sequence[str], prefix: str, limit: int,
+                     status: Optional[str] = None) -> List[UserRecord]:
+        """Return up to ``limit`` users matching ``terms`` and a term starting with ``prefix``"""
+        return self._resolve(self._search_index().complete(terms, prefix, limit,
+                                                           self._status_filter(status)))
+
+    def page(self, status: Optional[str] = None, after: Optional[int] = None,
+             limit: Optional[int] = None,
+             bbox: Optional[Tuple[float, float, float, float]] = None
+             ) -> Tuple[List[UserRecord], Optional[int]]:
+        """
+        Return one keyset page of users in id order
+
+        Paging on the id rather than an offset keeps pages stable when users
+        are inserted or removed between requests.
+
+        Args:
+            status: Optional UserType value to filter on
+            after: Only return users with an id greater than this
+            limit: Maximum number of users to return (None for all)
+            bbox: Optional (minLat, minLng, maxLat, maxLng) to restrict to
+
+        Returns:
+            Tuple of (users, id to continue after or None on the last page)
+        """
+        if bbox is None:
+            ids = self._ids if status is None else self._by_status.get(status.upper())
+            page, more = ([], False) if ids is None else ids.after(after, limit)
+        else:
+            ids = self._spatial_index().within_bbox(*bbox)
+            if status is not None:
+                ids = list(filter(self._status_filter(status), ids))
+            start = 0 if after is None else bisect.bisect_right(ids, after)
+            end = len(ids) if limit is None else start + limit
+            page, more = ids[start:end], end < len(ids)
+        users = self._resolve(page)
+        if limit is not None and more and users:
+            return users, users[-1].id
+        return users, None
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Return the number of users per status"""
+        return {status: len(ids) for status, ids in self._by_status.items()}
+
+    def facet_counts(self, facet: str, status: Optional[str] = None,
+                     zip_prefix: int = DEFAULT_ZIP_PREFIX) -> Dict[str, int]:
+        """
+        Return the number of users per value of a facet
+
+        Args:
+            facet: One of facets.FACETS
+            status: Only count users with this UserType value
+            zip_prefix: Characters of the zipcode to group by (see
+                facets.ZIP_PREFIX_LENGTHS)
+
+        Returns:
+            Mapping of value to user count; users without a value are left out
+        """
+        statuses = list(self._by_status) if status is None else [status.upper()]
+        if facet == "status":
+            return {s: len(self._by_status[s]) for s in statuses if s in self._by_status}
+        if facet == "zipcode":
+            facet = zipcode_facet(zip_prefix)
+        return self._facets.counts(facet, statuses)
+
+    def warm_indexes(self, like=None) -> None:
+        """
+        Build the lazily created spatial and search indexes ahead of use
+
+        Args:
+            like: Store being replaced; only the indexes it had already
+                built are created, so unused features cost nothing
+        """
+        if like is None or getattr(like, "_spatial", None) is not None:
+            self._spatial_index()
+        if like is None or getattr(like, "_search", None) is not None:
+            self._search_index()
+
+    # -------------------------------------------------------------- internals
+
+    def _resolve(self, ids: Iterable[int]) -> List[UserRecord]:
+        # Tolerate ids removed by a concurrent writer instead of raising
+        return [user for user in self._by_id.get_many(list(ids)) if user is not None]
+
+    def _load(self, records: Dict[int, UserRecord]) -> None:
+        # Build every table of an empty store from scratch (see add_many)
+        ids = sorted(records)
+        by_status: Dict[str, List[int]] = {t.value: [] for t in UserType}
+        by_city: Dict[str, List[int]] = {}
+        for user_id in ids:
+            user = records[user_id]
+            by_status[user.status].append(user_id)
+            if user.city:
+                by_city.setdefault(normalize_key(user.city), []).append(user_id)
+        self._by_id = CowDict(records.items())
+        self._ids = CowSortedList.from_sorted(ids)
+        self._by_status = {status: CowSortedList.from_sorted(status_ids)
+                           for status, status_ids in by_status.items()}
+        # Later users win a shared key, as when indexed one by one
+        self._by_username = CowDict((normalize_key(u.username), u.id)
+                                    for u in records.values() if u.username)
+        self._by_email = CowDict((normalize_key(u.email), u.id)
+                                 for u in records.values() if u.email)
+        self._by_city = CowDict(by_city.items())
+        self._owned_cities = None
+        self._facets.add_many(records.values())
+
+    def _spatial_index(self) -> GridSpatialIndex:
+        if self._spatial is None:
+            # Writers hold the lock, so no user is missed or indexed twice
+            with self._lock:
+                if self._spatial is None:
+                    index = GridSpatialIndex()
+                    index.add_many((u.id, u.lat, u.lng) for u in self._by_id.values())
+                    self._spatial = index
+        return self._spatial
+
+    def _search_index(self) -> SearchIndex:
+        if self._search is None:
+            with self._lock:
+                if self._search is None:
+                    index = SearchIndex()
+                    for user_id in self._ids:
+                        index.add(user_id, document_terms(self._by_id[user_id]))
+                    index.merge_pending()
+                    self._search = index
+        return self._search
+
+    def _city_ids(self, key: str) -> List[int]:
+        # Writable id list for a city, unshared from any copy of this store
+        ids = self._by_city.get(key)
+        owned = self._owned_cities
+        if owned is not None and key not in owned:
+            ids = self._by_city[key] = [] if ids is None else ids[:]
+            owned.add(key)
+        elif ids is None:
+            ids = self._by_city[key] = []
+        return ids
+
+    def _status_filter(self, status: Optional[str]):
+        if status is None:
+            return None
+        wanted = status.upper()
+        by_id = self._by_id
+        return lambda uid: getattr(by_id.get(uid), "status", None) == wanted
+
+    def _index(self, user: UserRecord) -> None:
+        user_id = user.id
+        self._by_id[user_id] = user
+        self._ids.add(user_id)
+        self._by_status[user.status].add(user_id)
+        if user.username:
+            self._by_username[normalize_key(user.username)] = user_id
+        if user.email:
+            self._by_email[normalize_key(user.email)] = user_id
+        if user.city:
+            bisect.insort(self._city_ids(normalize_key(user.city)), user_id)
+        self._facets.add(user)
+        if self._spatial is not None:
+            self._spatial.add(user_id, user.lat, user.lng)
+        if self._search is not None:
+            self._search.add(user_id, document_terms(user))
+
+    def _unindex(self, user: UserRecord) -> None:
+        user_id = user.id
+        del self._by_id[user_id]
+        self._ids.discard(user_id)
+        self._by_status[user.status].discard(user_id)
+        # Only drop keys still pointing at this user, never a current owner's
+        if user.username:
+            _discard_key(self._by_username, normalize_key(user.username), user_id)
+        if user.email:
+            _discard_key(self._by_email, normalize_key(user.email), user_id)
+        if user.city:
+            key = normalize_key(user.city)
+            if key in self._by_city:
+                ids = self._city_ids(key)
+                _discard(ids, user_id)
+                if not ids:
+                    del self._by_city[key]
+        self._facets.remove(user)
+        if self._spatial is not None:
+            self._spatial.remove(user_id, user.lat, user.lng)
+        if self._search is not None:
+            self._search.remove(user_id, document_terms(user))
+
+
+def _discard(ids: List[int], user_id: int) -> None:
+    """Remove an id from a sorted id list if present"""
+    pos = bisect.bisect_left(ids, user_id)
+    if pos < len(ids) and ids[pos] == user_id:
+        del ids[pos]
+
+
+def _discard_key(index: CowDict[str, int], key: str, user_id: int) -> None:
+    """Remove a unique-key entry if it still belongs to user_id"""
+    if index.get(key) == user_id:
+        del index[key]
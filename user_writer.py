@@ -0,0 +1,470 @@
+"""
+Copy-on-write write path for the in-memory user store
+Creates, updates and deletes are committed in groups: one thread logs a
+whole batch with a single fsync, applies it to a private copy of the store
+and publishes that copy as the next version. Readers keep using whichever
+store they picked up and never wait on a lock
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from change_feed import DELETE, INSERT, RESET, UPDATE, ChangeLog
+from sharding import ShardSpec, shard_for
+from user_record import UserRecord
+from user_store import UserStore, normalize_key, validate_user
+from write_log import WriteAheadLog
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for entries appended by other processes
+DEFAULT_FOLLOW_INTERVAL = 0.05
+
+# Most mutations committed together in one group
+MAX_GROUP_SIZE = 1000
+
+Changes = Dict[int, Optional[UserRecord]]
+
+# Unique keys a user holds: ("username" | "email", normalized value)
+UniqueKey = Tuple[str, str]
+
+
+class UserNotFound(LookupError):
+    """The user to update or delete does not exist"""
+
+
+class UserExists(Exception):
+    """Another user already has the id, username or email being written"""
+
+
+class _Mutation:
+    """One queued write and, once committed, its outcome"""
+
+    __slots__ = ("op", "user_id", "user", "result", "error", "done")
+
+    def __init__(self, op: str, user_id: Optional[int], user: Optional[Dict]):
+        self.op = op
+        self.user_id = user_id
+        self.user = user
+        self.result: Optional[UserRecord] = None
+        self.error: Optional[Exception] = None
+        self.done = False
+
+
+def apply_entries(changes: Changes, entries: List[Dict]) -> None:
+    """Fold log entries into a map of user id to new record (None = deleted)"""
+    for entry in entries:
+        if entry["op"] == DELETE:
+            changes[entry["id"]] = None
+        elif entry["op"] != RESET:
+            changes[entry["id"]] = validate_user(entry["user"])
+
+
+class UserWriter:
+    """
+    Serializes user mutations and publishes each committed group as a new store
+
+    Callers block until their change is durable and visible. The first
+    caller to arrive while no commit is running leads the next group: it
+    takes every mutation queued so far, checks them in order against the
+    current data, appends the accepted ones to the write-ahead log with one
+    write and one fsync, then applies them to ``copy()`` of the live store
+    and hands it to ``publish``. Mutations arriving meanwhile queue up for
+    the following group, so the commit rate adapts to load.
+
+    With a log, entries appended by other processes are applied before each
+    group is checked (and by ``catch_up``), so every process converges on
+    the same data. Without one, writes live only in this process's memory.
+
+    Every logged write gets the next sequence number, which each published
+    store carries as ``seq``; with ``changes``, the writes are recorded
+    there too before the store is published, to back the change feed.
+
+    On a shard (see sharding.py), new users only get ids the shard owns and
+    users owned by other shards are rejected.
+    """
+
+    def __init__(self, get_store: Callable[[], UserStore],
+                 publish: Callable[[UserStore], None],
+                 log: Optional[WriteAheadLog] = None,
+                 commit_delay: float = 0.0,
+                 changes: Optional[ChangeLog] = None,
+                 shard: Optional[ShardSpec] = None):
+        self.get_store = get_store
+        self.publish = publish
+        self.log = log
+        self.commit_delay = commit_delay
+        self.changes = changes
+        self.shard = shard
+        # Held while a group is committed or the log is applied
+        self.lock = threading.RLock()
+        self._offset = 0
+        self._seq = 0
+        # Highest id ever written, so deleted ids are not handed out again
+        self._high_id = 0
+        # Data file identity recorded with the last logged reset
+        self._reset_source: Optional[List] = None
+        self._queue: List[_Mutation] = []
+        self._leading = False
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"commits": 0, "mutations": 0, "applied": 0}
+
+    # ------------------------------------------------------------------ writes
+
+    def create(self, user: Dict) -> UserRecord:
+        """
+        Add a new user, assigning the next free id when ``user`` has none
+
+        Raises:
+            ValueError: If the user is invalid
+            UserExists: If the given id, the username or the email is taken
+        """
+        return self._submit(_Mutation("create", user.get("id"), user))
+
+    def replace(self, user_id: int, user: Dict) -> UserRecord:
+        """
+        Replace an existing user with a new representation
+
+        Raises:
+            ValueError: If the user is invalid or its id differs from user_id
+            UserNotFound: If there is no such user
+            UserExists: If another user has the username or email
+        """
+        return self._submit(_Mutation("replace", user_id, user))
+
+    def delete(self, user_id: int) -> UserRecord:
+        """
+        Delete a user, returning the removed record
+
+        Raises:
+            UserNotFound: If there is no such user
+        """
+        return self._submit(_Mutation("delete", user_id, None))
+
+    # -------------------------------------------------------------- recovery
+
+    def replay(self, store: UserStore) -> int:
+        """
+        Apply the log to a freshly loaded store before it is published
+
+        Only writes after the last reset are applied: earlier ones were made
+        to data that the loaded file replaced. The whole log still sets the
+        sequence number, the retired ids and the change feed.
+
+        Returns:
+            Number of entries replayed
+        """
+        entries: List[Dict] = []
+        with self.lock:
+            if self.log is not None:
+                entries, self._offset = self.log.read(0)
+                self._seq = self._high_id = 0
+                self._reset_source = None
+                if self.changes is not None:
+                    self.changes.clear()
+                changes: Changes = {}
+                self._fold(changes, entries)
+                resets = [i for i, entry in enumerate(entries) if entry["op"] == RESET]
+                if resets:
+                    changes = {}
+                    apply_entries(changes, entries[resets[-1] + 1:])
+                _apply(store, changes)
+            store.seq = self._seq
+        if entries:
+            logger.info("Replayed %d logged writes from %s", len(entries), self.log.path)
+        return len(entries)
+
+    def mark_reset(self, source: Optional[List] = None) -> None:
+        """
+        Record that the base dataset is being replaced, before it is reloaded
+
+        Change feed clients from before this point have to fetch everything
+        again. Logged as its own entry, so every process sees the reset.
+
+        Args:
+            source: Identity of the new data file (e.g. its signature); when
+                the last logged reset has the same one, another process
+                already recorded this change and nothing is logged
+        """
+        with self.lock:
+            if self.log is None:
+                self._seq += 1
+                if self.changes is not None:
+                    self.changes.reset(self._seq)
+                return
+            with self.log.locked():
+                logged, self._offset = self.log.read(self._offset)
+                changes: Changes = {}
+                self._fold(changes, logged)
+                if source is not None and source == self._reset_source:
+                    return
+                self._seq += 1
+                entry = {"op": RESET, "seq": self._seq, "ts": round(time.time(), 6)}
+                if source is not None:
+                    entry["source"] = source
+                self._offset = self.log.append([entry])
+                self._reset_source = source
+            self.log.sync()
+            if self.changes is not None:
+                self.changes.reset(self._seq)
+
+    def catch_up(self) -> int:
+        """
+        Publish entries other processes appended since the last look
+
+        Returns:
+            Number of entries applied
+        """
+        if self.log is None or self.log.size() <= self._offset:
+            return 0
+        with self.lock:
+            entries, self._offset = self.log.read(self._offset)
+            if entries:
+                changes: Changes = {}
+                self._fold(changes, entries)
+                self._publish(changes)
+                self.stats["applied"] += len(entries)
+        return len(entries)
+
+    def start_follower(self, interval: float = DEFAULT_FOLLOW_INTERVAL) -> Optional[threading.Thread]:
+        """Apply other processes' writes from a daemon thread (no-op without a log)"""
+        if self.log is None or interval <= 0:
+            return None
+        self._thread = threading.Thread(target=self._follow, args=(interval,),
+                                        name="wal-follower", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        """Stop the follower thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    # -------------------------------------------------------------- internals
+
+    def _follow(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.catch_up()
+            except Exception:
+                logger.exception("Failed to apply logged writes")
+
+    def _submit(self, mutation: _Mutation) -> UserRecord:
+        with self._cond:
+            self._queue.append(mutation)
+        while True:
+            with self._cond:
+                while self._leading and not mutation.done:
+                    self._cond.wait()
+                if mutation.done:
+                    break
+                self._leading = True
+            # A full group may leave this mutation queued for the next one
+            self._lead()
+        if mutation.error is not None:
+            raise mutation.error
+        return mutation.result
+
+    def _lead(self) -> None:
+        group: List[_Mutation] = []
+        try:
+            if self.commit_delay:
+                # Give concurrent writers a moment to join this group
+                time.sleep(self.commit_delay)
+            with self._cond:
+                group, self._queue = self._queue[:MAX_GROUP_SIZE], self._queue[MAX_GROUP_SIZE:]
+            self._commit(group)
+        except Exception as e:
+            # Nothing in the group was published, so no write in it succeeded
+            for mutation in group:
+                if mutation.error is None:
+                    mutation.result, mutation.error = None, e
+        finally:
+            with self._cond:
+                for mutation in group:
+                    mutation.done = True
+                self._leading = False
+                self._cond.notify_all()
+
+    def _commit(self, group: List[_Mutation]) -> None:
+        with self.lock:
+            # Writes by other processes, which come first in the log order
+            others: Changes = {}
+            changes: Changes = {}
+            entries: List[Dict] = []
+            # (seq, high id, log offset) to return to if the group fails
+            rollback: Optional[Tuple[int, int, int]] = None
+            try:
+                if self.log is None:
+                    rollback = (self._seq, self._high_id, self._offset)
+                    self._plan(group, changes, entries)
+                else:
+                    with self.log.locked():
+                        logged, self._offset = self.log.read(self._offset)
+                        self._fold(others, logged)
+                        changes.update(others)
+                        rollback = (self._seq, self._high_id, self._offset)
+                        self._plan(group, changes, entries)
+                        if entries:
+                            self._offset = self.log.append(entries)
+                    # Outside the file lock, so other processes can append meanwhile
+                    if entries:
+                        self.log.sync()
+                self._record(entries)
+                if changes:
+                    self._publish(changes)
+            except Exception:
+                if rollback is not None:
+                    # Entries appended before a failed sync are read back
+                    # (and published) by the next commit or catch_up, as
+                    # every other process applies them too
+                    self._seq, self._high_id, self._offset = rollback
+                    if others:
+                        self._publish(others)
+                raise
+            self.stats["commits"] += 1
+            self.stats["mutations"] += len(entries)
+
+    def _fold(self, changes: Changes, entries: List[Dict]) -> None:
+        apply_entries(changes, entries)
+        for entry in entries:
+            self._seq = entry["seq"]
+            if entry["op"] == RESET:
+                self._reset_source = entry.get("source")
+            else:
+                self._high_id = max(self._high_id, entry["id"])
+        self._record(entries)
+
+    def _record(self, entries: List[Dict]) -> None:
+        if self.changes is None:
+            return
+        for entry in entries:
+            if entry["op"] == RESET:
+                self.changes.reset(entry["seq"])
+            else:
+                self.changes.record(entry["seq"], entry["op"], entry["id"])
+
+    def _plan(self, group: List[_Mutation], changes: Changes, entries: List[Dict]) -> None:
+        # Check each mutation against the data as left by the ones before it
+        store = self.get_store()
+
+        def current(user_id: int) -> Optional[UserRecord]:
+            return changes[user_id] if user_id in changes else store.get(user_id)
+
+        # Username and email owners among the changed users; the store
+        # answers for everyone else
+        claimed: Dict[UniqueKey, int] = {}
+        for record in changes.values():
+            if record is not None:
+                claimed.update((key, record.id) for key in _unique_keys(record))
+
+        def owner(key: UniqueKey) -> Optional[int]:
+            if key in claimed:
+                return claimed[key]
+            kind, value = key
+            found = store.get_by_username(value) if kind == "username" else store.get_by_email(value)
+            # A changed user's old keys are free unless its new record kept them
+            return None if found is None or found.id in changes else found.id
+
+        def change(user_id: int, record: Optional[UserRecord]) -> None:
+            previous = current(user_id)
+            if previous is not None:
+                for key in _unique_keys(previous):
+                    if claimed.get(key, user_id) == user_id:
+                        claimed.pop(key, None)
+            if record is not None:
+                claimed.update((key, user_id) for key in _unique_keys(record))
+            changes[user_id] = record
+
+        next_id = max(store.max_id(), self._high_id) + 1
+        now = time.time()
+        for mutation in group:
+            try:
+                if mutation.op == "delete":
+                    record = current(mutation.user_id)
+                    if record is None:
+                        raise UserNotFound(f"User {mutation.user_id} not found")
+                    change(mutation.user_id, None)
+                    entry = {"op": DELETE, "id": mutation.user_id}
+                else:
+                    user = dict(mutation.user)
+                    if mutation.op == "create":
+                        if user.get("id") is None:
+                            user["id"] = next_id if self.shard is None else self.shard.next_owned(next_id)
+                        record = _validate(user)
+                        if self.shard is not None and not self.shard.owns(record.id):
+                            raise ValueError(f"User {record.id} belongs to shard "
+                                             f"{shard_for(record.id, self.shard.count)}, not {self.shard}")
+                        if current(record.id) is not None:
+                            raise UserExists(f"User {record.id} already exists")
+                    else:
+                        user.setdefault("id", mutation.user_id)
+                        if user["id"] != mutation.user_id:
+                            raise ValueError(f"User id {user['id']!r} does not match {mutation.user_id}")
+                        record = _validate(user)
+                        if current(record.id) is None:
+                            raise UserNotFound(f"User {record.id} not found")
+                    for key in _unique_keys(record):
+                        taken_by = owner(key)
+                        if taken_by is not None and taken_by != record.id:
+                            raise UserExists(f"User {taken_by} already has {key[0]} {key[1]!r}")
+                    change(record.id, record)
+                    next_id = max(next_id, record.id + 1)
+                    self._high_id = max(self._high_id, record.id)
+                    op = INSERT if mutation.op == "create" else UPDATE
+                    entry = {"op": op, "id": record.id, "user": record.to_dict()}
+            except (ValueError, LookupError, UserExists) as e:
+                mutation.error = e
+                continue
+            self._seq += 1
+            entry["seq"] = self._seq
+            entry["ts"] = round(now, 6)
+            entries.append(entry)
+            mutation.result = record
+
+    def _publish(self, changes: Changes) -> None:
+        store = self.get_store().copy()
+        _apply(store, changes)
+        if store.seq != self._seq:
+            store.seq = self._seq
+            # Cached responses carry the seq, so a reset alone needs a new version
+            store.version += 1
+        self.publish(store)
+
+
+# Fields a written user must have, as non-empty strings; lookups and the
+# unique indexes depend on them (status defaults to ACTIVE)
+REQUIRED_FIELDS = ("username", "email")
+
+
+def _validate(user: Dict) -> UserRecord:
+    missing = [name for name in REQUIRED_FIELDS
+               if not isinstance(user.get(name), str) or not user[name].strip()]
+    if missing:
+        raise ValueError(f"Missing or empty required fields: {', '.join(missing)}")
+    try:
+        return validate_user(user)
+    except (TypeError, AttributeError) as e:
+        # A wrongly shaped nested object, e.g. "address": "somewhere"
+        raise ValueError(f"Invalid user: {e}")
+
+
+def _unique_keys(record: UserRecord) -> List[UniqueKey]:
+    keys = []
+    if record.username:
+        keys.append(("username", normalize_key(record.username)))
+    if record.email:
+        keys.append(("email", normalize_key(record.email)))
+    return keys
+
+
+def _apply(store: UserStore, changes: Changes) -> None:
+    store.add_many(record for record in changes.values() if record is not None)
+    for user_id, record in changes.items():
+        if record is None:
+            store.remove(user_id)
@@ -0,0 +1,165 @@
+"""
+Append-only write-ahead log of user mutations
+Every create, update and delete is appended as one checksummed JSON line
+before it becomes visible, so the dataset can be rebuilt after a crash by
+replaying the log over the base data, and every worker process can follow
+the writes made by the others
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per chunk when scanning the log
+_READ_SIZE = 1024 * 1024
+
+
+def encode_entry(entry: Dict) -> bytes:
+    """Frame one log entry as "<crc32 hex> <compact JSON>\\n" """
+    body = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+    return b"%08x " % zlib.crc32(body) + body + b"\n"
+
+
+def decode_entry(line: bytes) -> Optional[Dict]:
+    """
+    Parse a framed log line (without its newline)
+
+    Returns:
+        The entry, or None if the line is torn or corrupt
+    """
+    if len(line) < 10 or line[8:9] != b" ":
+        return None
+    body = line[9:]
+    try:
+        if int(line[:8], 16) != zlib.crc32(body):
+            return None
+        entry = json.loads(body)
+    except ValueError:
+        return None
+    return entry if isinstance(entry, dict) else None
+
+
+class WriteAheadLog:
+    """
+    Checksummed, newline-framed log file shared by every process of a server
+
+    Appends happen under an exclusive ``flock`` and each batch is one
+    ``write``, so concurrent processes never interleave entries and the file
+    order is the one global order of writes. ``sync`` makes appended
+    entries durable. Each process opens its own descriptor on first use
+    (and again after a fork), so offsets are never shared.
+
+    A crash can leave a torn entry at the end of the file; it is cut off
+    when the log is opened, before anything is appended after it.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.repair()
+
+    def _file(self) -> int:
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    # First use in this process (or first use after a fork)
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+                    self._pid = pid
+        return self._fd
+
+    def close(self) -> None:
+        """Close this process's descriptor"""
+        with self._lock:
+            if self._fd is not None and self._pid == os.getpid():
+                os.close(self._fd)
+            self._fd = self._pid = None
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """Hold the log's exclusive lock, shutting out appends from other processes"""
+        fd = self._file()
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def size(self) -> int:
+        """Current length of the log in bytes"""
+        return os.fstat(self._file()).st_size
+
+    def append(self, entries: List[Dict]) -> int:
+        """
+        Append entries as a single write; call while holding ``locked()``
+
+        Returns:
+            Offset just past the appended entries
+        """
+        fd = self._file()
+        data = memoryview(b"".join(map(encode_entry, entries)))
+        while data:
+            data = data[os.write(fd, data):]
+        return os.lseek(fd, 0, os.SEEK_END)
+
+    def sync(self) -> None:
+        """Flush appended entries to stable storage (a no-op with fsync off)"""
+        if self.fsync:
+            os.fdatasync(self._file())
+
+    def read(self, offset: int = 0) -> Tuple[List[Dict], int]:
+        """
+        Read the complete entries after an offset
+
+        An entry still being written by another process is left for the next
+        read. Reading stops at a corrupt entry.
+
+        Returns:
+            Tuple of (entries, offset to continue reading from)
+        """
+        fd = self._file()
+        entries: List[Dict] = []
+        pending = b""
+        while True:
+            chunk = os.pread(fd, _READ_SIZE, offset + len(pending))
+            if not chunk:
+                return entries, offset
+            pending += chunk
+            end = pending.rfind(b"\n")
+            if end < 0:
+                continue
+            for line in pending[:end].split(b"\n"):
+                entry = decode_entry(line)
+                if entry is None:
+                    logger.error("Corrupt entry in %s at offset %d; ignoring the rest of the log",
+                                 self.path, offset)
+                    return entries, offset
+                entries.append(entry)
+                offset += len(line) + 1
+            pending = pending[end + 1:]
+
+    def repair(self) -> int:
+        """
+        Cut a torn or corrupt tail left by a crash
+
+        Returns:
+            Number of bytes removed
+        """
+        with self.locked():
+            _, end = self.read(0)
+            size = self.size()
+            if end < size:
+                logger.warning("Truncating %d bytes of incomplete entries from %s",
+                               size - end, self.path)
+                os.truncate(self.path, end)
+            return size - end